@@ -0,0 +1,148 @@
+"""Helpers shared by api/main.py and the modules split out of it.
+
+Vercel loads api/main.py by path, so nothing in api/ may import it back:
+these modules would otherwise run against a second copy of it.
+"""
+
+import asyncio
+import atexit
+import hashlib
+import json
+import logging
+import logging.handlers
+import math
+import os
+import sqlite3
+import sys
+import threading
+from typing import AsyncIterator, Optional
+
+from api._models import CompanySearchRequest
+
+# Optional accelerator: orjson for JSON encoding, falling back to json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Logging. Messages below LOG_LEVEL are dropped before formatting; the rest
+# are buffered in memory and written out at the end of each request (or
+# straight away for errors), so the hot path never waits on a stderr flush.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_BUFFER_CAPACITY = int(os.environ.get("LOG_BUFFER_CAPACITY", "200"))
+
+logger = logging.getLogger("company_search")
+if not logger.handlers:
+    _log_stream = logging.StreamHandler(sys.stderr)
+    _log_stream.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+    logger.addHandler(
+        logging.handlers.MemoryHandler(
+            LOG_BUFFER_CAPACITY, flushLevel=logging.ERROR, target=_log_stream
+        )
+    )
+    logger.propagate = False
+logger.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+atexit.register(lambda: flush_logs())
+
+
+# Add detailed logging function
+def log_debug(message, level="INFO"):
+    """Log debug information that will appear in Vercel logs"""
+    levelno = getattr(logging, level, logging.INFO)
+    if logger.isEnabledFor(levelno):
+        logger.log(levelno, message)
+
+
+def flush_logs() -> None:
+    """Write out buffered log records"""
+    for log_handler in logger.handlers:
+        log_handler.flush()
+
+
+# Shared event loop for synchronous callers (the Vercel handler in main.py).
+# The pipeline is async; sync code submits coroutines to this loop instead of
+# starting a fresh loop per request.
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide background event loop, starting it on first use"""
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="pipeline-loop", daemon=True
+            ).start()
+            _background_loop = loop
+    return _background_loop
+
+
+def started_background_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """The background event loop, or None if nothing has started it yet"""
+    return _background_loop
+
+
+def run_sync(coro, timeout: Optional[float] = None):
+    """Run a pipeline coroutine from synchronous code and return its result"""
+    future = asyncio.run_coroutine_threadsafe(coro, get_background_loop())
+    return future.result(timeout)
+
+
+def iterate_sync(agen: AsyncIterator):
+    """Iterate an async generator from synchronous code via the background loop"""
+    loop = get_background_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+
+def open_sqlite(path: str) -> sqlite3.Connection:
+    """Connection for a store that other threads and processes may share.
+
+    File databases are switched to WAL, so readers don't block on a writer
+    in another process, with synchronous=NORMAL (safe in WAL mode).
+    """
+    conn = sqlite3.connect(path or ":memory:", check_same_thread=False, timeout=5)
+    if path and path != ":memory:":
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def normalize_text(value: str) -> str:
+    """Case-fold and collapse whitespace so trivial edits share a cache key"""
+    return " ".join(value.split()).casefold()
+
+
+def search_cache_key(request: CompanySearchRequest) -> str:
+    """Cache key for a search request; tag order and duplicates are ignored"""
+    tags = sorted(
+        {normalize_text(tag) for tag in request.tags.split(",") if tag.strip()}
+    )
+    payload = json.dumps(
+        [normalize_text(request.name), normalize_text(request.personalNote), tags]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RateLimitExceeded(Exception):
+    """A provider call can't be admitted soon enough; retry after a while"""
+
+    def __init__(self, limiter: str, retry_after: float):
+        super().__init__(f"{limiter} rate limit reached, retry in {retry_after:.0f}s")
+        self.limiter = limiter
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def dumps_json(value) -> bytes:
+    """Compact UTF-8 JSON, through orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
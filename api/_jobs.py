@@ -0,0 +1,293 @@
+"""Asynchronous search jobs.
+
+A submitted search is queued and run by a fixed pool of workers on the
+background loop; clients poll (or long-poll) for the result instead of
+holding a connection open for the whole search. Jobs are kept in SQLite and
+expire JOB_TTL seconds after their last update.
+"""
+
+import asyncio
+import concurrent.futures
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from api._common import (
+    RateLimitExceeded,
+    get_background_loop,
+    log_debug,
+    open_sqlite,
+    started_background_loop,
+)
+from api._models import CompanySearchRequest, CompanySearchResponse, SearchJob
+
+JOB_STORE_PATH = os.environ.get(
+    "JOB_STORE_PATH", os.path.join(tempfile.gettempdir(), "company-search-jobs.db")
+)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_QUEUE_DEPTH = int(os.environ.get("JOB_QUEUE_DEPTH", "100"))
+JOB_TTL = float(os.environ.get("JOB_TTL", "3600"))
+JOB_MAX_WAIT = float(os.environ.get("JOB_MAX_WAIT", "25"))
+JOB_POLL_INTERVAL = 0.5
+JOB_FINISHED = ("done", "failed")
+
+
+class JobStore:
+    """SQLite-backed SearchJob records with expiry.
+
+    Rows past their expiry are ignored on read and deleted on write. An empty
+    path keeps jobs in an in-memory database private to this process.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            try:
+                conn = open_sqlite(self.path)
+            except sqlite3.Error as e:
+                log_debug(
+                    f"Job store unavailable, keeping jobs in memory: {e}", "ERROR"
+                )
+                self.path = ""
+                conn = open_sqlite("")
+            conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )""")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def save(self, job: SearchJob) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM jobs WHERE expires_at < ?", (time.time(),))
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?)",
+                (job.jobId, job.model_dump_json(), job.updatedAt + self.ttl),
+            )
+            conn.commit()
+
+    def get(self, job_id: str) -> Optional[SearchJob]:
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT data FROM jobs WHERE job_id = ? AND expires_at >= ?",
+                    (job_id, time.time()),
+                )
+                .fetchone()
+            )
+        return SearchJob.model_validate_json(row[0]) if row else None
+
+
+class JobQueueFull(Exception):
+    """The job queue is at its maximum depth"""
+
+    def __init__(self, depth: int, retry_after: int):
+        super().__init__(f"Job queue is full ({depth} jobs waiting)")
+        self.retry_after = retry_after
+
+
+class JobRunner:
+    """A fixed pool of job workers on the background loop.
+
+    submit() can be called from any thread. Completion is signalled through a
+    concurrent Future per job, so long-polls on the FastAPI loop and in
+    handler threads wake up as soon as the job finishes. Jobs submitted by
+    another process sharing the store are polled from SQLite instead. The
+    queue and workers only ever change on the background loop, so starting
+    them never blocks the caller, even when it runs on that loop.
+
+    Each job runs ``search(request, headers)`` with the ``forwarded_headers``
+    of the submitting request.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int,
+        max_queued: int,
+        search: Callable[
+            [CompanySearchRequest, dict], Awaitable[CompanySearchResponse]
+        ],
+        forwarded_headers: Sequence[str] = (),
+    ):
+        self.store = store
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.search = search
+        self.forwarded_headers = tuple(forwarded_headers)
+        self._lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._done: Dict[str, concurrent.futures.Future] = {}
+        # Running mean of job duration, for Retry-After; seeded with a
+        # typical live search
+        self._mean_seconds = 10.0
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _enqueue(self, item: tuple) -> None:
+        """Queue a job, starting the workers on first use (on the background loop)"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [
+                asyncio.ensure_future(self._worker(self._queue))
+                for _ in range(self.workers)
+            ]
+        self._queue.put_nowait(item)
+
+    async def _stop(self) -> None:
+        tasks, self._tasks, self._queue = self._tasks, [], None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        with self._lock:
+            self.queued = self.running = 0
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Cancel the workers at shutdown, dropping queued and running jobs;
+        a later submit() starts new ones"""
+        loop = started_background_loop()
+        if loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._stop(), loop)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not loop:
+            future.result(timeout)
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up"""
+        waves = self.queued / self.workers
+        return max(1, min(60, math.ceil(self._mean_seconds * waves)))
+
+    def submit(self, request: CompanySearchRequest, headers) -> SearchJob:
+        """Queue a search; raises JobQueueFull when ``max_queued`` jobs wait"""
+        with self._lock:
+            if self.queued >= self.max_queued:
+                self.rejected += 1
+                raise JobQueueFull(self.max_queued, self.retry_after())
+            self.queued += 1
+            now = time.time()
+            job = SearchJob(
+                jobId=uuid.uuid4().hex, status="queued", createdAt=now, updatedAt=now
+            )
+            self._done[job.jobId] = concurrent.futures.Future()
+        self.store.save(job)
+        forwarded = {name: headers.get(name) for name in self.forwarded_headers}
+        forwarded = {name: value for name, value in forwarded.items() if value}
+        get_background_loop().call_soon_threadsafe(
+            self._enqueue, (job, request, forwarded)
+        )
+        log_debug(f"Queued search job {job.jobId} for {request.name}")
+        return job
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            job, request, headers = await queue.get()
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+            started = time.perf_counter()
+            try:
+                job = await self._run_job(job, request, headers)
+            except Exception as e:
+                # One job must never take its worker down with it
+                log_debug(f"Search job {job.jobId} crashed: {e}", "ERROR")
+                job = job.model_copy(
+                    update={
+                        "status": "failed",
+                        "error": str(e),
+                        "updatedAt": time.time(),
+                    }
+                )
+
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.running -= 1
+                if job.status == "done":
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self._mean_seconds = 0.8 * self._mean_seconds + 0.2 * elapsed
+                done = self._done.pop(job.jobId, None)
+            if done is not None:
+                done.set_result(job)
+
+    async def _run_job(
+        self, job: SearchJob, request: CompanySearchRequest, headers
+    ) -> SearchJob:
+        job = job.model_copy(update={"status": "running", "updatedAt": time.time()})
+        await self._save(job)
+        try:
+            response = await self.search(request, headers)
+            update = {"status": "done", "result": response}
+        except RateLimitExceeded as e:
+            update = {
+                "status": "failed",
+                "error": str(e),
+                "retryAfter": e.retry_after,
+            }
+        except Exception as e:
+            log_debug(f"Search job {job.jobId} failed: {e}", "ERROR")
+            update = {"status": "failed", "error": str(e)}
+        job = job.model_copy(update={**update, "updatedAt": time.time()})
+        await self._save(job)
+        return job
+
+    async def _save(self, job: SearchJob) -> None:
+        try:
+            await asyncio.to_thread(self.store.save, job)
+        except sqlite3.Error as e:
+            log_debug(f"Job store write failed: {e}", "ERROR")
+
+    async def wait(self, job_id: str, timeout: float = 0.0) -> Optional[SearchJob]:
+        """The job, waiting up to ``timeout`` seconds for it to finish"""
+        until = time.monotonic() + timeout
+        while True:
+            job = await asyncio.to_thread(self.store.get, job_id)
+            remaining = until - time.monotonic()
+            if job is None or job.status in JOB_FINISHED or remaining <= 0:
+                return job
+            done = self._done.get(job_id)
+            if done is None:
+                await asyncio.sleep(min(JOB_POLL_INTERVAL, remaining))
+                continue
+            try:
+                # Shield so a timed-out waiter doesn't cancel the job's Future
+                return await asyncio.wait_for(
+                    asyncio.shield(asyncio.wrap_future(done)), remaining
+                )
+            except asyncio.TimeoutError:
+                continue
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "store": self.store.path or None,
+                "workers": self.workers,
+                "max_queued": self.max_queued,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
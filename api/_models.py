@@ -0,0 +1,70 @@
+"""Pydantic models of the company search API"""
+
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+# Pydantic models for database schema
+class CompanyMaster(BaseModel):
+    id: Optional[str] = None
+    name: str
+    websiteUrl: Optional[str] = None
+    wikipediaUrl: Optional[str] = None
+    linkedinUrl: Optional[str] = None
+    logoUrl: Optional[str] = None
+    description: Optional[str] = None
+    industry: Optional[str] = None
+    tagsMaster: List[str] = Field(default_factory=list)
+    naicsCode: Optional[str] = None
+    stillInBusiness: Optional[bool] = None
+
+
+class Company(BaseModel):
+    id: Optional[str] = None
+    name: Optional[str] = None
+    tags: List[str] = Field(default_factory=list)
+    personalNote: Optional[str] = None
+    companyMasterId: Optional[str] = None
+
+
+# API request/response models
+class CompanySearchRequest(BaseModel):
+    name: str
+    personalNote: str
+    tags: str
+
+
+class SimilarCompanyResult(BaseModel):
+    company: CompanyMaster
+    justification: str
+
+
+class SearchMetadata(BaseModel):
+    source: str  # "cache", "local" or "live"
+    model: Optional[str] = None
+    llmMode: Optional[str] = None  # "single" or "map_reduce" for live answers
+    degradations: List[str] = Field(default_factory=list)
+    elapsedMs: Optional[float] = None
+    deadlineMs: Optional[float] = None
+
+
+class CompanySearchResponse(BaseModel):
+    inputCompany: CompanySearchRequest
+    similarCompanies: List[SimilarCompanyResult]
+    metadata: Optional[SearchMetadata] = None
+
+
+class CompanySearchBatchRequest(BaseModel):
+    items: List[CompanySearchRequest]
+    concurrency: Optional[int] = None
+
+
+class SearchJob(BaseModel):
+    jobId: str
+    status: str  # "queued", "running", "done" or "failed"
+    createdAt: float
+    updatedAt: float
+    result: Optional[CompanySearchResponse] = None
+    error: Optional[str] = None
+    retryAfter: Optional[int] = None
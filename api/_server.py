@@ -0,0 +1,63 @@
+"""Standalone serving of the Vercel handler (local development, benchmarks).
+
+Vercel drives the handler class itself, so none of this runs there.
+"""
+
+import concurrent.futures
+import os
+from http.server import HTTPServer, ThreadingHTTPServer
+
+HANDLER_SERVER_MODE = os.environ.get("HANDLER_SERVER_MODE", "pool")
+HANDLER_WORKERS = int(os.environ.get("HANDLER_WORKERS", "8"))
+HANDLER_KEEPALIVE_TIMEOUT = float(os.environ.get("HANDLER_KEEPALIVE_TIMEOUT", "5"))
+
+
+class WorkerPoolHTTPServer(HTTPServer):
+    """HTTPServer that handles connections on a fixed pool of worker threads"""
+
+    def __init__(self, server_address, handler_class, workers: int = HANDLER_WORKERS):
+        super().__init__(server_address, handler_class)
+        self.workers = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="handler"
+        )
+
+    def process_request(self, request, client_address):
+        self.workers.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.workers.shutdown(wait=False, cancel_futures=True)
+
+
+def create_handler_server(
+    server_address,
+    handler_class,
+    mode: str = HANDLER_SERVER_MODE,
+    workers: int = HANDLER_WORKERS,
+) -> HTTPServer:
+    """Serve a handler class (main.handler): "single" (one request at a
+    time), "threaded" (a thread per connection) or "pool" (a fixed number of
+    worker threads)
+
+    Idle keep-alive connections are closed after HANDLER_KEEPALIVE_TIMEOUT so
+    they don't hold a worker indefinitely.
+    """
+
+    class KeepAliveHandler(handler_class):
+        timeout = HANDLER_KEEPALIVE_TIMEOUT
+
+    if mode == "single":
+        return HTTPServer(server_address, KeepAliveHandler)
+    if mode == "threaded":
+        return ThreadingHTTPServer(server_address, KeepAliveHandler)
+    if mode == "pool":
+        return WorkerPoolHTTPServer(server_address, KeepAliveHandler, workers)
+    raise ValueError(f"Unknown handler server mode: {mode}")
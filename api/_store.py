@@ -0,0 +1,255 @@
+"""Local CompanyMaster store with a TF-IDF / tag-overlap similarity index"""
+
+import math
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from api._common import log_debug, normalize_text, open_sqlite
+from api._models import CompanyMaster, CompanySearchRequest, SimilarCompanyResult
+
+
+def split_tags(tags: str) -> set:
+    return {normalize_text(tag) for tag in tags.split(",") if tag.strip()}
+
+
+class CompanyStore:
+    """SQLite-backed CompanyMaster records with an in-memory similarity index.
+
+    Records are keyed by normalized company name. ``context`` accumulates the
+    notes and tags of the searches that surfaced a company, which helps match
+    future searches phrased the same way. The TF-IDF index is rebuilt lazily
+    after writes. ``index_terms`` splits text into index terms; matches
+    scoring below ``min_score`` are dropped.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        index_terms: Callable[[str], List[str]],
+        min_score: float,
+    ):
+        self.path = path
+        self.index_terms = index_terms
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._fts = False
+        self._index: Optional[dict] = None
+        self.local_serves = 0
+        self.prefills = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and self.path:
+            try:
+                conn = open_sqlite(self.path)
+                conn.execute("""CREATE TABLE IF NOT EXISTS companies (
+                        name_key TEXT PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        data TEXT NOT NULL,
+                        context TEXT NOT NULL DEFAULT '',
+                        seen_count INTEGER NOT NULL DEFAULT 1,
+                        updated_at REAL NOT NULL
+                    )""")
+                try:
+                    conn.execute(
+                        "CREATE VIRTUAL TABLE IF NOT EXISTS companies_fts "
+                        "USING fts5(name_key UNINDEXED, name, description, industry, tags, context)"
+                    )
+                    self._fts = True
+                except sqlite3.OperationalError:
+                    log_debug("SQLite FTS5 unavailable, using the in-memory index only")
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                log_debug(f"Company store unavailable: {e}", "ERROR")
+                self.path = ""
+        return self._conn
+
+    def upsert(
+        self, input_company: CompanySearchRequest, results: List[SimilarCompanyResult]
+    ) -> None:
+        """Persist the companies of a completed search"""
+        context_words = f"{input_company.personalNote} {input_company.tags}"
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                for result in results:
+                    company = result.company
+                    key = normalize_text(company.name)
+                    if not key:
+                        continue
+                    row = conn.execute(
+                        "SELECT context FROM companies WHERE name_key = ?", (key,)
+                    ).fetchone()
+                    context = " ".join(
+                        dict.fromkeys(
+                            ((row[0] if row else "") + " " + context_words).split()
+                        )
+                    )[-2000:]
+                    data = company.model_dump_json()
+                    conn.execute(
+                        """INSERT INTO companies (name_key, name, data, context, updated_at)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(name_key) DO UPDATE SET
+                            name = excluded.name, data = excluded.data,
+                            context = excluded.context,
+                            seen_count = seen_count + 1,
+                            updated_at = excluded.updated_at""",
+                        (key, company.name, data, context, time.time()),
+                    )
+                    if self._fts:
+                        conn.execute(
+                            "DELETE FROM companies_fts WHERE name_key = ?", (key,)
+                        )
+                        conn.execute(
+                            "INSERT INTO companies_fts VALUES (?, ?, ?, ?, ?, ?)",
+                            (
+                                key,
+                                company.name,
+                                company.description or "",
+                                company.industry or "",
+                                " ".join(company.tagsMaster),
+                                context,
+                            ),
+                        )
+                conn.commit()
+                self._index = None
+            except sqlite3.Error as e:
+                log_debug(f"Company store write failed: {e}", "ERROR")
+
+    def _load_index(self, conn: sqlite3.Connection) -> dict:
+        """Build TF-IDF vectors for every stored company"""
+        if self._index is not None:
+            return self._index
+        docs = {}
+        document_frequency: Dict[str, int] = {}
+        for key, data, context in conn.execute(
+            "SELECT name_key, data, context FROM companies"
+        ):
+            company = CompanyMaster.model_validate_json(data)
+            counts: Dict[str, int] = {}
+            text = " ".join(
+                [
+                    company.description or "",
+                    company.industry or "",
+                    " ".join(company.tagsMaster),
+                    context,
+                ]
+            )
+            for term in self.index_terms(text):
+                counts[term] = counts.get(term, 0) + 1
+            for term in counts:
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+            docs[key] = (company, counts)
+
+        total = len(docs)
+        idf = {
+            term: math.log((total + 1) / (df + 1)) + 1.0
+            for term, df in document_frequency.items()
+        }
+        vectors = {}
+        for key, (company, counts) in docs.items():
+            vector = {term: count * idf[term] for term, count in counts.items()}
+            norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+            vectors[key] = (
+                company,
+                {term: weight / norm for term, weight in vector.items()},
+            )
+        self._index = {"idf": idf, "vectors": vectors}
+        return self._index
+
+    def _fts_candidates(self, conn: sqlite3.Connection, terms: List[str]) -> List[str]:
+        # Index terms are crudely stemmed, so match them as prefixes
+        query = " OR ".join(f'"{term}"*' for term in sorted(set(terms)))
+        if not query:
+            return []
+        try:
+            rows = conn.execute(
+                "SELECT name_key FROM companies_fts WHERE companies_fts MATCH ? "
+                "ORDER BY bm25(companies_fts) LIMIT 100",
+                (query,),
+            ).fetchall()
+        except sqlite3.Error:
+            return []
+        return [row[0] for row in rows]
+
+    def find_similar(
+        self, input_company: CompanySearchRequest, limit: int = 5
+    ) -> List[Tuple[float, CompanyMaster, List[str]]]:
+        """Stored companies most similar to the request, best first.
+
+        Score is 0.7 x TF-IDF cosine similarity with the request's note and
+        tags plus 0.3 x Jaccard overlap between request tags and tagsMaster.
+        Returns (score, company, shared_tags) tuples scoring at least
+        ``min_score``.
+        """
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return []
+            try:
+                index = self._load_index(conn)
+                terms = self.index_terms(
+                    f"{input_company.personalNote} {input_company.tags}"
+                )
+                keys = (
+                    self._fts_candidates(conn, terms)
+                    if self._fts
+                    else list(index["vectors"])
+                )
+            except sqlite3.Error as e:
+                log_debug(f"Company store read failed: {e}", "ERROR")
+                return []
+
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        query_vector = {
+            term: count * index["idf"].get(term, 0.0) for term, count in counts.items()
+        }
+        norm = math.sqrt(sum(w * w for w in query_vector.values())) or 1.0
+        request_tags = split_tags(input_company.tags)
+        input_key = normalize_text(input_company.name)
+
+        matches = []
+        for key in keys:
+            if key == input_key or key not in index["vectors"]:
+                continue
+            company, vector = index["vectors"][key]
+            cosine = (
+                sum(
+                    weight * vector.get(term, 0.0)
+                    for term, weight in query_vector.items()
+                )
+                / norm
+            )
+            company_tags = {normalize_text(tag) for tag in company.tagsMaster}
+            shared = sorted(request_tags & company_tags)
+            union = request_tags | company_tags
+            overlap = len(shared) / len(union) if union else 0.0
+            score = 0.7 * cosine + 0.3 * overlap
+            if score >= self.min_score:
+                matches.append((score, company, shared))
+
+        matches.sort(key=lambda match: (-match[0], match[1].name))
+        return matches[:limit]
+
+    def count(self) -> int:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return 0
+            return conn.execute("SELECT COUNT(*) FROM companies").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path or None,
+            "fts5": self._fts,
+            "companies": self.count(),
+            "local_serves": self.local_serves,
+            "prefills": self.prefills,
+        }
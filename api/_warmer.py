@@ -0,0 +1,415 @@
+"""Request log and cache warming.
+
+When REQUEST_LOG_PATH is set, every search is appended to a JSONL request
+log; the cache warmer mines it for the most requested searches and refreshes
+their cached results shortly before they expire, within a budget of provider
+calls per cycle. It runs in-process every CACHE_WARM_INTERVAL seconds, or
+from run-cache-warmer.py.
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from api._common import (
+    RateLimitExceeded,
+    dumps_json,
+    get_background_loop,
+    log_debug,
+    search_cache_key,
+)
+from api._models import CompanySearchRequest
+
+# While the cache warmer refreshes a search (see CacheWarmer), cached Tavily
+# responses and entity facts that expire within this many seconds count as
+# expired, so the refresh renews them instead of reusing them
+cache_refresh_margin: ContextVar[float] = ContextVar(
+    "cache_refresh_margin", default=0.0
+)
+
+
+REQUEST_LOG_PATH = os.environ.get("REQUEST_LOG_PATH", "")
+REQUEST_LOG_MAX_BYTES = int(os.environ.get("REQUEST_LOG_MAX_BYTES", "16777216"))
+CACHE_WARM_INTERVAL = float(os.environ.get("CACHE_WARM_INTERVAL", "0"))
+CACHE_WARM_WINDOW = float(os.environ.get("CACHE_WARM_WINDOW", "86400"))
+CACHE_WARM_TOP_KEYS = int(os.environ.get("CACHE_WARM_TOP_KEYS", "20"))
+CACHE_WARM_MIN_REQUESTS = int(os.environ.get("CACHE_WARM_MIN_REQUESTS", "2"))
+CACHE_WARM_REFRESH_AHEAD = float(os.environ.get("CACHE_WARM_REFRESH_AHEAD", "600"))
+CACHE_WARM_BUDGET = int(os.environ.get("CACHE_WARM_BUDGET", "100"))
+CACHE_WARM_CONCURRENCY = int(os.environ.get("CACHE_WARM_CONCURRENCY", "2"))
+# Provider calls assumed per refresh until one has been measured: an
+# advanced search, five detailed searches and the LLM call
+CACHE_WARM_COST_ESTIMATE = 7.0
+
+
+class RequestLog:
+    """Append-only JSONL log of searches and where they were answered from.
+
+    Each line holds the time, the search cache key, the source ("cache",
+    "local", "live" or "error") and the request body, so the log can also be
+    replayed with run-benchmark.py --input. Request bodies include personal
+    notes, so the file is created readable by its owner only. Every server
+    process appends to the same file, which is rotated to ``<path>.1`` past
+    ``max_bytes``.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._file = None
+        self.written = 0
+
+    def _open(self):
+        """The log file, reopened when another process has rotated it"""
+        if self._file is not None:
+            try:
+                rotated = (
+                    os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+                )
+            except OSError:
+                rotated = True
+            if rotated:
+                self._file.close()
+                self._file = None
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Unbuffered: each line is a single append, so processes don't
+            # interleave partial lines
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            self._file = os.fdopen(fd, "ab", buffering=0)
+        return self._file
+
+    def write(self, entry: dict) -> None:
+        if not self.path:
+            return
+        line = dumps_json(entry) + b"\n"
+        with self._lock:
+            try:
+                log_file = self._open()
+                log_file.write(line)
+                self.written += 1
+                if self.max_bytes and log_file.tell() >= self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+                    log_file.close()
+                    self._file = None
+            except OSError as e:
+                log_debug(f"Request log write failed: {e}", "ERROR")
+
+    def append(self, request: CompanySearchRequest, source: str) -> None:
+        self.write(
+            {
+                "ts": round(time.time(), 3),
+                "key": search_cache_key(request),
+                "source": source,
+                "body": request.model_dump(),
+            }
+        )
+
+    def read(self, since: float = 0.0) -> List[dict]:
+        """Entries logged at or after ``since``, oldest first"""
+        entries = []
+        for path in (self.path + ".1", self.path) if self.path else ():
+            try:
+                with open(path, "rb") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        if isinstance(entry, dict) and entry.get("ts", 0) >= since:
+                            entries.append(entry)
+            except OSError:
+                continue
+        return entries
+
+
+def hot_searches(
+    entries: List[dict], top_keys: int, min_requests: int
+) -> List[Tuple[str, dict, int]]:
+    """The most requested searches in the log as (cache key, body, requests).
+
+    Searches requested fewer than ``min_requests`` times are left out; ties
+    go to the most recently requested.
+    """
+    counts: Dict[str, int] = {}
+    latest: Dict[str, Tuple[float, dict]] = {}
+    for entry in entries:
+        key, body = entry.get("key"), entry.get("body")
+        if not key or not isinstance(body, dict):
+            continue
+        counts[key] = counts.get(key, 0) + 1
+        latest[key] = (entry.get("ts", 0), body)
+    ranked = sorted(
+        (key for key, count in counts.items() if count >= min_requests),
+        key=lambda key: (-counts[key], -latest[key][0]),
+    )
+    return [(key, latest[key][1], counts[key]) for key in ranked[:top_keys]]
+
+
+def cache_hit_rates(entries: List[dict], keys: Optional[set] = None) -> dict:
+    """Search-cache hit rate of the logged searches (only ``keys``, if given)
+    before and since the first warm cycle in the log"""
+    warmed_at = min(
+        (entry.get("ts", 0) for entry in entries if entry.get("event") == "warm"),
+        default=None,
+    )
+    before: List[bool] = []
+    since: List[bool] = []
+    for entry in entries:
+        if "body" not in entry or (keys is not None and entry.get("key") not in keys):
+            continue
+        warmed = warmed_at is not None and entry.get("ts", 0) >= warmed_at
+        (since if warmed else before).append(entry.get("source") == "cache")
+
+    def rate(hits: List[bool]) -> Optional[float]:
+        return round(sum(hits) / len(hits), 4) if hits else None
+
+    rates = {
+        "requests": len(before) + len(since),
+        "beforeWarming": rate(before),
+        "sinceWarming": rate(since),
+        "gain": None,
+    }
+    if before and since:
+        rates["gain"] = round(rates["sinceWarming"] - rates["beforeWarming"], 4)
+    return rates
+
+
+class ProviderBudget:
+    """Provider calls (Tavily searches and LLM calls) a warm cycle may spend"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.spent = 0
+
+    @property
+    def remaining(self) -> int:
+        return self.limit - self.spent
+
+
+provider_budget: ContextVar[Optional[ProviderBudget]] = ContextVar(
+    "provider_budget", default=None
+)
+
+
+def charge_provider_call() -> None:
+    """Count a Tavily or LLM call against the warm cycle making it, if any"""
+    budget = provider_budget.get()
+    if budget is not None:
+        budget.spent += 1
+
+
+class CacheWarmer:
+    """Refreshes the most requested searches before their cached results expire.
+
+    Each cycle reads the last ``window`` seconds of the request log, keeps
+    the ``top_keys`` searches requested at least ``min_requests`` times and
+    re-runs, at low priority and bypassing the search cache, those whose
+    cached result is missing or expires within ``refresh_ahead`` seconds.
+    Tavily responses and entity facts that close to expiry are renewed by the
+    same refresh. No refresh starts once the next one would likely overrun
+    ``budget`` provider calls. With a shared cache, one process per interval
+    warms it.
+
+    ``cache`` is the search cache (main.search_cache) and ``search(request)``
+    re-runs a search, returning where it was answered from.
+    """
+
+    def __init__(
+        self,
+        log: RequestLog,
+        cache,
+        search: Callable[[CompanySearchRequest], Awaitable[str]],
+        interval: float = CACHE_WARM_INTERVAL,
+        window: float = CACHE_WARM_WINDOW,
+        top_keys: int = CACHE_WARM_TOP_KEYS,
+        min_requests: int = CACHE_WARM_MIN_REQUESTS,
+        refresh_ahead: float = CACHE_WARM_REFRESH_AHEAD,
+        budget: int = CACHE_WARM_BUDGET,
+        concurrency: int = CACHE_WARM_CONCURRENCY,
+    ):
+        self.log = log
+        self.cache = cache
+        self.search = search
+        self.interval = interval
+        self.window = window
+        self.top_keys = top_keys
+        self.min_requests = min_requests
+        # An entry must not expire between two cycles
+        self.refresh_ahead = max(refresh_ahead, interval)
+        self.budget = budget
+        self.concurrency = max(1, concurrency)
+        self._lock = threading.Lock()
+        self._future: Optional[concurrent.futures.Future] = None
+        self.cycles = 0
+        self.refreshed = 0
+        self.provider_calls = 0
+        self.last_report: Optional[dict] = None
+
+    def _acquire_lease(self) -> bool:
+        """Whether this process warms this cycle; the lease outlives one
+        interval so its holder keeps it while it is running"""
+        shared = self.cache.shared
+        if shared is None or self.interval <= 0:
+            return True
+        owner = str(os.getpid()).encode("utf-8")
+        lease = shared.get("warm", "lease", self.interval * 1.5)
+        if lease is not None and lease[1] != owner:
+            return False
+        shared.set("warm", "lease", owner, self.interval * 1.5)
+        return True
+
+    async def run_cycle(self, dry_run: bool = False) -> dict:
+        """Run one warm cycle and return its report; ``dry_run`` only ranks
+        the hot searches and reports hit rates"""
+        started = time.time()
+        report = {"startedAt": round(started, 3), "dryRun": dry_run}
+        if not dry_run and not await asyncio.to_thread(self._acquire_lease):
+            report["skipped"] = "another process holds the warm lease"
+            return report
+
+        entries = await asyncio.to_thread(self.log.read, started - self.window)
+        hot = hot_searches(entries, self.top_keys, self.min_requests)
+        report["hitRate"] = cache_hit_rates(entries)
+        report["hotHitRate"] = cache_hit_rates(entries, {key for key, _, _ in hot})
+        if not dry_run:
+            await asyncio.to_thread(
+                self.log.write, {"ts": round(started, 3), "event": "warm"}
+            )
+
+        searches = []
+        for key, body, requests in hot:
+            expires_in = await asyncio.to_thread(self.cache.expires_in, key)
+            searches.append(
+                {
+                    "name": body.get("name"),
+                    "tags": body.get("tags"),
+                    "requests": requests,
+                    "expiresIn": None if expires_in is None else round(expires_in),
+                    "action": (
+                        "fresh"
+                        if expires_in is not None and expires_in > self.refresh_ahead
+                        else "refresh"
+                    ),
+                }
+            )
+        budget = ProviderBudget(self.budget)
+        if not dry_run:
+            stale = [
+                (body, search)
+                for (_, body, _), search in zip(hot, searches)
+                if search["action"] == "refresh"
+            ]
+            await self._refresh(stale, budget)
+
+        counts: Dict[str, int] = {}
+        for search in searches:
+            counts[search["action"]] = counts.get(search["action"], 0) + 1
+        report.update(
+            hotSearches=len(hot),
+            actions=counts,
+            providerCalls=budget.spent,
+            budget=self.budget,
+            durationMs=round((time.time() - started) * 1000, 1),
+            searches=searches,
+        )
+        if not dry_run:
+            with self._lock:
+                self.cycles += 1
+                self.refreshed += counts.get("refreshed", 0)
+                self.provider_calls += budget.spent
+                self.last_report = report
+            log_debug(
+                f"Cache warm cycle: {len(hot)} hot searches, {counts}, "
+                f"{budget.spent}/{self.budget} provider calls"
+            )
+        return report
+
+    async def _refresh(
+        self, stale: List[Tuple[dict, dict]], budget: ProviderBudget
+    ) -> None:
+        """Re-run the stale (body, report entry) searches, hottest first,
+        until the budget runs out, recording each outcome in its entry"""
+        pending = stale[::-1]
+        finished = 0
+
+        async def worker() -> None:
+            nonlocal finished
+            while pending:
+                cost = budget.spent / finished if finished else CACHE_WARM_COST_ESTIMATE
+                if budget.remaining <= 0 or budget.remaining < cost:
+                    return
+                body, search = pending.pop()
+                try:
+                    source = await self.search(CompanySearchRequest(**body))
+                    search["action"] = "refreshed" if source == "live" else source
+                except RateLimitExceeded:
+                    # Leave the remaining quota to user traffic
+                    search["action"] = "rate_limited"
+                    pending.clear()
+                except Exception as e:
+                    log_debug(f"Cache warm refresh of {body.get('name')} failed: {e}")
+                    search["action"] = "failed"
+                finished += 1
+
+        budget_token = provider_budget.set(budget)
+        margin_token = cache_refresh_margin.set(self.refresh_ahead)
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        finally:
+            cache_refresh_margin.reset(margin_token)
+            provider_budget.reset(budget_token)
+        for _, search in pending:
+            search["action"] = "over_budget"
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_cycle()
+            except Exception as e:
+                log_debug(f"Cache warm cycle failed: {e}", "ERROR")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Run a cycle every ``interval`` seconds on the background loop"""
+        with self._lock:
+            if self._future is None and self.interval > 0 and self.log.path:
+                self._future = asyncio.run_coroutine_threadsafe(
+                    self._run(), get_background_loop()
+                )
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._future is not None:
+                self._future.cancel()
+                self._future = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            last = self.last_report
+            return {
+                "running": self._future is not None,
+                "log": self.log.path or None,
+                "logged": self.log.written,
+                "interval_seconds": self.interval,
+                "window_seconds": self.window,
+                "refresh_ahead_seconds": self.refresh_ahead,
+                "budget": self.budget,
+                "cycles": self.cycles,
+                "refreshed": self.refreshed,
+                "provider_calls": self.provider_calls,
+                # Company names stay out of the stats endpoint
+                "last_cycle": (
+                    {key: value for key, value in last.items() if key != "searches"}
+                    if last
+                    else None
+                ),
+            }
@@ -1,66 +1,305 @@
+import asyncio
+import concurrent.futures
+import gzip
+import hashlib
+import heapq
 import json
+import math
 import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
 import traceback
 import sys
-from typing import List, Optional
-from fastapi import FastAPI, HTTPException
+import weakref
+from collections import OrderedDict
+from contextlib import aclosing, asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
-from tavily import TavilyClient
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
+
+# Optional accelerator: brotli for the "br" content encoding. Without it
+# responses fall back to gzip.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Vercel loads this file by path rather than as api.main, so make the
+# project root importable for the api._* modules split out of it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api._common import (
+    RateLimitExceeded,
+    dumps_json,
+    flush_logs,
+    get_background_loop,
+    iterate_sync,
+    log_debug,
+    normalize_text,
+    open_sqlite,
+    run_sync,
+    search_cache_key,
+)
+from api._jobs import (
+    JOB_MAX_WAIT,
+    JOB_QUEUE_DEPTH,
+    JOB_STORE_PATH,
+    JOB_TTL,
+    JOB_WORKERS,
+    JobQueueFull,
+    JobRunner,
+    JobStore,
+)
+from api._models import (
+    CompanyMaster,
+    CompanySearchBatchRequest,
+    CompanySearchRequest,
+    CompanySearchResponse,
+    SearchJob,
+    SearchMetadata,
+    SimilarCompanyResult,
+)
+from api._store import CompanyStore
+from api._warmer import (
+    REQUEST_LOG_MAX_BYTES,
+    REQUEST_LOG_PATH,
+    CacheWarmer,
+    RequestLog,
+    cache_refresh_margin,
+    charge_provider_call,
+)
+
+if TYPE_CHECKING:
+    # The provider stacks are slow to import, so they load on first use (or
+    # via warm-up) instead of on every cold start; see load_providers()
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_groq import ChatGroq
+    from tavily import AsyncTavilyClient
+
+
+# Metrics, exported in the Prometheus text format on /metrics
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(self, name: str, help_text: str, buckets, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # One count per bucket, then the sum and the total count
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series_items = sorted(self._series.items())
+            series_items = [(key, list(values)) for key, values in series_items]
+        for key, values in series_items:
+            base = [f'{label}="{value}"' for label, value in zip(self.labels, key)]
+            for bound, count in zip(self.buckets, values):
+                le = ",".join(base + [f'le="{bound:g}"'])
+                lines.append(f"{self.name}_bucket{{{le}}} {count}")
+            le = ",".join(base + ['le="+Inf"'])
+            lines.append(f"{self.name}_bucket{{{le}}} {values[-1]}")
+            suffix = "{" + ",".join(base) + "}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {values[-2]:.6f}")
+            lines.append(f"{self.name}_count{suffix} {values[-1]}")
+        return lines
+
 
+class Counter:
+    """Monotonic counter with optional labels"""
 
-# Add detailed logging function
-def log_debug(message, level="INFO"):
-    """Log debug information that will appear in Vercel logs"""
-    print(f"[{level}] {message}", file=sys.stderr)
-    sys.stderr.flush()
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, float] = {}
 
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            labels = ",".join(
+                f'{label}="{label_value}"'
+                for label, label_value in zip(self.labels, key)
+            )
+            lines.append(f"{self.name}{{{labels}}} {value:g}")
+        return lines
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+request_seconds = Histogram(
+    "company_search_request_seconds",
+    "Time to handle a request, by endpoint",
+    LATENCY_BUCKETS,
+    labels=("endpoint", "status"),
+)
+stage_seconds = Histogram(
+    "company_search_stage_seconds",
+    "Time spent in each pipeline stage",
+    LATENCY_BUCKETS,
+    labels=("stage", "status"),
+)
+llm_tokens = Histogram(
+    "company_search_llm_tokens",
+    "Tokens per LLM call (reported by the provider, else estimated)",
+    TOKEN_BUCKETS,
+    labels=("kind",),
+)
+cache_lookups = Counter(
+    "company_search_cache_lookups_total",
+    "Cache lookups by cache and result",
+    labels=("cache", "result"),
+)
+llm_answers = Counter(
+    "company_search_llm_answers_total",
+    "LLM answers by outcome: complete, salvaged (partial, not repaired), "
+    "repaired, or failed",
+    labels=("outcome",),
+)
+METRICS = [request_seconds, stage_seconds, llm_tokens, cache_lookups, llm_answers]
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
 
-# Pydantic models for database schema
-class CompanyMaster(BaseModel):
-    id: Optional[str] = None
-    name: str
-    websiteUrl: Optional[str] = None
-    wikipediaUrl: Optional[str] = None
-    linkedinUrl: Optional[str] = None
-    logoUrl: Optional[str] = None
-    description: Optional[str] = None
-    industry: Optional[str] = None
-    tagsMaster: List[str] = Field(default_factory=list)
-    naicsCode: Optional[str] = None
-    stillInBusiness: Optional[bool] = None
+
+# Spans recorded for the current request, logged as one line when it ends
+request_trace: ContextVar[Optional[List[dict]]] = ContextVar(
+    "request_trace", default=None
+)
 
 
-class Company(BaseModel):
-    id: Optional[str] = None
-    name: Optional[str] = None
-    tags: List[str] = Field(default_factory=list)
-    personalNote: Optional[str] = None
-    companyMasterId: Optional[str] = None
+@contextmanager
+def span(stage: str, **attributes):
+    """Time a pipeline stage into stage_seconds and the current request trace.
 
+    Yields the span's attribute dict so the stage can add details (token
+    counts, result sizes) before it ends.
+    """
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield attributes
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        stage_seconds.observe(duration, stage=stage, status=status)
+        trace = request_trace.get()
+        if trace is not None:
+            trace.append(
+                {
+                    "stage": stage,
+                    "ms": round(duration * 1000, 1),
+                    "status": status,
+                    **attributes,
+                }
+            )
 
-# API request/response models
-class CompanySearchRequest(BaseModel):
-    name: str
-    personalNote: str
-    tags: str
 
+@contextmanager
+def request_span(endpoint: str, **attributes):
+    """Collect the spans of one request, then record and log them together.
 
-class SimilarCompanyResult(BaseModel):
-    company: CompanyMaster
-    justification: str
+    Yields the request's attribute dict, included in the logged line.
+    """
+    trace: List[dict] = []
+    token = request_trace.set(trace)
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield attributes
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        try:
+            request_trace.reset(token)
+        except ValueError:
+            # A streaming body can be closed from a different context
+            pass
+        duration = time.perf_counter() - started
+        request_seconds.observe(duration, endpoint=endpoint, status=status)
+        log_debug(
+            json.dumps(
+                {
+                    "event": "request",
+                    "endpoint": endpoint,
+                    "status": status,
+                    "ms": round(duration * 1000, 1),
+                    **attributes,
+                    "spans": trace,
+                }
+            )
+        )
+        flush_logs()
 
 
-class CompanySearchResponse(BaseModel):
-    inputCompany: CompanySearchRequest
-    similarCompanies: List[SimilarCompanyResult]
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    cache_warmer.start()
+    yield
+    cache_warmer.stop()
+    await asyncio.to_thread(job_runner.close)
+    await close_provider_clients()
 
 
 # Create FastAPI app
-app = FastAPI(title="Company Search API")
+app = FastAPI(title="Company Search API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -69,6 +308,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Cache", "Retry-After"],
 )
 
 # Environment variables
@@ -78,126 +318,69 @@ TAVILY_API_KEY = os.environ.get("TAVILY_API_KEY") or os.getenv("TAVILY_API_KEY")
 log_debug(f"GROQ_API_KEY present: {'Yes' if GROQ_API_KEY else 'No'}")
 log_debug(f"TAVILY_API_KEY present: {'Yes' if TAVILY_API_KEY else 'No'}")
 
+# Prompt assembly
+LLM_PROMPT_TOKEN_BUDGET = int(os.environ.get("LLM_PROMPT_TOKEN_BUDGET", "6000"))
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", "0.8"))
 
-# Health check endpoint
-@app.get("/")
-async def health_check():
-    return {
-        "status": "healthy",
-        "service": "Company Search API",
-        "groq_key_present": bool(GROQ_API_KEY),
-        "tavily_key_present": bool(TAVILY_API_KEY),
-    }
-
-
-@app.get("/health")
-async def health():
-    return {"status": "ok"}
-
-
-def search_similar_companies(name: str, personal_note: str, tags: str) -> List[dict]:
-    """Search for similar companies using Tavily with enhanced detail search"""
-    if not TAVILY_API_KEY:
-        log_debug("Tavily API key not configured", "ERROR")
-        return []
-
-    try:
-        tavily_client = TavilyClient(api_key=TAVILY_API_KEY)
-
-        # Step 1: Initial broad search to identify similar companies
-        search_query = f"companies similar to {name} in {personal_note} industry with focus on {tags}"
-        log_debug(f"Initial search query: {search_query}")
-
-        initial_response = tavily_client.search(search_query, search_depth="advanced")
-
-        # Step 2: Extract potential company names from initial results
-        initial_results = []
-        company_names = set()
+# Batch search limits
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "500"))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "4"))
 
-        for result in initial_response.get("results", [])[:8]:  # Get top 8 results
-            initial_results.append(
-                {
-                    "title": result.get("title", ""),
-                    "content": result.get("content", ""),
-                    "url": result.get("url", ""),
-                    "published_date": result.get("published_date", ""),
-                }
-            )
+# Detailed per-candidate search tuning
+DETAILED_SEARCH_CANDIDATES = int(os.environ.get("DETAILED_SEARCH_CANDIDATES", "5"))
+TAVILY_DETAILED_CONCURRENCY = int(os.environ.get("TAVILY_DETAILED_CONCURRENCY", "5"))
+TAVILY_DETAILED_TIMEOUT = float(os.environ.get("TAVILY_DETAILED_TIMEOUT", "15"))
 
-            # Extract potential company names from titles and content
-            content = f"{result.get('title', '')} {result.get('content', '')}"
-            # Simple extraction - look for capitalized words that might be company names
-            words = content.split()
-            for i, word in enumerate(words):
-                if word.istitle() and len(word) > 3 and i < len(words) - 1:
-                    if words[i + 1].istitle() or word.endswith(
-                        ("Inc", "Corp", "Ltd", "LLC")
-                    ):
-                        company_names.add(word)
 
-        # Step 3: Do targeted searches for top company candidates
-        all_results = initial_results.copy()
+# Pooled provider clients. httpx connection pools are bound to the event loop
+# that first uses them, so clients are kept per loop: one set for the FastAPI
+# loop and one for the background loop used by the handler path.
+GROQ_MODEL = os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile")
+HTTP_POOL_MAX_CONNECTIONS = int(os.environ.get("HTTP_POOL_MAX_CONNECTIONS", "100"))
+HTTP_POOL_MAX_KEEPALIVE = int(os.environ.get("HTTP_POOL_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "60"))
 
-        # Limit to top 5 potential companies to avoid too many API calls
-        for company_name in list(company_names)[:5]:
-            if (
-                company_name.lower() != name.lower()
-            ):  # Don't search for the input company
-                try:
-                    detailed_query = f"{company_name} company website linkedin wikipedia description industry business bankruptcy liquidation closure ceased"
-                    log_debug(f"Detailed search for: {company_name}")
-
-                    detailed_response = tavily_client.search(
-                        detailed_query, search_depth="basic"
-                    )
+# Structured output: JSON mode makes the model return one JSON object, so
+# the company array is wrapped in {"companies": [...]}. Incomplete answers
+# get up to LLM_REPAIR_ATTEMPTS follow-up calls asking only for what's missing.
+LLM_JSON_MODE = os.environ.get("LLM_JSON_MODE", "").lower() in ("1", "true", "yes")
+LLM_REPAIR_ATTEMPTS = int(os.environ.get("LLM_REPAIR_ATTEMPTS", "1"))
 
-                    for result in detailed_response.get("results", [])[
-                        :3
-                    ]:  # Top 3 results per company
-                        all_results.append(
-                            {
-                                "title": result.get("title", ""),
-                                "content": result.get("content", ""),
-                                "url": result.get("url", ""),
-                                "published_date": result.get("published_date", ""),
-                                "target_company": company_name,  # Mark which company this search was for
-                            }
-                        )
-                except Exception as e:
-                    log_debug(
-                        f"Error in detailed search for {company_name}: {e}", "ERROR"
-                    )
-                    continue
+# LLM extraction mode. "single" asks one call for all 5 companies;
+# "map_reduce" runs a short call per candidate company concurrently, each
+# with only that company's snippets, and merges the answers (see
+# map_reduce_with_llm). Requests can pick a mode with the X-LLM-Mode header.
+LLM_MODES = ("single", "map_reduce")
+LLM_MODE = os.environ.get("LLM_MODE", "single").lower()
+LLM_MODE_HEADER = "X-LLM-Mode"
+LLM_MAP_CANDIDATES = int(os.environ.get("LLM_MAP_CANDIDATES", "7"))
+LLM_MAP_TOKEN_BUDGET = int(os.environ.get("LLM_MAP_TOKEN_BUDGET", "1500"))
 
-        log_debug(f"Found {len(all_results)} total search results (initial + detailed)")
-        return all_results
+request_llm_mode: ContextVar[str] = ContextVar("request_llm_mode", default=LLM_MODE)
 
-    except Exception as e:
-        log_debug(f"Tavily search error: {e}", "ERROR")
-        return []
 
+def llm_mode_from_headers(headers) -> str:
+    value = (headers.get(LLM_MODE_HEADER) or LLM_MODE).strip().lower()
+    value = value.replace("-", "_")
+    return value if value in LLM_MODES else LLM_MODE
 
-def process_with_llm(
-    search_results: List[dict], input_company: CompanySearchRequest
-) -> List[SimilarCompanyResult]:
-    """Process search results with LLM to extract structured company data"""
-    if not GROQ_API_KEY:
-        log_debug("GROQ API key not configured", "ERROR")
-        return []
 
+@contextmanager
+def llm_mode_scope(mode: str):
+    token = request_llm_mode.set(mode)
     try:
-        model = ChatGroq(
-            model="llama-3.3-70b-versatile",
-            api_key=GROQ_API_KEY,
-            temperature=0,
-        )
+        yield
+    finally:
+        try:
+            request_llm_mode.reset(token)
+        except ValueError:
+            # A streaming body can be closed from a different context
+            pass
 
-        # Create prompt template
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    """You are an expert business analyst. Given comprehensive search results about companies (including both general similarity searches and detailed company-specific searches), extract information for exactly 5 similar companies to the input company.
+
+COMPANY_ANALYST_SYSTEM_PROMPT = """You are an expert business analyst. Given comprehensive search results about companies (including both general similarity searches and detailed company-specific searches), extract information for exactly 5 similar companies to the input company.
 
 CRITICAL: Use the search results to fill out ALL available fields. The search results include both general similarity data and detailed company-specific information.
 
@@ -248,279 +431,3901 @@ IMPORTANT:
 - Prioritize companies with the most complete information available
 - Make descriptions detailed and informative
 - Include both similarities AND differences in justifications for balanced analysis
-- FOR BUSINESS STATUS: Be conservative - only set stillInBusiness=true if clearly active. Look specifically for recent news, bankruptcy filings, closure announcements. When in doubt, use null.""",
-                ),
-                ("human", "Search results:\n{search_results}"),
-            ]
-        )
-
-        # Prepare search results text with better organization
-        results_text = "=== SIMILARITY SEARCH RESULTS ===\n"
-        general_results = [r for r in search_results if "target_company" not in r]
-        targeted_results = [r for r in search_results if "target_company" in r]
-
-        # Add general similarity results
-        for i, result in enumerate(general_results, 1):
-            results_text += f"\n{i}. GENERAL: {result['title']}\n"
-            results_text += f"Content: {result['content']}\n"
-            results_text += f"URL: {result['url']}\n"
-            results_text += "-" * 50 + "\n"
-
-        # Add company-specific detailed results
-        if targeted_results:
-            results_text += "\n=== DETAILED COMPANY INFORMATION ===\n"
-            current_company = ""
-            for result in targeted_results:
-                target_company = result.get("target_company", "")
-                if target_company != current_company:
-                    current_company = target_company
-                    results_text += f"\n--- DETAILS FOR: {target_company} ---\n"
-
-                results_text += f"Title: {result['title']}\n"
-                results_text += f"Content: {result['content']}\n"
-                results_text += f"URL: {result['url']}\n"
-                results_text += "-" * 30 + "\n"
-
-        # Generate response
-        chain = prompt | model
-        response = chain.invoke(
-            {
-                "input_name": input_company.name,
-                "input_note": input_company.personalNote,
-                "input_tags": input_company.tags,
-                "search_results": results_text,
-            }
-        )
+- FOR BUSINESS STATUS: Be conservative - only set stillInBusiness=true if clearly active. Look specifically for recent news, bankruptcy filings, closure announcements. When in doubt, use null."""
 
-        log_debug(f"LLM response length: {len(response.content)}")
+MAP_SYSTEM_PROMPT = """You are an expert business analyst. Decide whether the candidate company {candidate_name} is genuinely similar to the input company, and if so extract its details from the search results.
 
-        # Parse JSON response
-        try:
-            # Extract JSON from markdown code blocks if present
-            content = response.content.strip()
-
-            # Look for JSON in code blocks
-            if "```json" in content:
-                start = content.find("```json") + 7
-                end = content.find("```", start)
-                if end != -1:
-                    content = content[start:end].strip()
-            elif "```" in content:
-                # Handle plain code blocks
-                start = content.find("```") + 3
-                end = content.find("```", start)
-                if end != -1:
-                    content = content[start:end].strip()
-
-            # Try to find JSON array start if there's still extra text
-            if not content.startswith("["):
-                bracket_start = content.find("[")
-                if bracket_start != -1:
-                    content = content[bracket_start:]
-
-            parsed_response = json.loads(content)
-
-            # Validate and convert to SimilarCompanyResult objects
-            similar_companies = []
-            for i, item in enumerate(parsed_response[:5]):  # Ensure max 5 companies
-                company_data = item.get("company", {})
-                justification = item.get("justification", "").strip()
-
-                # Debug logging
-                log_debug(
-                    f"Processing company {i+1}: {company_data.get('name', 'Unknown')}"
-                )
-                log_debug(f"Justification length: {len(justification)}")
-
-                # Ensure we have a justification
-                if not justification:
-                    justification = f"Similar to {input_company.name} based on industry and business focus."
-
-                company = CompanyMaster(
-                    name=company_data.get("name", ""),
-                    websiteUrl=company_data.get("websiteUrl"),
-                    wikipediaUrl=company_data.get("wikipediaUrl"),
-                    linkedinUrl=company_data.get("linkedinUrl"),
-                    logoUrl=company_data.get("logoUrl"),
-                    description=company_data.get("description", ""),
-                    industry=company_data.get("industry", ""),
-                    tagsMaster=company_data.get("tagsMaster", []),
-                    naicsCode=company_data.get("naicsCode"),
-                    stillInBusiness=company_data.get("stillInBusiness"),
-                )
+Input company details:
+Name: {input_name}
+Personal Note: {input_note}
+Tags: {input_tags}
 
-                similar_companies.append(
-                    SimilarCompanyResult(company=company, justification=justification)
-                )
+The candidate must relate to ALL tags and align with the business focus in the personal note. If it does not, or if it is the input company itself, return an empty JSON array: []
+
+Otherwise return a JSON array with exactly one entry:
+[{{
+  "company": {{
+    "name": "Full Official Company Name",
+    "websiteUrl": "https://company-website.com",
+    "wikipediaUrl": "https://en.wikipedia.org/wiki/Company_Name",
+    "linkedinUrl": "https://www.linkedin.com/company/company-name/",
+    "logoUrl": "https://logo-url.com/logo.png",
+    "description": "2-3 sentences on the business focus, market position and key products/services.",
+    "industry": "Specific Industry Name",
+    "tagsMaster": ["tag1", "tag2", "tag3", "tag4"],
+    "naicsCode": "123456",
+    "stillInBusiness": null
+  }},
+  "justification": "How it matches each tag from '{input_tags}' and '{input_note}', its similarities to {input_name}, then the key differences.",
+  "relevance": 7
+}}]
 
-            log_debug(f"Successfully processed {len(similar_companies)} companies")
-            return similar_companies
+- relevance: 1-10, how closely the candidate matches the input company
+- Use actual URLs from the search results; set a field to null when the results don't show it
+- stillInBusiness: false if the results mention bankruptcy, liquidation, closure or dissolution; true only if clearly active; otherwise null"""
 
-        except json.JSONDecodeError as e:
-            log_debug(f"JSON parsing error: {e}", "ERROR")
-            log_debug(f"Raw response: {response.content}", "ERROR")
-            return []
+MAP_REQUEST = """Search results for {candidate_name}:
+{search_results}"""
 
-    except Exception as e:
-        log_debug(f"LLM processing error: {e}", "ERROR")
-        log_debug(f"Traceback: {traceback.format_exc()}", "ERROR")
-        return []
+JSON_MODE_INSTRUCTION = """Respond with a single JSON object of the form {{"companies": [...]}}, where the array holds the company entries described above."""
 
+REPAIR_REQUEST = """Search results:
+{search_results}
 
-@app.post("/search-companies", response_model=CompanySearchResponse)
-async def search_companies_endpoint(request: CompanySearchRequest):
-    """Search for similar companies based on input company details"""
-    log_debug(f"Received company search request: {request.name}")
+Your previous answer was incomplete. It already covered: {found_names}.
+Return exactly {missing} more similar companies that are not in that list, in the same format."""
 
-    try:
-        # Step 1: Search with Tavily
-        search_results = search_similar_companies(
-            request.name, request.personalNote, request.tags
+_loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = (
+    weakref.WeakKeyDictionary()
+)
+_loop_clients_lock = threading.Lock()
+_prompts: Dict[str, "ChatPromptTemplate"] = {}
+
+
+def new_http_client(**kwargs) -> httpx.AsyncClient:
+    """Create an httpx client using the tuned pool limits and timeouts"""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        **kwargs,
+    )
+
+
+def _clients_for_running_loop() -> dict:
+    loop = asyncio.get_running_loop()
+    with _loop_clients_lock:
+        clients = _loop_clients.get(loop)
+        if clients is None:
+            clients = _loop_clients[loop] = {}
+        return clients
+
+
+# Optional replacements for the real providers, e.g. the simulated backends
+# used by run-benchmark.py. Factories are called once per event loop.
+_provider_overrides: Dict[str, Callable] = {}
+
+
+def use_providers(
+    tavily: Optional[Callable[[], object]] = None,
+    chat_model: Optional[Callable[[str], object]] = None,
+) -> None:
+    """Swap the Tavily client and/or chat model factories.
+
+    ``tavily()`` must return an object with an async ``search(query,
+    search_depth=..., **kwargs)`` method; ``chat_model(model_name)`` must
+    return a LangChain chat model. Pass nothing to restore the real providers.
+    """
+    _provider_overrides.clear()
+    if tavily is not None:
+        _provider_overrides["tavily"] = tavily
+    if chat_model is not None:
+        _provider_overrides["chat_model"] = chat_model
+    with _loop_clients_lock:
+        for clients in _loop_clients.values():
+            for name in [name for name in clients if not name.startswith("http:")]:
+                del clients[name]
+
+
+def get_tavily_client() -> "AsyncTavilyClient":
+    """Shared Tavily client for the running event loop"""
+    clients = _clients_for_running_loop()
+    if "tavily" not in clients and "tavily" in _provider_overrides:
+        clients["tavily"] = _provider_overrides["tavily"]()
+    if "tavily" not in clients:
+        from tavily import AsyncTavilyClient
+
+        clients["http:tavily"] = new_http_client()
+        clients["tavily"] = AsyncTavilyClient(
+            api_key=TAVILY_API_KEY, client=clients["http:tavily"]
         )
+    return clients["tavily"]
 
-        if not search_results:
-            raise HTTPException(
-                status_code=500, detail="Failed to retrieve search results"
-            )
 
-        # Step 2: Process with LLM
-        similar_companies = process_with_llm(search_results, request)
+def get_prompt(kind: str = "extract") -> "ChatPromptTemplate":
+    """Company analysis prompt, built once per process.
 
-        if not similar_companies:
-            raise HTTPException(
-                status_code=500, detail="Failed to process search results with LLM"
-            )
+    ``kind`` is "extract" for the main request, "repair" to ask only for
+    the companies missing from an incomplete answer, or "map" for one
+    candidate company in map-reduce mode.
+    """
+    prompt = _prompts.get(kind)
+    if prompt is None:
+        from langchain_core.prompts import ChatPromptTemplate
 
-        # Step 3: Return structured response
-        response = CompanySearchResponse(
-            inputCompany=request, similarCompanies=similar_companies
+        system_prompt = (
+            MAP_SYSTEM_PROMPT if kind == "map" else COMPANY_ANALYST_SYSTEM_PROMPT
+        )
+        if LLM_JSON_MODE:
+            system_prompt += "\n\n" + JSON_MODE_INSTRUCTION
+        human_prompt = {
+            "repair": REPAIR_REQUEST,
+            "map": MAP_REQUEST,
+        }.get(kind, "Search results:\n{search_results}")
+        prompt = _prompts[kind] = ChatPromptTemplate.from_messages(
+            [("system", system_prompt), ("human", human_prompt)]
         )
+    return prompt
 
-        log_debug(
-            f"Successfully processed search for {request.name}, found {len(similar_companies)} similar companies"
+
+def get_chat_model(model_name: str = GROQ_MODEL) -> "ChatGroq":
+    """Shared Groq chat model for the running event loop"""
+    clients = _clients_for_running_loop()
+    key = f"groq:{model_name}"
+    if key not in clients and "chat_model" in _provider_overrides:
+        clients[key] = _provider_overrides["chat_model"](model_name)
+    if key not in clients:
+        from langchain_groq import ChatGroq
+
+        clients[f"http:{key}"] = new_http_client()
+        clients[key] = ChatGroq(
+            model=model_name,
+            api_key=GROQ_API_KEY,
+            temperature=0,
+            http_async_client=clients[f"http:{key}"],
         )
-        return response
+    return clients[key]
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        log_debug(f"Company search error: {e}", "ERROR")
-        log_debug(f"Traceback: {traceback.format_exc()}", "ERROR")
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "error": str(e),
-                "groq_key_present": bool(GROQ_API_KEY),
-                "tavily_key_present": bool(TAVILY_API_KEY),
-            },
+
+def get_llm_chain(model_name: str = GROQ_MODEL, kind: str = "extract"):
+    """Prompt | model chain for the running event loop"""
+    clients = _clients_for_running_loop()
+    key = f"chain:{kind}:{model_name}"
+    if key not in clients:
+        model = get_chat_model(model_name)
+        if LLM_JSON_MODE:
+            model = model.bind(response_format={"type": "json_object"})
+        clients[key] = get_prompt(kind) | model
+    return clients[key]
+
+
+async def close_provider_clients() -> None:
+    """Close the pooled HTTP connections owned by the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _loop_clients_lock:
+        clients = _loop_clients.pop(loop, {})
+    for name, client in clients.items():
+        if name.startswith("http:"):
+            try:
+                await client.aclose()
+            except Exception as e:
+                log_debug(f"Error closing {name} client: {e}", "ERROR")
+
+
+# Optional warm-up: load the provider stacks before the first search needs
+# them, either in a background thread at import (WARM_UP_ON_START) or when
+# /warmup is requested (e.g. by a scheduled ping)
+WARM_UP_ON_START = os.environ.get("WARM_UP_ON_START", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+
+_providers_loaded = False
+
+
+def load_providers() -> None:
+    """Import the LangChain/Groq and Tavily stacks and build the shared prompt"""
+    global _providers_loaded
+    import langchain_groq  # noqa: F401
+    import tavily  # noqa: F401
+
+    get_prompt()
+    _providers_loaded = True
+
+
+async def ensure_providers() -> None:
+    """Load the provider stacks in a worker thread on first use, so the import
+    doesn't stall every other request on the event loop"""
+    if not _providers_loaded:
+        await asyncio.to_thread(load_providers)
+
+
+async def warm_up() -> dict:
+    """Load the providers and create the running loop's clients"""
+    started = time.perf_counter()
+    await asyncio.to_thread(load_providers)
+    imported = time.perf_counter()
+    if TAVILY_API_KEY:
+        get_tavily_client()
+    if GROQ_API_KEY:
+        get_llm_chain()
+    return {
+        "status": "warm",
+        "import_ms": round((imported - started) * 1000, 1),
+        "clients_ms": round((time.perf_counter() - imported) * 1000, 1),
+    }
+
+
+if WARM_UP_ON_START:
+    threading.Thread(target=load_providers, name="warm-up", daemon=True).start()
+
+
+# Cross-process cache. With several server processes (see
+# run-python-api.py --mode production), per-process caches would divide the
+# hit rate by the number of workers; SQLite in WAL mode lets every process
+# read and write one shared cache file concurrently.
+SHARED_CACHE_PATH = os.environ.get("SHARED_CACHE_PATH", "")
+SHARED_CACHE_PRUNE_EVERY = 256
+
+
+class SharedCache:
+    """Namespaced key-value cache in a SQLite database shared by processes.
+
+    Values are bytes. Freshness is checked against the caller's TTL at read
+    time; rows past the TTL they were written with are pruned every
+    SHARED_CACHE_PRUNE_EVERY writes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and self.path:
+            try:
+                conn = open_sqlite(self.path)
+                conn.execute("""CREATE TABLE IF NOT EXISTS cache (
+                        namespace TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        value BLOB NOT NULL,
+                        stored_at REAL NOT NULL,
+                        expires_at REAL NOT NULL,
+                        PRIMARY KEY (namespace, key)
+                    )""")
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                log_debug(f"Shared cache unavailable: {e}", "ERROR")
+                self.path = ""
+        return self._conn
+
+    def get(
+        self, namespace: str, key: str, ttl: float
+    ) -> Optional[Tuple[float, bytes]]:
+        """(stored_at, value) if an entry younger than ``ttl`` exists"""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT stored_at, value FROM cache "
+                    "WHERE namespace = ? AND key = ? AND stored_at > ?",
+                    (namespace, key, time.time() - ttl),
+                ).fetchone()
+            except sqlite3.Error as e:
+                log_debug(f"Shared cache read failed: {e}", "ERROR")
+                return None
+        return (row[0], bytes(row[1])) if row else None
+
+    def set(
+        self,
+        namespace: str,
+        key: str,
+        value: bytes,
+        ttl: float,
+        stored_at: Optional[float] = None,
+    ) -> None:
+        stored_at = time.time() if stored_at is None else stored_at
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                    (namespace, key, value, stored_at, stored_at + ttl),
+                )
+                self._writes += 1
+                if self._writes % SHARED_CACHE_PRUNE_EVERY == 0:
+                    conn.execute(
+                        "DELETE FROM cache WHERE expires_at < ?", (time.time(),)
+                    )
+                conn.commit()
+            except sqlite3.Error as e:
+                log_debug(f"Shared cache write failed: {e}", "ERROR")
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return {"path": None}
+            rows = conn.execute(
+                "SELECT namespace, COUNT(*) FROM cache GROUP BY namespace"
+            ).fetchall()
+        return {"path": self.path, "entries": dict(rows)}
+
+
+shared_cache = SharedCache(SHARED_CACHE_PATH)
+
+
+# Whole-search response cache
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "256"))
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", "3600"))
+# Degraded or partial answers are only cached this long (0: not at all), so a
+# full answer replaces them soon
+SEARCH_CACHE_DEGRADED_TTL = float(os.environ.get("SEARCH_CACHE_DEGRADED_TTL", "60"))
+SEARCH_CACHE_DIR = os.environ.get("SEARCH_CACHE_DIR", "")
+CACHE_BYPASS_HEADER = "X-Cache-Bypass"
+
+
+def cache_bypass_requested(headers) -> bool:
+    """Whether the caller asked to skip cached results for this request"""
+    bypass = (headers.get(CACHE_BYPASS_HEADER) or "").strip().lower()
+    cache_control = (headers.get("Cache-Control") or "").lower()
+    return bypass in ("1", "true", "yes") or "no-cache" in cache_control
+
+
+# A cached search: {"similarCompanies", "model", "degradations"}, or a bare
+# similarCompanies list in entries written by older versions
+CachedValue = Union[dict, list]
+
+
+class SearchResultCache:
+    """In-memory LRU of search results with a TTL and an optional second tier.
+
+    Values hold the serialized ``similarCompanies`` list with the model and
+    degradations of the answer; the input company is always echoed from the
+    live request. An entry may be stored with a TTL shorter than the cache's
+    (see store_cached_search). The second tier is the shared
+    SQLite cache when one is configured, otherwise a directory with one JSON
+    file per key, written atomically so several processes can share it.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        directory: str = "",
+        shared: Optional[SharedCache] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.directory = directory
+        self.shared = shared if shared is not None and shared.path else None
+        # key -> (stored_at, value, ttl)
+        self._entries: "OrderedDict[str, Tuple[float, CachedValue, float]]" = (
+            OrderedDict()
         )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
 
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
 
-# Legacy endpoints for compatibility (if needed)
-@app.post("/chat")
-@app.post("/api/chat")
-async def legacy_chat():
-    """Legacy chat endpoint - returns redirect message"""
-    return JSONResponse(
-        content={"message": "This endpoint has been replaced with /search-companies"},
-        status_code=200,
-    )
+    def get(self, key: str) -> Optional[CachedValue]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] < entry[2]:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
 
+        if self.shared is not None:
+            value = self._read_shared(key, now)
+        else:
+            value = self._read_disk(key, now) if self.directory else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+        self._remember(key, *value)
+        return value[1]
 
-# Vercel-compatible handler
-from http.server import BaseHTTPRequestHandler
+    def expires_in(self, key: str) -> Optional[float]:
+        """Seconds until the entry for ``key`` expires, None if there is none.
 
+        Not counted as a lookup. The second tier is checked too, since
+        another process may have refreshed the entry.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+        expiries = [entry[0] + entry[2]] if entry is not None else []
+        if self.shared is not None:
+            tier_entry = self._read_shared(key, now)
+        else:
+            tier_entry = self._read_disk(key, now) if self.directory else None
+        if tier_entry is not None:
+            expiries.append(tier_entry[0] + tier_entry[2])
+        remaining = max(expiries, default=now) - now
+        return remaining if remaining > 0 else None
 
-class handler(BaseHTTPRequestHandler):
-    def do_POST(self):
+    def set(self, key: str, value: CachedValue, ttl: Optional[float] = None) -> None:
+        """Store ``value``, fresh for ``ttl`` seconds (default: the cache TTL)"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        stored_at = time.time()
+        self._remember(key, stored_at, value, ttl)
+        if self.shared is not None:
+            envelope = dumps_json({"ttl": ttl, "value": value})
+            self.shared.set("search", key, envelope, ttl, stored_at)
+        elif self.directory:
+            self._write_disk(key, stored_at, value, ttl)
+
+    def _remember(
+        self, key: str, stored_at: float, value: CachedValue, ttl: float
+    ) -> None:
+        with self._lock:
+            self._entries[key] = (stored_at, value, ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _read_shared(
+        self, key: str, now: float
+    ) -> Optional[Tuple[float, CachedValue, float]]:
+        entry = self.shared.get("search", key, self.ttl)
+        if entry is None:
+            return None
+        data = json.loads(entry[1])
+        if isinstance(data, dict) and "ttl" in data:
+            ttl, data = data["ttl"], data["value"]
+        else:
+            ttl = self.ttl  # Written before entries carried their own TTL
+        return (entry[0], data, ttl) if now - entry[0] < ttl else None
+
+    def _read_disk(
+        self, key: str, now: float
+    ) -> Optional[Tuple[float, CachedValue, float]]:
         try:
-            log_debug(f"=== REQUEST START === Path: {self.path}")
-            content_length = int(self.headers["Content-Length"])
-            body = self.rfile.read(content_length)
-            data = json.loads(body.decode("utf-8"))
-            log_debug(f"Request body parsed successfully")
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        ttl = min(entry.get("ttl", self.ttl), self.ttl)
+        if now - entry.get("stored_at", 0) >= ttl:
+            return None
+        return entry["stored_at"], entry["value"], ttl
 
-            if self.path == "/api/search-companies":
-                log_debug("Routing to search companies handler")
+    def _write_disk(
+        self, key: str, stored_at: float, value: CachedValue, ttl: float
+    ) -> None:
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"stored_at": stored_at, "ttl": ttl, "value": value}, f)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            log_debug(f"Search cache write failed: {e}", "ERROR")
 
-                # Process the request
-                request = CompanySearchRequest(**data)
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "disk_enabled": bool(self.directory) and self.shared is None,
+                "shared_enabled": self.shared is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
 
-                # Search with Tavily
-                search_results = search_similar_companies(
-                    request.name, request.personalNote, request.tags
-                )
 
-                if not search_results:
-                    response = {
-                        "status": 500,
-                        "headers": {"Content-Type": "application/json"},
-                        "body": json.dumps(
-                            {"error": "Failed to retrieve search results"}
-                        ),
-                    }
-                else:
-                    # Process with LLM
-                    similar_companies = process_with_llm(search_results, request)
-
-                    if not similar_companies:
-                        response = {
-                            "status": 500,
-                            "headers": {"Content-Type": "application/json"},
-                            "body": json.dumps(
-                                {"error": "Failed to process search results with LLM"}
-                            ),
-                        }
-                    else:
-                        # Create response
-                        result = CompanySearchResponse(
-                            inputCompany=request, similarCompanies=similar_companies
-                        )
-
-                        response = {
-                            "status": 200,
-                            "headers": {"Content-Type": "application/json"},
-                            "body": result.model_dump_json(),
-                        }
-            else:
-                log_debug(f"Unknown path: {self.path}")
-                response = {
-                    "status": 404,
-                    "headers": {"Content-Type": "text/plain"},
-                    "body": "Not Found",
-                }
+search_cache = SearchResultCache(
+    SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_TTL, SEARCH_CACHE_DIR, shared_cache
+)
 
-            # Send response
-            log_debug(f"Sending response with status {response['status']}")
-            self.send_response(response["status"])
-            for key, value in response["headers"].items():
-                self.send_header(key, value)
-            self.send_header("Access-Control-Allow-Origin", "*")
-            self.end_headers()
-            self.wfile.write(response["body"].encode("utf-8"))
-            log_debug("=== REQUEST COMPLETE ===")
 
-        except Exception as e:
-            error_details = traceback.format_exc()
-            log_debug(f"HANDLER ERROR: {str(e)}", "ERROR")
-            log_debug(f"HANDLER TRACEBACK:\n{error_details}", "ERROR")
+def get_cached_search(
+    request: CompanySearchRequest, headers
+) -> Optional[CompanySearchResponse]:
+    """Return a cached response for the request unless the caller bypassed it"""
+    if cache_bypass_requested(headers):
+        log_debug("Search cache bypassed by request header", "DEBUG")
+        cache_lookups.inc(cache="search", result="bypass")
+        return None
+    cached = search_cache.get(search_cache_key(request))
+    if cached is None:
+        cache_lookups.inc(cache="search", result="miss")
+        return None
+    cache_lookups.inc(cache="search", result="hit")
+    log_debug(f"Search cache hit for {request.name}")
+    if isinstance(cached, list):
+        cached = {"similarCompanies": cached}
+    # Report how the cached answer was produced, not how it was read
+    deadline = current_deadline()
+    deadline.model = cached.get("model")
+    deadline.degradations.extend(cached.get("degradations") or [])
+    return CompanySearchResponse(
+        inputCompany=request,
+        similarCompanies=[
+            SimilarCompanyResult(**item) for item in cached["similarCompanies"]
+        ],
+    )
 
-            self.send_response(500)
-            self.send_header("Content-type", "application/json")
-            self.send_header("Access-Control-Allow-Origin", "*")
-            self.end_headers()
-            error_response = json.dumps(
-                {
-                    "error": str(e),
-                    "traceback": error_details,
-                    "path": getattr(self, "path", "unknown"),
-                }
-            )
-            self.wfile.write(error_response.encode("utf-8"))
 
-    def do_OPTIONS(self):
-        self.send_response(200)
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "POST, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+def store_cached_search(
+    request: CompanySearchRequest, similar_companies: List["SimilarCompanyResult"]
+) -> None:
+    """Cache a live answer with the running request's model and degradations.
+
+    Fewer than 5 companies counts as a "partial_answer" degradation. Degraded
+    answers are kept for SEARCH_CACHE_DEGRADED_TTL only.
+    """
+    deadline = current_deadline()
+    if len(similar_companies) < 5:
+        deadline.degrade("partial_answer")
+    ttl = SEARCH_CACHE_DEGRADED_TTL if deadline.degradations else SEARCH_CACHE_TTL
+    if ttl <= 0:
+        return
+    search_cache.set(
+        search_cache_key(request),
+        {
+            "similarCompanies": [item.model_dump() for item in similar_companies],
+            "model": deadline.model,
+            "degradations": list(deadline.degradations),
+        },
+        ttl,
+    )
+
+
+# Query-level Tavily cache, shared by every process using the same directory
+TAVILY_CACHE_DIR = os.environ.get(
+    "TAVILY_CACHE_DIR", os.path.join(tempfile.gettempdir(), "tavily-cache")
+)
+TAVILY_CACHE_TTLS = {
+    "basic": float(os.environ.get("TAVILY_CACHE_TTL_BASIC", "604800")),
+    "advanced": float(os.environ.get("TAVILY_CACHE_TTL_ADVANCED", "86400")),
+}
+
+
+class TavilyQueryCache:
+    """Compressed cache of raw Tavily responses.
+
+    Entries are keyed by (normalized query, search_depth) and expire according
+    to the TTL configured for their depth at read time. Each entry is a gzip
+    blob, kept in the shared SQLite cache when one is configured and otherwise
+    as a file replaced atomically, so concurrent processes can share the
+    directory without locking.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttls: Dict[str, float],
+        shared: Optional[SharedCache] = None,
+    ):
+        self.directory = directory
+        self.ttls = ttls
+        self.shared = shared if shared is not None and shared.path else None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        if directory and self.shared is None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(query: str, search_depth: str) -> str:
+        payload = json.dumps([normalize_text(query), search_depth])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json.gz")
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _read(self, key: str, search_depth: str) -> bytes:
+        if self.shared is not None:
+            entry = self.shared.get(
+                f"tavily_{search_depth}", key, self.ttls.get(search_depth, 0)
+            )
+            if entry is None:
+                raise FileNotFoundError(key)
+            return entry[1]
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def get(self, query: str, search_depth: str) -> Optional[dict]:
+        if not self.directory and self.shared is None:
+            return None
+        try:
+            entry = json.loads(
+                gzip.decompress(self._read(self.key(query, search_depth), search_depth))
+            )
+        except (OSError, ValueError, EOFError):
+            self._count("misses")
+            return None
+        ttl = self.ttls.get(search_depth, 0) - cache_refresh_margin.get()
+        if time.time() - entry.get("stored_at", 0) >= ttl:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return entry["response"]
+
+    def set(self, query: str, search_depth: str, response: dict) -> None:
+        ttl = self.ttls.get(search_depth, 0)
+        if (not self.directory and self.shared is None) or ttl <= 0:
+            return
+        key = self.key(query, search_depth)
+        entry = {
+            "stored_at": time.time(),
+            "query": query,
+            "search_depth": search_depth,
+            "response": response,
+        }
+        blob = gzip.compress(dumps_json(entry))
+        if self.shared is not None:
+            self.shared.set(
+                f"tavily_{search_depth}", key, blob, ttl, entry["stored_at"]
+            )
+            self._count("writes")
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+            self._count("writes")
+        except OSError as e:
+            log_debug(f"Tavily cache write failed: {e}", "ERROR")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "directory": (self.directory or None) if self.shared is None else None,
+                "shared_enabled": self.shared is not None,
+                "ttl_seconds": self.ttls,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+            }
+
+
+tavily_cache = TavilyQueryCache(TAVILY_CACHE_DIR, TAVILY_CACHE_TTLS, shared_cache)
+
+
+# Batch-scoped memo of in-flight Tavily queries, so items in one batch that
+# issue the same query (including overlapping candidate lookups) share a call
+tavily_query_memo: ContextVar[Optional["TavilyQueryMemo"]] = ContextVar(
+    "tavily_query_memo", default=None
+)
+
+
+class TavilyQueryMemo:
+    """Tavily calls shared across every item of one batch request"""
+
+    def __init__(self):
+        self.tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.requested = 0
+
+    @property
+    def saved(self) -> int:
+        return self.requested - len(self.tasks)
+
+
+async def cached_tavily_search(
+    tavily_client, query: str, search_depth: str, **kwargs
+) -> dict:
+    """Tavily search through the query cache; empty responses are not stored"""
+    memo = tavily_query_memo.get()
+    if memo is None:
+        return await _cached_tavily_search(tavily_client, query, search_depth, **kwargs)
+
+    memo.requested += 1
+    key = (normalize_text(query), search_depth)
+    task = memo.tasks.get(key)
+    if task is None:
+        task = memo.tasks[key] = asyncio.ensure_future(
+            _cached_tavily_search(tavily_client, query, search_depth, **kwargs)
+        )
+    else:
+        log_debug(f"Sharing batch Tavily query ({search_depth}): {query}", "DEBUG")
+    # Shield so one item's timeout doesn't cancel the call for the others
+    return await asyncio.shield(task)
+
+
+async def _cached_tavily_search(
+    tavily_client, query: str, search_depth: str, **kwargs
+) -> dict:
+    cached = await asyncio.to_thread(tavily_cache.get, query, search_depth)
+    if cached is not None:
+        cache_lookups.inc(cache=f"tavily_{search_depth}", result="hit")
+        log_debug(f"Tavily cache hit ({search_depth}): {query}", "DEBUG")
+        return cached
+    cache_lookups.inc(cache=f"tavily_{search_depth}", result="miss")
+
+    # Tavily calls have to leave the LLM its share of the deadline
+    await tavily_limiters[search_depth].acquire(reserve=DEADLINE_LLM_RESERVE)
+    charge_provider_call()
+    response = await tavily_client.search(query, search_depth=search_depth, **kwargs)
+    if response.get("results"):
+        await asyncio.to_thread(tavily_cache.set, query, search_depth, response)
+    return response
+
+
+class Flight:
+    """One in-flight SingleFlight computation and the events it has published"""
+
+    def __init__(self):
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+        # (args, kwargs) of every publish, replayed to callers that join late
+        self.events: List[Tuple[tuple, dict]] = []
+        self.listeners: List[Callable[..., None]] = []
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one computation.
+
+    The first caller for a key starts the work; callers arriving while it is
+    in flight wait for the same result or error. Results are handed over
+    through a concurrent Future so callers on the FastAPI loop and on the
+    handler's background loop can share a flight. The work keeps running if
+    the caller that started it goes away.
+
+    The work receives a ``publish(*args, **kwargs)`` callable. Each caller's
+    ``listener`` gets every published event on its own loop, including the
+    ones published before it joined, so streaming callers see the same
+    progress whether they lead or follow. Callers that join a flight also
+    get the degradations it applied and the model it answered with, so their
+    metadata and cache writes describe the answer they got. The work queues
+    for rate limits at the starting caller's priority, so low-priority
+    callers (the cache warmer) get flights of their own and never hold up
+    user requests.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, Flight] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+        self.errors = 0
+
+    async def do(
+        self,
+        key: str,
+        factory: Callable[[Callable[..., None]], Awaitable],
+        listener: Optional[Callable[..., None]] = None,
+    ):
+        if request_priority.get() >= PRIORITIES["low"]:
+            key = "low:" + key
+        deliver = None
+        if listener is not None:
+            loop = asyncio.get_running_loop()
+
+            def deliver(*args, **kwargs):
+                loop.call_soon_threadsafe(lambda: listener(*args, **kwargs))
+
+        with self._lock:
+            self.calls += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = Flight()
+            else:
+                self.shared += 1
+            if deliver is not None:
+                for args, kwargs in flight.events:
+                    deliver(*args, **kwargs)
+                flight.listeners.append(deliver)
+
+        if leader:
+            task = asyncio.ensure_future(
+                self._lead(factory, lambda *a, **kw: self._publish(flight, a, kw))
+            )
+            task.add_done_callback(lambda done: self._finish(key, flight, done))
+        else:
+            log_debug(f"Joining in-flight {self.name} call")
+        result, degraded, model = await asyncio.shield(
+            asyncio.wrap_future(flight.future)
+        )
+        if not leader:
+            deadline = current_deadline()
+            for kind in degraded:
+                deadline.degrade(kind)
+            if model is not None:
+                deadline.model = model
+        return result
+
+    @staticmethod
+    async def _lead(factory: Callable[..., Awaitable], publish: Callable[..., None]):
+        """Run the work in the starting caller's context, returning what it
+        degraded and the model it used along with its result"""
+        deadline = current_deadline()
+        applied = len(deadline.degradations)
+        result = await factory(publish)
+        return result, deadline.degradations[applied:], deadline.model
+
+    def _publish(self, flight: Flight, args: tuple, kwargs: dict) -> None:
+        with self._lock:
+            flight.events.append((args, kwargs))
+            for deliver in flight.listeners:
+                deliver(*args, **kwargs)
+
+    def _finish(self, key: str, flight: Flight, task: asyncio.Task) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+            if task.cancelled() or task.exception() is not None:
+                self.errors += 1
+        if task.cancelled():
+            flight.future.set_exception(asyncio.CancelledError())
+        elif task.exception() is not None:
+            flight.future.set_exception(task.exception())
+        else:
+            flight.future.set_result(task.result())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executed": self.calls - self.shared,
+                "saved": self.shared,
+                "errors": self.errors,
+                "in_flight": len(self._inflight),
+            }
+
+
+search_flight = SingleFlight("search")
+llm_flight = SingleFlight("llm")
+
+
+# End-to-end time budget. Each search request carries a Deadline (through a
+# context variable, like the batch Tavily memo); the Tavily stages leave
+# DEADLINE_LLM_RESERVE for the LLM, and a slow or failing LLM call is raced
+# against LLM_FALLBACK_MODEL. Every shortcut taken is listed in the response.
+REQUEST_DEADLINE = float(os.environ.get("REQUEST_DEADLINE", "25"))
+DEADLINE_LLM_RESERVE = float(os.environ.get("DEADLINE_LLM_RESERVE", "10"))
+LLM_FALLBACK_MODEL = os.environ.get("LLM_FALLBACK_MODEL", "llama-3.1-8b-instant")
+LLM_HEDGE_AFTER = float(os.environ.get("LLM_HEDGE_AFTER", "8"))
+LLM_FALLBACK_BUDGET = float(os.environ.get("LLM_FALLBACK_BUDGET", "4"))
+# Shortest useful Tavily budget: with less left, detailed searches are
+# skipped, and the (required) initial search still gets this long
+MIN_SEARCH_BUDGET = 1.0
+
+degradations = Counter(
+    "company_search_degradations_total",
+    "Shortcuts taken to meet the request deadline",
+    labels=("kind",),
+)
+METRICS.append(degradations)
+
+
+class Deadline:
+    """Time budget of one search request and the degradations applied to meet it"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds if seconds > 0 else math.inf
+        self.started = time.monotonic()
+        self.expires_at = self.started + self.seconds
+        self.degradations: List[str] = []
+        self.model: Optional[str] = None
+
+    def remaining(self, reserve: float = 0.0) -> float:
+        return self.expires_at - time.monotonic() - reserve
+
+    def timeout(self, reserve: float = 0.0, minimum: float = 0.0) -> Optional[float]:
+        """remaining(reserve), at least ``minimum``; None when unbounded"""
+        if math.isinf(self.seconds):
+            return None
+        return max(minimum, self.remaining(reserve))
+
+    def degrade(self, kind: str) -> None:
+        if kind not in self.degradations:
+            self.degradations.append(kind)
+            degradations.inc(kind=kind)
+            log_debug(f"Degradation applied: {kind}", "WARNING")
+
+    def metadata(self, source: str) -> "SearchMetadata":
+        return SearchMetadata(
+            source=source,
+            model=self.model,
+            llmMode=request_llm_mode.get() if source == "live" else None,
+            degradations=list(self.degradations),
+            elapsedMs=round((time.monotonic() - self.started) * 1000, 1),
+            deadlineMs=None if math.isinf(self.seconds) else self.seconds * 1000,
+        )
+
+
+request_deadline: ContextVar[Optional[Deadline]] = ContextVar(
+    "request_deadline", default=None
+)
+
+
+def current_deadline() -> Deadline:
+    """The running request's deadline (an unbounded one outside a request)"""
+    deadline = request_deadline.get()
+    if deadline is None:
+        deadline = Deadline(0)
+    return deadline
+
+
+@contextmanager
+def deadline_scope(seconds: float = REQUEST_DEADLINE):
+    deadline = Deadline(seconds)
+    token = request_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        try:
+            request_deadline.reset(token)
+        except ValueError:
+            # A streaming body can be closed from a different context
+            pass
+
+
+# Provider rate limiting. Token buckets shared by every request (on either
+# event loop) keep calls within the provider quotas; callers wait in a
+# bounded priority queue, and are turned away with a Retry-After hint when
+# the queue is full or their wait would outlast the request deadline.
+TAVILY_BASIC_RPM = float(os.environ.get("TAVILY_BASIC_RPM", "80"))
+TAVILY_ADVANCED_RPM = float(os.environ.get("TAVILY_ADVANCED_RPM", "20"))
+GROQ_TOKENS_PER_MINUTE = float(os.environ.get("GROQ_TOKENS_PER_MINUTE", "12000"))
+RATE_LIMIT_MAX_WAITERS = int(os.environ.get("RATE_LIMIT_MAX_WAITERS", "50"))
+# Server processes sharing the quotas; each limits itself to an equal share
+SERVER_WORKERS = max(1, int(os.environ.get("SERVER_WORKERS", "1")))
+# Completion tokens assumed per LLM call when charging the Groq bucket; the
+# bucket is settled with the measured usage once the call returns
+LLM_COMPLETION_TOKEN_ESTIMATE = 1500
+LLM_MAP_COMPLETION_TOKEN_ESTIMATE = 400
+
+PRIORITY_HEADER = "X-Priority"
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+request_priority: ContextVar[int] = ContextVar(
+    "request_priority", default=PRIORITIES["normal"]
+)
+
+rate_limit_wait_seconds = Histogram(
+    "company_search_rate_limit_wait_seconds",
+    "Time spent queued for a provider rate limiter",
+    LATENCY_BUCKETS,
+    labels=("limiter",),
+)
+rate_limit_rejections = Counter(
+    "company_search_rate_limit_rejections_total",
+    "Calls turned away by a provider rate limiter",
+    labels=("limiter", "reason"),
+)
+METRICS.extend([rate_limit_wait_seconds, rate_limit_rejections])
+
+
+def priority_from_headers(headers, default: str = "normal") -> int:
+    value = (headers.get(PRIORITY_HEADER) or default).strip().lower()
+    return PRIORITIES.get(value, PRIORITIES[default])
+
+
+class RateLimiter:
+    """Token bucket with a bounded priority queue of waiters.
+
+    ``rate`` is tokens per second and ``capacity`` the burst size. Waiters are
+    served strictly in (priority, arrival) order. State is guarded by a
+    thread lock and waiting is done by sleeping, so one limiter serves
+    callers on any event loop.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float, max_waiters: int):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.max_waiters = max_waiters
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._waiters: List[list] = []
+        self._queued = 0.0
+        self._seq = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _wait_estimate(self, amount: float) -> float:
+        return max(0.0, self._queued + amount - self.tokens) / self.rate
+
+    def saturated(self) -> bool:
+        return self.rate > 0 and len(self._waiters) >= self.max_waiters
+
+    def reject(self, reason: str, amount: float = 1.0) -> RateLimitExceeded:
+        self.rejected += 1
+        rate_limit_rejections.inc(limiter=self.name, reason=reason)
+        log_debug(f"Rate limiter {self.name} rejected a call ({reason})", "WARNING")
+        return RateLimitExceeded(self.name, self._wait_estimate(amount))
+
+    async def acquire(
+        self,
+        amount: float = 1.0,
+        priority: Optional[int] = None,
+        reserve: float = 0.0,
+    ):
+        """Take ``amount`` tokens, queueing behind earlier and higher-priority callers.
+
+        Rejects straight away when the queue is full or the expected wait is
+        longer than the request deadline leaves (minus ``reserve``).
+        """
+        if self.rate <= 0:
+            return
+        amount = min(amount, self.capacity)
+        priority = request_priority.get() if priority is None else priority
+        timeout = current_deadline().timeout(reserve)
+        started = time.monotonic()
+        with self._lock:
+            self._refill()
+            if not self._waiters and self.tokens >= amount:
+                self.tokens -= amount
+                self.admitted += 1
+                return
+            if len(self._waiters) >= self.max_waiters:
+                raise self.reject("queue_full", amount)
+            if timeout is not None and self._wait_estimate(amount) > timeout:
+                raise self.reject("deadline", amount)
+            self._seq += 1
+            entry = [priority, self._seq, amount]
+            heapq.heappush(self._waiters, entry)
+            self._queued += amount
+
+        try:
+            while True:
+                with self._lock:
+                    self._refill()
+                    if self._waiters[0] is entry:
+                        if self.tokens >= amount:
+                            heapq.heappop(self._waiters)
+                            self._queued -= amount
+                            self.tokens -= amount
+                            self.admitted += 1
+                            break
+                        delay = (amount - self.tokens) / self.rate
+                    else:
+                        # Not at the head yet; check back shortly
+                        delay = 0.05
+                await asyncio.sleep(delay)
+        except BaseException:
+            with self._lock:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    self._queued -= amount
+            raise
+        rate_limit_wait_seconds.observe(time.monotonic() - started, limiter=self.name)
+
+    def settle(self, charged: float, used: float) -> None:
+        """Replace a call's up-front ``charged`` estimate with what it ``used``:
+        the difference is returned to the bucket, or taken from it when the
+        call ran over (leaving later callers to wait for the refill)"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self.tokens = min(
+                self.capacity, self.tokens + min(charged, self.capacity) - used
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refill()
+            return {
+                "rate_per_minute": self.rate * 60,
+                "available": round(self.tokens, 1),
+                "waiting": len(self._waiters),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+
+def per_minute_limiter(name: str, per_minute: float) -> RateLimiter:
+    # A full minute of this process's share of the quota as the burst allowance
+    per_minute /= SERVER_WORKERS
+    return RateLimiter(
+        name, per_minute / 60, max(1.0, per_minute), RATE_LIMIT_MAX_WAITERS
+    )
+
+
+tavily_limiters = {
+    "basic": per_minute_limiter("tavily_basic", TAVILY_BASIC_RPM),
+    "advanced": per_minute_limiter("tavily_advanced", TAVILY_ADVANCED_RPM),
+}
+_groq_limiters: Dict[str, RateLimiter] = {}
+_groq_limiters_lock = threading.Lock()
+
+
+def groq_limiter(model_name: str) -> RateLimiter:
+    """Tokens-per-minute limiter for one Groq model (quotas are per model)"""
+    with _groq_limiters_lock:
+        limiter = _groq_limiters.get(model_name)
+        if limiter is None:
+            limiter = _groq_limiters[model_name] = per_minute_limiter(
+                f"groq:{model_name}", GROQ_TOKENS_PER_MINUTE
+            )
+        return limiter
+
+
+def all_limiters() -> List[RateLimiter]:
+    with _groq_limiters_lock:
+        return list(tavily_limiters.values()) + list(_groq_limiters.values())
+
+
+def rate_limit_stats() -> dict:
+    return {limiter.name: limiter.stats() for limiter in all_limiters()}
+
+
+def check_admission() -> None:
+    """Turn a new search away up front when a provider queue is already full"""
+    for limiter in all_limiters():
+        if limiter.saturated():
+            raise limiter.reject("admission")
+
+
+@contextmanager
+def priority_scope(priority: int):
+    token = request_priority.set(priority)
+    try:
+        yield
+    finally:
+        try:
+            request_priority.reset(token)
+        except ValueError:
+            # A streaming body can be closed from a different context
+            pass
+
+
+# Local CompanyMaster store. Every company returned by the LLM is kept in
+# SQLite (with an FTS5 index when available) and a TF-IDF / tag-overlap
+# similarity index, so later searches can be pre-filled or answered locally.
+COMPANY_STORE_PATH = os.environ.get(
+    "COMPANY_STORE_PATH", os.path.join(tempfile.gettempdir(), "company-master.db")
+)
+LOCAL_STORE_MODE = os.environ.get("LOCAL_STORE_MODE", "prefill").lower()
+LOCAL_MATCH_MIN_SCORE = float(os.environ.get("LOCAL_MATCH_MIN_SCORE", "0.15"))
+LOCAL_SERVE_MIN_SCORE = float(os.environ.get("LOCAL_SERVE_MIN_SCORE", "0.45"))
+LOCAL_PREFILL_LIMIT = int(os.environ.get("LOCAL_PREFILL_LIMIT", "3"))
+
+
+def index_terms(text: str) -> List[str]:
+    """Terms for the similarity index: lower-case words minus stopwords"""
+    return [
+        word.rstrip("s") if len(word) > 4 else word
+        for word in WORD_PATTERN.findall(text.lower())
+        if len(word) > 2 and word not in CANDIDATE_STOPWORDS
+    ]
+
+
+company_store = CompanyStore(COMPANY_STORE_PATH, index_terms, LOCAL_MATCH_MIN_SCORE)
+
+
+def local_match_justification(
+    input_company: CompanySearchRequest, score: float, company: CompanyMaster, shared
+) -> str:
+    detail = f" and shares the tags {', '.join(shared)}" if shared else ""
+    industry = f" operates in {company.industry}" if company.industry else ""
+    return (
+        f"Matched from the local company index (score {score:.2f}): "
+        f"{company.name}{industry}{detail}, in line with {input_company.name} "
+        f"and the focus on {input_company.personalNote}."
+    )
+
+
+async def find_local_matches(
+    request: CompanySearchRequest,
+) -> List[Tuple[float, CompanyMaster, List[str]]]:
+    if LOCAL_STORE_MODE == "off":
+        return []
+    return await asyncio.to_thread(company_store.find_similar, request, 5)
+
+
+def serve_locally(
+    request: CompanySearchRequest, matches
+) -> Optional[CompanySearchResponse]:
+    """A full response from the local index when it is confident enough"""
+    if LOCAL_STORE_MODE != "serve":
+        return None
+    if len(matches) < 5 or matches[-1][0] < LOCAL_SERVE_MIN_SCORE:
+        cache_lookups.inc(cache="local_store", result="miss")
+        return None
+    cache_lookups.inc(cache="local_store", result="hit")
+    company_store.local_serves += 1
+    log_debug(f"Serving {request.name} from the local company index")
+    return CompanySearchResponse(
+        inputCompany=request,
+        similarCompanies=[
+            SimilarCompanyResult(
+                company=company,
+                justification=local_match_justification(
+                    request, score, company, shared
+                ),
+            )
+            for score, company, shared in matches
+        ],
+    )
+
+
+def local_prefill_results(matches) -> List[dict]:
+    """Known companies rendered as extra search results for the prompt"""
+    prefill = []
+    for score, company, _ in matches[:LOCAL_PREFILL_LIMIT]:
+        fields = company.model_dump(exclude={"id"}, exclude_none=True)
+        prefill.append(
+            {
+                "title": f"{company.name} (local company index, score {score:.2f})",
+                "content": json.dumps(fields),
+                "url": company.websiteUrl or "",
+                "published_date": "",
+                "target_company": company.name,
+                "stored": True,
+            }
+        )
+    if prefill:
+        company_store.prefills += 1
+    return prefill
+
+
+async def remember_companies(
+    request: CompanySearchRequest,
+    results: List[SimilarCompanyResult],
+    search_results: Sequence[dict] = (),
+) -> None:
+    if LOCAL_STORE_MODE != "off":
+        await asyncio.to_thread(company_store.upsert, request, results)
+    await remember_entities(results, search_results)
+
+
+# Entity cache of slow-changing CompanyMaster facts, keyed by normalized
+# company name. Each field is stored with its own timestamp and expires after
+# the TTL of its group, so a stale stillInBusiness flag doesn't throw away a
+# website URL that is still good.
+ENTITY_CACHE_PATH = os.environ.get("ENTITY_CACHE_PATH", COMPANY_STORE_PATH)
+ENTITY_TTL_URLS = float(os.environ.get("ENTITY_TTL_URLS", "2592000"))
+ENTITY_TTL_PROFILE = float(os.environ.get("ENTITY_TTL_PROFILE", "604800"))
+ENTITY_TTL_STATUS = float(os.environ.get("ENTITY_TTL_STATUS", "86400"))
+ENTITY_FIELD_TTLS = {
+    "websiteUrl": ENTITY_TTL_URLS,
+    "wikipediaUrl": ENTITY_TTL_URLS,
+    "linkedinUrl": ENTITY_TTL_URLS,
+    "logoUrl": ENTITY_TTL_URLS,
+    "naicsCode": ENTITY_TTL_URLS,
+    "description": ENTITY_TTL_PROFILE,
+    "industry": ENTITY_TTL_PROFILE,
+    "stillInBusiness": ENTITY_TTL_STATUS,
+}
+# The facts a detailed search is run to find; a candidate with fresh values
+# for all of them skips its detailed search
+ENTITY_REQUIRED_FIELDS = ("websiteUrl", "description", "industry", "stillInBusiness")
+
+
+def entity_key(name: str) -> str:
+    """Company name without case, punctuation or a trailing corporate suffix"""
+    words = WORD_PATTERN.findall(name.casefold())
+    while len(words) > 1 and words[-1] in CORPORATE_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+class EntityCache:
+    """Per-field CompanyMaster facts in SQLite.
+
+    Only non-empty values are stored, so a missing fact is never mistaken for
+    a known absence. Freshness is checked at read time against the TTL of
+    each field in ``ttls``.
+    """
+
+    def __init__(self, path: str, ttls: Dict[str, float]):
+        self.path = path
+        self.ttls = ttls
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.partial = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and self.path:
+            try:
+                conn = open_sqlite(self.path)
+                conn.execute("""CREATE TABLE IF NOT EXISTS entity_facts (
+                        name_key TEXT NOT NULL,
+                        field TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        updated_at REAL NOT NULL,
+                        PRIMARY KEY (name_key, field)
+                    )""")
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                log_debug(f"Entity cache unavailable: {e}", "ERROR")
+                self.path = ""
+        return self._conn
+
+    def lookup(self, names: List[str]) -> Dict[str, dict]:
+        """Fresh facts for each name that has any, keyed by the name as given"""
+        keys = {name: entity_key(name) for name in names}
+        wanted = sorted({key for key in keys.values() if key})
+        if not wanted:
+            return {}
+        now = time.time()
+        margin = cache_refresh_margin.get()
+        facts: Dict[str, dict] = {}
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return {}
+            try:
+                rows = conn.execute(
+                    "SELECT name_key, field, value, updated_at FROM entity_facts "
+                    f"WHERE name_key IN ({', '.join('?' * len(wanted))})",
+                    wanted,
+                ).fetchall()
+            except sqlite3.Error as e:
+                log_debug(f"Entity cache read failed: {e}", "ERROR")
+                return {}
+        for key, field, value, updated_at in rows:
+            if now - updated_at < self.ttls.get(field, 0) - margin:
+                facts.setdefault(key, {})[field] = json.loads(value)
+
+        found = {name: facts[key] for name, key in keys.items() if key in facts}
+        with self._lock:
+            for name in names:
+                if name not in found:
+                    self.misses += 1
+                elif is_entity_complete(found[name]):
+                    self.hits += 1
+                else:
+                    self.partial += 1
+        return found
+
+    def record(self, companies: List[CompanyMaster]) -> None:
+        """Store the non-empty cacheable fields of each company as fresh"""
+        now = time.time()
+        rows = []
+        for company in companies:
+            key = entity_key(company.name)
+            if not key:
+                continue
+            for field in self.ttls:
+                value = getattr(company, field)
+                if value is not None and value != "":
+                    rows.append((key, field, json.dumps(value), now))
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO entity_facts VALUES (?, ?, ?, ?)", rows
+                )
+                conn.commit()
+                self.writes += len(rows)
+            except sqlite3.Error as e:
+                log_debug(f"Entity cache write failed: {e}", "ERROR")
+
+    def count(self) -> int:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return 0
+            return conn.execute(
+                "SELECT COUNT(DISTINCT name_key) FROM entity_facts"
+            ).fetchone()[0]
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path or None,
+            "ttl_seconds": {
+                "urls": ENTITY_TTL_URLS,
+                "profile": ENTITY_TTL_PROFILE,
+                "status": ENTITY_TTL_STATUS,
+            },
+            "companies": self.count(),
+            "hits": self.hits,
+            "partial": self.partial,
+            "misses": self.misses,
+            "writes": self.writes,
+        }
+
+
+entity_cache = EntityCache(ENTITY_CACHE_PATH, ENTITY_FIELD_TTLS)
+
+
+def is_entity_complete(facts: dict) -> bool:
+    return all(field in facts for field in ENTITY_REQUIRED_FIELDS)
+
+
+async def lookup_entities(candidates: List[str]) -> Dict[str, dict]:
+    """Fresh cached facts for the detailed-search candidates"""
+    if not candidates or not entity_cache.path:
+        return {}
+    facts = await asyncio.to_thread(entity_cache.lookup, candidates)
+    for name in candidates:
+        if name not in facts:
+            result = "miss"
+        else:
+            result = "hit" if is_entity_complete(facts[name]) else "partial"
+        cache_lookups.inc(cache="entity", result=result)
+    return facts
+
+
+def entity_fact_result(company_name: str, facts: dict) -> dict:
+    """Cached facts rendered as a detailed search result for the prompt"""
+    return {
+        "title": f"{company_name} (cached company facts)",
+        "content": json.dumps(facts),
+        "url": facts.get("websiteUrl") or "",
+        "published_date": "",
+        "target_company": company_name,
+        "stored": True,
+    }
+
+
+async def remember_entities(
+    results: List[SimilarCompanyResult], search_results: Sequence[dict] = ()
+) -> None:
+    """Cache the facts the LLM found for each company.
+
+    Companies whose only details in the prompt came from our own stores are
+    skipped: the model just echoed those facts back, and recording them would
+    keep them fresh forever without a live lookup.
+    """
+    if not entity_cache.path:
+        return
+    live = set()
+    stored = set()
+    for result in search_results:
+        if "target_company" in result:
+            target = entity_key(result["target_company"])
+            (stored if result.get("stored") else live).add(target)
+    echoed = stored - live
+    companies = [
+        result.company
+        for result in results
+        if entity_key(result.company.name) not in echoed
+    ]
+    await asyncio.to_thread(entity_cache.record, companies)
+
+
+# Health check endpoint
+@app.get("/")
+async def health_check():
+    return {
+        "status": "healthy",
+        "service": "Company Search API",
+        "groq_key_present": bool(GROQ_API_KEY),
+        "tavily_key_present": bool(TAVILY_API_KEY),
+    }
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/warmup")
+async def warmup():
+    """Load the provider stacks ahead of the first search"""
+    return await warm_up()
+
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    """Prometheus metrics: request and stage latency, LLM tokens, cache lookups"""
+    return encoded_response(
+        render_metrics().encode("utf-8"),
+        request.headers,
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "search": search_cache.stats(),
+        "shared": shared_cache.stats(),
+        "tavily": tavily_cache.stats(),
+        "prompt": prompt_stats.stats(),
+        "company_store": {**company_store.stats(), "mode": LOCAL_STORE_MODE},
+        "entities": entity_cache.stats(),
+        "rate_limits": rate_limit_stats(),
+        "jobs": job_runner.stats(),
+        "warmer": cache_warmer.stats(),
+        "singleflight": {
+            "search": search_flight.stats(),
+            "llm": llm_flight.stats(),
+        },
+    }
+
+
+async def detailed_company_search(tavily_client, company_name: str) -> List[dict]:
+    """Run the detailed lookup for a single candidate company"""
+    detailed_query = f"{company_name} company website linkedin wikipedia description industry business bankruptcy liquidation closure ceased"
+    log_debug(f"Detailed search for: {company_name}", "DEBUG")
+
+    with span("detailed_search", company=company_name):
+        detailed_response = await cached_tavily_search(
+            tavily_client,
+            detailed_query,
+            search_depth="basic",
+            timeout=TAVILY_DETAILED_TIMEOUT,
+        )
+
+    # Top 3 results per company
+    return [
+        {
+            "title": result.get("title", ""),
+            "content": result.get("content", ""),
+            "url": result.get("url", ""),
+            "published_date": result.get("published_date", ""),
+            "target_company": company_name,  # Mark which company this search was for
+        }
+        for result in detailed_response.get("results", [])[:3]
+    ]
+
+
+async def run_detailed_searches(
+    tavily_client, candidates: List[str]
+) -> Dict[str, List[dict]]:
+    """Run detailed searches for all candidates concurrently.
+
+    At most TAVILY_DETAILED_CONCURRENCY searches are in flight at once and each
+    one is bounded by TAVILY_DETAILED_TIMEOUT, or by what is left of the
+    request deadline after the LLM reserve. A candidate whose search fails or
+    times out is dropped without holding up the others.
+    """
+    deadline = current_deadline()
+    if deadline.remaining(DEADLINE_LLM_RESERVE) < MIN_SEARCH_BUDGET:
+        deadline.degrade("detailed_searches_skipped")
+        return {}
+
+    semaphore = asyncio.Semaphore(max(1, TAVILY_DETAILED_CONCURRENCY))
+    deadline_bound = set()
+
+    async def bounded_search(company_name: str) -> List[dict]:
+        async with semaphore:
+            budget = deadline.remaining(DEADLINE_LLM_RESERVE)
+            if budget < TAVILY_DETAILED_TIMEOUT:
+                deadline_bound.add(company_name)
+            return await asyncio.wait_for(
+                detailed_company_search(tavily_client, company_name),
+                timeout=max(0.0, min(TAVILY_DETAILED_TIMEOUT, budget)),
+            )
+
+    outcomes = await asyncio.gather(
+        *(bounded_search(company_name) for company_name in candidates),
+        return_exceptions=True,
+    )
+
+    results = {}
+    for company_name, outcome in zip(candidates, outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            log_debug(f"Detailed search timed out for {company_name}", "ERROR")
+            if company_name in deadline_bound:
+                deadline.degrade("detailed_searches_cut")
+        elif isinstance(outcome, RateLimitExceeded):
+            log_debug(f"Detailed search rate limited for {company_name}", "WARNING")
+            deadline.degrade("detailed_searches_rate_limited")
+        elif isinstance(outcome, Exception):
+            log_debug(
+                f"Error in detailed search for {company_name}: {outcome}", "ERROR"
+            )
+        else:
+            results[company_name] = outcome
+    return results
+
+
+CORPORATE_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "ltd",
+    "limited", "llc", "llp", "lp", "plc", "gmbh", "ag", "sa", "se", "nv",
+    "bv", "ab", "asa", "oy", "spa", "srl", "pty", "kk", "holdings", "group",
+}  # fmt: skip
+NAME_CONNECTORS = {"&", "of", "de", "du", "da", "von", "van", "der", "la"}
+CANDIDATE_STOPWORDS = {
+    # Articles, pronouns and sentence starters
+    "a", "an", "the", "this", "that", "these", "those", "it", "its", "we",
+    "our", "you", "your", "they", "their", "he", "she", "his", "her", "i",
+    "in", "on", "at", "for", "with", "by", "from", "to", "as", "and", "or",
+    "but", "if", "while", "when", "where", "what", "which", "who", "why",
+    "how", "also", "both", "all", "some", "many", "most", "more", "other",
+    "another", "each", "every", "such", "like", "unlike", "including",
+    "however", "although", "because", "after", "before", "during", "since",
+    "here", "there", "then", "now", "today", "yesterday", "tomorrow", "new",
+    "is", "are", "was", "were", "be", "has", "have", "had", "can", "will",
+    # Listicle and web boilerplate
+    "top", "best", "leading", "biggest", "largest", "list", "lists", "guide",
+    "review", "reviews", "vs", "versus", "similar", "alternatives",
+    "alternative", "competitors", "competitor", "companies", "company",
+    "startups", "startup", "brands", "brand", "businesses", "business",
+    "industry", "industries", "market", "markets", "report", "news", "read",
+    "click", "home", "about", "contact", "login", "sign", "learn",
+    "watch", "see", "find", "get", "overview", "introduction",
+    "conclusion", "summary", "key", "takeaways", "ceo", "founder", "cto",
+    "inc", "llc", "ltd", "corp", "faq", "faqs", "q", "no", "yes",
+    # Sentence openers in article text
+    "according", "meanwhile", "additionally", "furthermore", "moreover",
+    "overall", "currently", "recently", "despite", "though", "still", "yet",
+    "so", "thus", "therefore", "instead", "just", "only", "even", "not",
+    "based", "several", "few", "others", "one", "two", "three", "first",
+    # People and groups quoted in coverage
+    "experts", "expert", "analysts", "analyst", "customers", "customer",
+    "investors", "investor", "consumers", "consumer", "users", "user",
+    "buyers", "drivers", "critics", "researchers", "officials", "executives",
+    "employees", "workers", "shareholders", "observers", "sources",
+    "studies", "study", "people", "insiders", "regulators", "reports",
+    "fans", "owners", "readers", "viewers", "members", "partners",
+}  # fmt: skip
+# Words that can be part of a name ("Bank of America") but are not a company
+# name on their own
+GENERIC_NAME_WORDS = {
+    "us", "usa", "uk", "eu", "europe", "european", "america", "american",
+    "asia", "china", "chinese", "india", "germany", "japan", "california",
+    "global", "international", "national", "north", "south", "east", "west",
+    "january", "february", "march", "april", "may", "june", "july",
+    "august", "september", "october", "november", "december", "monday",
+    "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "ai", "api", "saas", "b2b", "b2c", "ev", "evs", "ipo", "ceo", "cto",
+    "cfo", "coo", "hq", "2020s",
+}  # fmt: skip
+CANDIDATE_TOKEN_PATTERN = re.compile(
+    r"[A-Za-z0-9][A-Za-z0-9&'\u2019\-.]*[A-Za-z0-9]|[A-Za-z0-9&]|[^\sA-Za-z0-9]"
+)
+# A token after one of these (or first in a field) starts a sentence, where
+# capitalization says nothing about whether it is a name
+SENTENCE_ENDS = set('.!?:;|"\u201c\u201d\u2022')
+# Score kept by a single word that is only ever capitalized at the start of
+# a sentence ("Experts say ...")
+SENTENCE_START_WEIGHT = 0.2
+
+
+def _is_name_token(token: str) -> bool:
+    return token[0].isupper() and not token.isdigit()
+
+
+def _name_key(words: List[str]) -> Tuple[str, ...]:
+    """Comparable form of a name: lower-case, no possessive or plural s"""
+    return tuple(
+        re.sub(r"('s|\u2019s)$", "", word.lower()).rstrip(".") for word in words
+    )
+
+
+def _split_name_span(span: List[str]) -> List[Tuple[List[str], bool]]:
+    """Split a run of capitalized tokens into names, stripping stopwords.
+
+    Returns (words, had_corporate_suffix) pairs; suffixes are kept in the
+    words but flagged so "Tesla" and "Tesla Inc" can share a key.
+    """
+    names = []
+    current: List[str] = []
+
+    def flush():
+        while current and current[-1].lower() in NAME_CONNECTORS:
+            current.pop()
+        if current:
+            names.append(list(current))
+        current.clear()
+
+    for word in span:
+        lowered = _name_key([word])[0]
+        if lowered in CORPORATE_SUFFIXES and current:
+            current.append(word)
+            flush()
+        elif lowered in CANDIDATE_STOPWORDS:
+            flush()
+        elif lowered in NAME_CONNECTORS and not current:
+            continue
+        else:
+            current.append(word)
+    flush()
+
+    result = []
+    for words in names:
+        has_suffix = _name_key(words[-1:])[0] in CORPORATE_SUFFIXES
+        if len(words) > 5:
+            continue
+        result.append((words, has_suffix))
+    return result
+
+
+def extract_company_candidates(
+    results: List[dict], exclude: str = "", query_terms: str = "", top_k: int = 5
+) -> List[str]:
+    """Rank likely company names mentioned across the initial search results.
+
+    Runs of capitalized tokens (optionally joined by "&", "of", ...) are split
+    on stopwords and scored per mention: titles count double, earlier results
+    count more, and each result that mentions a name adds a bonus, as does a
+    corporate suffix. Longer variants of a name that is also mentioned on its
+    own ("Rivian Automotive", "Rivian R1T") are folded into it. Names made
+    only of query words, single words that also appear in lower case,
+    headline-only one-offs and the input company itself are dropped, and a
+    single word that is never capitalized mid-sentence in the content keeps
+    only SENTENCE_START_WEIGHT of its score. Ties are broken alphabetically,
+    so the ranking is stable across processes.
+    """
+    scores: Dict[Tuple[str, ...], float] = {}
+    mentions: Dict[Tuple[str, ...], set] = {}
+    suffixed: set = set()
+    surfaces: Dict[Tuple[str, ...], Dict[str, int]] = {}
+    in_content: Dict[Tuple[str, ...], bool] = {}
+    mid_sentence: set = set()
+    lowercase_words = set()
+
+    for rank, result in enumerate(results):
+        position_weight = 1.0 / (1.0 + 0.2 * rank)
+        for field, field_weight in (("title", 2.0), ("content", 1.0)):
+            tokens = CANDIDATE_TOKEN_PATTERN.findall(result.get(field, "") or "")
+            lowercase_words.update(token for token in tokens if token.islower())
+            # (tokens, whether the first one starts a sentence)
+            spans: List[Tuple[List[str], bool]] = []
+            span: List[str] = []
+            span_at_start = False
+            for index, token in enumerate(tokens):
+                if _is_name_token(token) or (
+                    span
+                    and token.lower() in NAME_CONNECTORS
+                    and index + 1 < len(tokens)
+                    and _is_name_token(tokens[index + 1])
+                ):
+                    if not span:
+                        span_at_start = index == 0 or tokens[index - 1] in SENTENCE_ENDS
+                    span.append(token)
+                else:
+                    if span:
+                        spans.append((span, span_at_start))
+                    span = []
+            if span:
+                spans.append((span, span_at_start))
+
+            for span, span_at_start in spans:
+                for position, (words, has_suffix) in enumerate(_split_name_span(span)):
+                    core = words[:-1] if has_suffix else words
+                    key = _name_key(core)
+                    scores[key] = scores.get(key, 0.0) + field_weight * position_weight
+                    mentions.setdefault(key, set()).add(rank)
+                    in_content[key] = in_content.get(key, False) or field == "content"
+                    if field == "content" and not (
+                        span_at_start and position == 0 and words[0] == span[0]
+                    ):
+                        mid_sentence.add(key)
+                    if has_suffix:
+                        suffixed.add(key)
+                    surface = " ".join(words)
+                    forms = surfaces.setdefault(key, {})
+                    forms[surface] = forms.get(surface, 0) + 1
+
+    # Fold longer variants into a shorter name mentioned on its own
+    # ("Rivian Automotive", "Rivian R1T" -> "Rivian")
+    for key in sorted(scores, key=lambda k: (-len(k), k)):
+        bases = [
+            other
+            for other in scores
+            if len(other) < len(key) and key[: len(other)] == other
+        ]
+        if bases:
+            base = min(bases, key=len)
+            scores[base] += scores.pop(key)
+            mentions[base] |= mentions.pop(key)
+            in_content[base] = in_content[base] or in_content.pop(key)
+            if key in mid_sentence:
+                mid_sentence.add(base)
+            surfaces.pop(key)
+            if key in suffixed:
+                suffixed.add(base)
+
+    excluded = _name_key(exclude.split())
+    while excluded and excluded[-1] in CORPORATE_SUFFIXES:
+        excluded = excluded[:-1]
+    query_words = {
+        word.rstrip("s") for word in WORD_PATTERN.findall(query_terms.lower())
+    }
+
+    ranked = []
+    for key, score in scores.items():
+        score += len(mentions[key]) + (1.5 if key in suffixed else 0.0)
+        if key not in suffixed:
+            # Ordinary words capitalized at sentence start or in headlines
+            if len(key) == 1 and key[0] in lowercase_words:
+                continue
+            if not in_content[key] and len(mentions[key]) < 2:
+                continue
+            if len(key) == 1 and key not in mid_sentence:
+                score *= SENTENCE_START_WEIGHT
+        if key == excluded or (excluded and key[: len(excluded)] == excluded):
+            continue
+        if key not in suffixed and all(
+            word.rstrip("s") in query_words or word in GENERIC_NAME_WORDS
+            for word in key
+        ):
+            continue
+        if len(key) == 1 and len(key[0]) < 2:
+            continue
+        forms = surfaces[key]
+        name = max(forms, key=lambda surface: (forms[surface], surface))
+        ranked.append((-score, name.lower(), name))
+
+    ranked.sort()
+    return [name for _, _, name in ranked[:top_k]]
+
+
+def extract_initial_results(initial_response: dict) -> List[dict]:
+    """Collect the top initial results from the broad similarity search"""
+    # Get top 8 results
+    return [
+        {
+            "title": result.get("title", ""),
+            "content": result.get("content", ""),
+            "url": result.get("url", ""),
+            "published_date": result.get("published_date", ""),
+        }
+        for result in initial_response.get("results", [])[:8]
+    ]
+
+
+async def search_similar_companies(
+    name: str,
+    personal_note: str,
+    tags: str,
+    progress: Optional[Callable[..., None]] = None,
+) -> List[dict]:
+    """Search for similar companies using Tavily with enhanced detail search
+
+    ``progress`` is called as ``progress(phase, **details)`` when each search
+    phase starts; the streaming endpoint forwards these to the client.
+    """
+    progress = progress or (lambda phase, **details: None)
+    if not TAVILY_API_KEY:
+        log_debug("Tavily API key not configured", "ERROR")
+        return []
+
+    try:
+        await ensure_providers()
+        tavily_client = get_tavily_client()
+
+        # Step 1: Initial broad search to identify similar companies
+        search_query = f"companies similar to {name} in {personal_note} industry with focus on {tags}"
+        log_debug(f"Initial search query: {search_query}")
+        progress("initial_search")
+
+        with span("initial_search") as attributes:
+            initial_response = await asyncio.wait_for(
+                cached_tavily_search(
+                    tavily_client, search_query, search_depth="advanced"
+                ),
+                timeout=current_deadline().timeout(
+                    DEADLINE_LLM_RESERVE, minimum=MIN_SEARCH_BUDGET
+                ),
+            )
+            attributes["results"] = len(initial_response.get("results", []))
+
+        # Step 2: Extract potential company names from initial results
+        initial_results = extract_initial_results(initial_response)
+
+        # Step 3: Do targeted searches for top company candidates
+        all_results = initial_results.copy()
+
+        # Limit to the top-ranked candidates to avoid too many API calls;
+        # the input company itself is never a candidate
+        candidates = extract_company_candidates(
+            initial_results,
+            exclude=name,
+            query_terms=f"{personal_note} {tags}",
+            top_k=DETAILED_SEARCH_CANDIDATES,
+        )
+
+        # Candidates with fresh cached facts for everything a detailed search
+        # looks for skip it; partly known ones are searched with the facts kept
+        known = await lookup_entities(candidates)
+        cached = [
+            name for name in candidates if is_entity_complete(known.get(name, {}))
+        ]
+        to_search = [name for name in candidates if name not in cached]
+        progress("detailed_search", candidates=to_search, cached=cached)
+        detailed_results = (
+            await run_detailed_searches(tavily_client, to_search) if to_search else {}
+        )
+
+        # Keep results grouped per candidate, in candidate order
+        for company_name in candidates:
+            if company_name in known:
+                all_results.append(
+                    entity_fact_result(company_name, known[company_name])
+                )
+            all_results.extend(detailed_results.get(company_name, []))
+
+        log_debug(f"Found {len(all_results)} total search results (initial + detailed)")
+        return all_results
+
+    except RateLimitExceeded:
+        raise
+    except Exception as e:
+        log_debug(f"Tavily search error: {e}", "ERROR")
+        return []
+
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (about 4 characters per token)"""
+    return (len(text) + 3) // 4
+
+
+def normalize_url(url: str) -> str:
+    """Comparable form of a URL: no scheme, www., query, fragment or trailing slash"""
+    parts = urlsplit(url.strip().lower())
+    host = parts.netloc[4:] if parts.netloc.startswith("www.") else parts.netloc
+    return f"{host}{parts.path.rstrip('/')}"
+
+
+def content_shingles(text: str) -> set:
+    """Word 3-grams used to spot near-duplicate snippets"""
+    words = WORD_PATTERN.findall(text.lower())
+    return {" ".join(words[i : i + 3]) for i in range(max(1, len(words) - 2))}
+
+
+def render_search_results(general: List[dict], targeted: List[dict]) -> str:
+    """Render search results as prompt text, general results first"""
+    parts = ["=== SIMILARITY SEARCH RESULTS ===\n"]
+
+    # Add general similarity results
+    for i, result in enumerate(general, 1):
+        parts.append(
+            f"\n{i}. GENERAL: {result['title']}\n"
+            f"Content: {result['content']}\n"
+            f"URL: {result['url']}\n" + "-" * 50 + "\n"
+        )
+
+    # Add company-specific detailed results
+    if targeted:
+        parts.append("\n=== DETAILED COMPANY INFORMATION ===\n")
+        current_company = ""
+        for result in targeted:
+            target_company = result.get("target_company", "")
+            if target_company != current_company:
+                current_company = target_company
+                parts.append(f"\n--- DETAILS FOR: {target_company} ---\n")
+
+            parts.append(
+                f"Title: {result['title']}\n"
+                f"Content: {result['content']}\n"
+                f"URL: {result['url']}\n" + "-" * 30 + "\n"
+            )
+
+    return "".join(parts)
+
+
+def build_results_text(
+    search_results: List[dict],
+    input_company: CompanySearchRequest,
+    token_budget: int = LLM_PROMPT_TOKEN_BUDGET,
+) -> Tuple[str, dict]:
+    """Assemble the search-results section of the prompt within a token budget.
+
+    Results are deduplicated by URL and by near-identical content, scored by
+    overlap with the input company's name, note and tags (plus the target
+    company for detailed results), and admitted best-first until the budget
+    is spent. The first result for each detailed candidate gets a boost so
+    no candidate is starved. Returns the text and per-request statistics.
+    """
+    general = [r for r in search_results if "target_company" not in r]
+    targeted = [r for r in search_results if "target_company" in r]
+    tokens_before = estimate_tokens(render_search_results(general, targeted))
+
+    # Drop repeated URLs and near-duplicate snippets, keeping the first seen
+    seen_urls = set()
+    kept_shingles: List[set] = []
+    unique = []
+    for result in general + targeted:
+        url = normalize_url(result.get("url", ""))
+        if url and url in seen_urls:
+            continue
+        shingles = content_shingles(f"{result['title']} {result['content']}")
+        if any(
+            len(shingles & other) / len(shingles | other) >= NEAR_DUPLICATE_THRESHOLD
+            for other in kept_shingles
+        ):
+            continue
+        seen_urls.add(url)
+        kept_shingles.append(shingles)
+        unique.append(result)
+
+    # Score by overlap with the query terms
+    query_terms = set(
+        WORD_PATTERN.findall(
+            f"{input_company.name} {input_company.personalNote} {input_company.tags}".lower()
+        )
+    )
+    first_for_company = set()
+    scored = []
+    for position, result in enumerate(unique):
+        words = set(
+            WORD_PATTERN.findall(f"{result['title']} {result['content']}".lower())
+        )
+        score = len(words & query_terms) / (len(query_terms) or 1)
+        target = result.get("target_company")
+        if target:
+            target_terms = set(WORD_PATTERN.findall(target.lower()))
+            score += len(words & target_terms) / (len(target_terms) or 1)
+            if target not in first_for_company:
+                first_for_company.add(target)
+                score += 1.0
+        scored.append((score, position, result))
+
+    # Admit results best-first until the budget runs out, trimming the last one
+    remaining = token_budget - estimate_tokens(render_search_results([], []))
+    selected = {}
+    for score, position, result in sorted(scored, key=lambda x: (-x[0], x[1])):
+        cost = estimate_tokens(render_search_results([result], []))
+        if cost > remaining:
+            spare_chars = (remaining - (cost - estimate_tokens(result["content"]))) * 4
+            if spare_chars < 200:
+                continue
+            result = {**result, "content": result["content"][:spare_chars] + "..."}
+            cost = estimate_tokens(render_search_results([result], []))
+        selected[position] = (score, result)
+        remaining -= cost
+
+    # Render general results by relevance, detailed results grouped per candidate
+    chosen = [selected[position] for position in sorted(selected)]
+    general_out = sorted(
+        (entry for entry in chosen if "target_company" not in entry[1]),
+        key=lambda entry: -entry[0],
+    )
+    targeted_out = [entry for entry in chosen if "target_company" in entry[1]]
+    results_text = render_search_results(
+        [result for _, result in general_out], [result for _, result in targeted_out]
+    )
+
+    tokens_after = estimate_tokens(results_text)
+    stats = {
+        "results_in": len(search_results),
+        "results_used": len(chosen),
+        "duplicates_removed": len(search_results) - len(unique),
+        "dropped_for_budget": len(unique) - len(chosen),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": max(0, tokens_before - tokens_after),
+    }
+    return results_text, stats
+
+
+class PromptStats:
+    """Running totals of prompt-assembly savings across requests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.duplicates_removed = 0
+
+    def record(self, input_company: CompanySearchRequest, stats: dict) -> None:
+        log_debug(
+            f"Prompt for {input_company.name}: {stats['results_used']}/{stats['results_in']} results, "
+            f"{stats['duplicates_removed']} duplicates removed, "
+            f"~{stats['tokens_after']} tokens (saved ~{stats['tokens_saved']})"
+        )
+        with self._lock:
+            self.prompts += 1
+            self.tokens_before += stats["tokens_before"]
+            self.tokens_after += stats["tokens_after"]
+            self.duplicates_removed += stats["duplicates_removed"]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "token_budget": LLM_PROMPT_TOKEN_BUDGET,
+                "prompts": self.prompts,
+                "tokens_before": self.tokens_before,
+                "tokens_after": self.tokens_after,
+                "tokens_saved": self.tokens_before - self.tokens_after,
+                "duplicates_removed": self.duplicates_removed,
+            }
+
+
+prompt_stats = PromptStats()
+
+
+async def prepare_results_text(
+    search_results: List[dict], input_company: CompanySearchRequest
+) -> str:
+    """Build the prompt's search-results text off the event loop and record savings"""
+    with span("prompt_build") as attributes:
+        results_text, stats = await asyncio.to_thread(
+            build_results_text, search_results, input_company
+        )
+        attributes["tokens"] = stats["tokens_after"]
+    prompt_stats.record(input_company, stats)
+    return results_text
+
+
+def coerce_text(value) -> Optional[str]:
+    """An LLM-supplied scalar as stripped text; None for null, empty or
+    structured values"""
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return None
+    return str(value).strip() or None
+
+
+def coerce_tags(value) -> List[str]:
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list):
+        return []
+    return [tag for tag in map(coerce_text, value) if tag]
+
+
+def coerce_flag(value) -> Optional[bool]:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return {"true": True, "false": False}.get(value.strip().lower())
+    return None
+
+
+def build_similar_company(
+    item: dict, index: int, input_company: CompanySearchRequest
+) -> Optional[SimilarCompanyResult]:
+    """Convert one parsed LLM item into a SimilarCompanyResult.
+
+    Null or missing fields fall back to their defaults and numbers are
+    accepted where text is expected (a numeric naicsCode, say). An item that
+    still doesn't validate is logged and dropped (None), so one bad item
+    doesn't cost the rest of the answer.
+    """
+    company_data = item.get("company")
+    if not isinstance(company_data, dict):
+        company_data = {}
+    justification = coerce_text(item.get("justification")) or ""
+    name = coerce_text(company_data.get("name"))
+    if not name:
+        log_debug(f"Dropping company item {index + 1} without a name", "WARNING")
+        return None
+
+    # Debug logging
+    log_debug(
+        f"Processing company {index+1}: {company_data.get('name', 'Unknown')}", "DEBUG"
+    )
+    log_debug(f"Justification length: {len(justification)}", "DEBUG")
+
+    # Ensure we have a justification
+    if not justification:
+        justification = (
+            f"Similar to {input_company.name} based on industry and business focus."
+        )
+
+    try:
+        company = CompanyMaster(
+            name=name,
+            websiteUrl=coerce_text(company_data.get("websiteUrl")),
+            wikipediaUrl=coerce_text(company_data.get("wikipediaUrl")),
+            linkedinUrl=coerce_text(company_data.get("linkedinUrl")),
+            logoUrl=coerce_text(company_data.get("logoUrl")),
+            description=coerce_text(company_data.get("description")) or "",
+            industry=coerce_text(company_data.get("industry")) or "",
+            tagsMaster=coerce_tags(company_data.get("tagsMaster")),
+            naicsCode=coerce_text(company_data.get("naicsCode")),
+            stillInBusiness=coerce_flag(company_data.get("stillInBusiness")),
+        )
+        return SimilarCompanyResult(company=company, justification=justification)
+    except ValidationError as e:
+        log_debug(f"Dropping invalid company item {index + 1}: {e}", "WARNING")
+        return None
+
+
+TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+
+
+def loads_lenient(text: str):
+    """json.loads that also accepts trailing commas; None when undecodable"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return json.loads(TRAILING_COMMA_PATTERN.sub(r"\1", text))
+    except ValueError:
+        return None
+
+
+class JsonArrayStreamParser:
+    """Incrementally pull complete objects out of a streamed JSON array.
+
+    Text before the array (prose, code fences) is ignored, including
+    bracketed prose such as "[as requested]": a ``[`` only opens the array
+    when the next non-blank character is ``{`` or ``]``. Each object
+    directly inside the array is decoded as soon as its closing brace
+    arrives, so callers can act on items while the rest is still streaming.
+    """
+
+    def __init__(self):
+        self._depth = 0
+        self._item_depth: Optional[int] = None
+        self._opening = False
+        self._in_string = False
+        self._escape = False
+        self._current: List[str] = []
+        self._capturing = False
+        self.closed = False
+
+    def feed(self, chunk: str) -> List[dict]:
+        items = []
+        for ch in chunk:
+            if self.closed:
+                break
+            if self._capturing:
+                self._current.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if self._item_depth is None:
+                # Still looking for the opening bracket of the array
+                if self._opening and not ch.isspace():
+                    self._opening = False
+                    if ch in "{]":
+                        self._depth = self._item_depth = 1
+                    # Otherwise that bracket was prose; keep looking
+                if ch == "[":
+                    self._opening = True
+                if self._item_depth is None:
+                    continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                if (
+                    ch == "{"
+                    and not self._capturing
+                    and self._depth == self._item_depth
+                ):
+                    self._capturing = True
+                    self._current = ["{"]
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+                if self._capturing and self._depth == self._item_depth:
+                    self._capturing = False
+                    item = loads_lenient("".join(self._current))
+                    if isinstance(item, dict):
+                        items.append(item)
+                if self._depth < self._item_depth:
+                    self.closed = True
+        return items
+
+
+def extract_company_items(content: str) -> List[dict]:
+    """Every complete company object in the LLM response text.
+
+    Well-formed output (a bare array, an array in a code fence, or a JSON-mode
+    ``{"companies": [...]}`` object) is decoded in one go. Anything else goes
+    through JsonArrayStreamParser, which keeps each object that closed
+    cleanly and drops a truncated or malformed one.
+    """
+    # Extract JSON from markdown code blocks if present
+    text = content.strip()
+    if "```" in text:
+        start = text.find("```")
+        start = text.find("\n", start) + 1 or start + 3
+        end = text.find("```", start)
+        if end != -1:
+            text = text[start:end].strip()
+
+    parsed = loads_lenient(text)
+    if isinstance(parsed, dict):
+        parsed = parsed.get("companies")
+    if isinstance(parsed, list):
+        return [item for item in parsed if isinstance(item, dict)]
+    return JsonArrayStreamParser().feed(content)
+
+
+def is_company_item(item: dict) -> bool:
+    company = item.get("company")
+    return isinstance(company, dict) and bool(str(company.get("name") or "").strip())
+
+
+def parse_llm_response(
+    content: str,
+    input_company: CompanySearchRequest,
+    known: Optional[List[SimilarCompanyResult]] = None,
+) -> List[SimilarCompanyResult]:
+    """Salvage up to 5 usable companies from the LLM response text.
+
+    Items without a company name, the input company itself and companies
+    already in ``known`` are skipped.
+    """
+    seen = {normalize_text(input_company.name)}
+    seen.update(normalize_text(item.company.name) for item in known or [])
+    similar_companies = []
+    for item in extract_company_items(content):
+        if not is_company_item(item):
+            continue
+        key = normalize_text(str(item["company"]["name"]))
+        if key in seen:
+            continue
+        company = build_similar_company(item, len(similar_companies), input_company)
+        if company is None:
+            continue
+        seen.add(key)
+        similar_companies.append(company)
+        if len(similar_companies) >= 5:  # Ensure max 5 companies
+            break
+    return similar_companies
+
+
+def estimate_llm_call_tokens(results_text: str, kind: str = "extract") -> int:
+    """Tokens an extraction call is charged against the Groq rate limiter"""
+    if kind == "map":
+        return (
+            estimate_tokens(MAP_SYSTEM_PROMPT)
+            + estimate_tokens(results_text)
+            + LLM_MAP_COMPLETION_TOKEN_ESTIMATE
+        )
+    return (
+        estimate_tokens(COMPANY_ANALYST_SYSTEM_PROMPT)
+        + estimate_tokens(results_text)
+        + LLM_COMPLETION_TOKEN_ESTIMATE
+    )
+
+
+def record_llm_tokens(
+    results_text: str,
+    completion: str,
+    usage: Optional[dict],
+    kind: str = "extract",
+    model_name: Optional[str] = None,
+) -> dict:
+    """Record prompt/completion token counts, preferring provider-reported usage.
+
+    With ``model_name``, the model's Groq rate limiter is settled: the call
+    was charged estimate_llm_call_tokens up front and is now charged the
+    tokens it actually used.
+    """
+    usage = usage or {}
+    system_prompt = (
+        MAP_SYSTEM_PROMPT if kind == "map" else COMPANY_ANALYST_SYSTEM_PROMPT
+    )
+    tokens = {
+        "prompt_tokens": usage.get("input_tokens")
+        or estimate_tokens(system_prompt) + estimate_tokens(results_text),
+        "completion_tokens": usage.get("output_tokens") or estimate_tokens(completion),
+    }
+    llm_tokens.observe(tokens["prompt_tokens"], kind="prompt")
+    llm_tokens.observe(tokens["completion_tokens"], kind="completion")
+    if model_name:
+        groq_limiter(model_name).settle(
+            estimate_llm_call_tokens(results_text, kind),
+            tokens["prompt_tokens"] + tokens["completion_tokens"],
+        )
+    return tokens
+
+
+async def hedged_llm_call(
+    make_call: Callable[[str], Awaitable],
+    discard: Optional[Callable] = None,
+    tokens: float = 0.0,
+):
+    """Run ``make_call(model_name)`` on GROQ_MODEL, hedged with LLM_FALLBACK_MODEL.
+
+    The fallback call starts once the primary has run for LLM_HEDGE_AFTER
+    seconds, once only LLM_FALLBACK_BUDGET of the deadline is left, or as
+    soon as the primary fails. The first success wins and the other call is
+    cancelled; ``discard`` receives a successful result that lost the race.
+    Each call first takes ``tokens`` from its model's Groq rate limiter.
+    Returns ``(result, model_name)``.
+    """
+
+    async def limited_call(model_name: str):
+        await groq_limiter(model_name).acquire(tokens)
+        charge_provider_call()
+        return await make_call(model_name)
+
+    deadline = current_deadline()
+    fallbacks = [LLM_FALLBACK_MODEL] if LLM_FALLBACK_MODEL != GROQ_MODEL else []
+    fallbacks = [model_name for model_name in fallbacks if model_name]
+    hedge_at = min(
+        time.monotonic() + LLM_HEDGE_AFTER, deadline.expires_at - LLM_FALLBACK_BUDGET
+    )
+    tasks: Dict[asyncio.Future, str] = {
+        asyncio.ensure_future(limited_call(GROQ_MODEL)): GROQ_MODEL
+    }
+    error: Optional[BaseException] = None
+    try:
+        while True:
+            if fallbacks and (not tasks or time.monotonic() >= hedge_at):
+                deadline.degrade("llm_hedged" if tasks else "llm_primary_failed")
+                model_name = fallbacks.pop(0)
+                tasks[asyncio.ensure_future(limited_call(model_name))] = model_name
+            if not tasks:
+                raise error
+
+            timeout = deadline.timeout()
+            if fallbacks:
+                until_hedge = max(0.0, hedge_at - time.monotonic())
+                timeout = until_hedge if timeout is None else min(timeout, until_hedge)
+            done, _ = await asyncio.wait(
+                tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done and deadline.remaining() <= 0:
+                deadline.degrade("llm_deadline_exceeded")
+                raise asyncio.TimeoutError("LLM call exceeded the request deadline")
+
+            winner = None
+            for task in done:
+                model_name = tasks.pop(task)
+                if task.exception() is not None:
+                    error = task.exception()
+                    log_debug(f"LLM call to {model_name} failed: {error}", "ERROR")
+                elif winner is None:
+                    winner = (task.result(), model_name)
+                elif discard is not None:
+                    discard(task.result())
+            if winner is not None:
+                if winner[1] != GROQ_MODEL:
+                    deadline.degrade("llm_fallback_model")
+                deadline.model = winner[1]
+                return winner
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def record_llm_answer(parsed: int, final: int) -> None:
+    if parsed >= 5:
+        outcome = "complete"
+    elif final > parsed:
+        outcome = "repaired"
+    elif final:
+        outcome = "salvaged"
+    else:
+        outcome = "failed"
+    llm_answers.inc(outcome=outcome)
+
+
+async def repair_missing_companies(
+    results_text: str,
+    input_company: CompanySearchRequest,
+    found: List[SimilarCompanyResult],
+) -> List[SimilarCompanyResult]:
+    """Ask the model for only the companies missing from an incomplete answer.
+
+    This reuses the prompt's search results, so an answer that was cut off
+    or partly malformed costs one short call instead of a full re-run.
+    """
+    repaired: List[SimilarCompanyResult] = []
+    for _ in range(LLM_REPAIR_ATTEMPTS):
+        missing = 5 - len(found) - len(repaired)
+        if missing <= 0:
+            break
+        if current_deadline().remaining() < LLM_FALLBACK_BUDGET:
+            current_deadline().degrade("llm_repair_skipped")
+            break
+        known = found + repaired
+        inputs = {
+            "input_name": input_company.name,
+            "input_note": input_company.personalNote,
+            "input_tags": input_company.tags,
+            "search_results": results_text,
+            "found_names": ", ".join(c.company.name for c in known) or "none",
+            "missing": missing,
+        }
+        try:
+            with span("repair", missing=missing) as attributes:
+                response, attributes["model"] = await hedged_llm_call(
+                    lambda model_name: get_llm_chain(model_name, "repair").ainvoke(
+                        inputs
+                    ),
+                    tokens=estimate_llm_call_tokens(results_text),
+                )
+                attributes.update(
+                    record_llm_tokens(
+                        results_text,
+                        response.content,
+                        getattr(response, "usage_metadata", None),
+                        model_name=attributes["model"],
+                    )
+                )
+        except Exception as e:
+            log_debug(f"LLM repair error: {e}", "ERROR")
+            break
+        extra = await asyncio.to_thread(
+            parse_llm_response, response.content, input_company, known
+        )
+        log_debug(f"Repair returned {len(extra)} of {missing} missing companies")
+        repaired.extend(extra[:missing])
+    return repaired
+
+
+def select_map_candidates(
+    search_results: List[dict], input_company: CompanySearchRequest
+) -> List[str]:
+    """Candidate companies for map-reduce extraction, best first.
+
+    Companies with detailed results come first, in search order, topped up
+    with the best-ranked names in the general results up to
+    LLM_MAP_CANDIDATES. A few more than 5 leave the merge room to drop
+    candidates the model rejects.
+    """
+    candidates = []
+    seen = {entity_key(input_company.name)}
+    general = [result for result in search_results if "target_company" not in result]
+    named = [
+        result["target_company"]
+        for result in search_results
+        if "target_company" in result
+    ] + extract_company_candidates(
+        general,
+        exclude=input_company.name,
+        query_terms=f"{input_company.personalNote} {input_company.tags}",
+        top_k=LLM_MAP_CANDIDATES,
+    )
+    for name in named:
+        key = entity_key(name)
+        if key and key not in seen:
+            seen.add(key)
+            candidates.append(name)
+    return candidates[:LLM_MAP_CANDIDATES]
+
+
+def build_map_texts(
+    search_results: List[dict],
+    input_company: CompanySearchRequest,
+    candidates: List[str],
+) -> List[str]:
+    """Per-candidate prompt text: the candidate's detailed results plus the
+    general results that mention it, within LLM_MAP_TOKEN_BUDGET"""
+    texts = []
+    for candidate in candidates:
+        needle = candidate.casefold()
+        own = [
+            result
+            for result in search_results
+            if result.get("target_company") == candidate
+            or (
+                "target_company" not in result
+                and needle in f"{result['title']} {result['content']}".casefold()
+            )
+        ]
+        texts.append(build_results_text(own, input_company, LLM_MAP_TOKEN_BUDGET)[0])
+    return texts
+
+
+async def extract_candidate(
+    candidate: str, results_text: str, input_company: CompanySearchRequest
+) -> Optional[dict]:
+    """One map call: the candidate's company item, or None if it was rejected"""
+    inputs = {
+        "input_name": input_company.name,
+        "input_note": input_company.personalNote,
+        "input_tags": input_company.tags,
+        "candidate_name": candidate,
+        "search_results": results_text,
+    }
+    with span("llm_map", candidate=candidate) as attributes:
+        response, attributes["model"] = await hedged_llm_call(
+            lambda model_name: get_llm_chain(model_name, "map").ainvoke(inputs),
+            tokens=estimate_llm_call_tokens(results_text, "map"),
+        )
+        attributes.update(
+            record_llm_tokens(
+                results_text,
+                response.content,
+                getattr(response, "usage_metadata", None),
+                kind="map",
+                model_name=attributes["model"],
+            )
+        )
+    items = [
+        item
+        for item in extract_company_items(response.content)
+        if is_company_item(item)
+    ]
+    return items[0] if items else None
+
+
+async def map_candidates(
+    search_results: List[dict], input_company: CompanySearchRequest
+) -> AsyncIterator[Tuple[int, dict]]:
+    """Run the map calls concurrently, yielding (candidate rank, item) as each
+    accepted candidate comes back.
+
+    A failed call drops its candidate; RateLimitExceeded is raised only if
+    no candidate got through.
+    """
+    candidates = select_map_candidates(search_results, input_company)
+    with span("prompt_build", mode="map_reduce") as attributes:
+        texts = await asyncio.to_thread(
+            build_map_texts, search_results, input_company, candidates
+        )
+        attributes["candidates"] = len(candidates)
+    await ensure_providers()
+
+    tasks = {
+        asyncio.ensure_future(extract_candidate(candidate, text, input_company)): rank
+        for rank, (candidate, text) in enumerate(zip(candidates, texts))
+    }
+    pending = set(tasks)
+    accepted = 0
+    rate_limited: Optional[RateLimitExceeded] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in sorted(done, key=tasks.get):
+                error = task.exception()
+                if isinstance(error, RateLimitExceeded):
+                    rate_limited = error
+                elif error is not None:
+                    log_debug(
+                        f"Map call for {candidates[tasks[task]]} failed: {error}",
+                        "ERROR",
+                    )
+                elif task.result() is not None:
+                    accepted += 1
+                    yield tasks[task], task.result()
+        if not accepted and rate_limited is not None:
+            raise rate_limited
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def map_item_relevance(item: dict) -> float:
+    try:
+        return float(item.get("relevance") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def merge_map_items(
+    items: List[Tuple[int, dict]], input_company: CompanySearchRequest
+) -> List[SimilarCompanyResult]:
+    """Reduce step: rank by the model's relevance score (ties by candidate
+    rank), drop duplicates and the input company, and keep the best 5"""
+    seen = {entity_key(input_company.name)}
+    similar_companies = []
+    for _, item in sorted(
+        items, key=lambda entry: (-map_item_relevance(entry[1]), entry[0])
+    ):
+        key = entity_key(str(item["company"]["name"]))
+        if key in seen:
+            continue
+        company = build_similar_company(item, len(similar_companies), input_company)
+        if company is None:
+            continue
+        seen.add(key)
+        similar_companies.append(company)
+        if len(similar_companies) >= 5:
+            break
+    return similar_companies
+
+
+async def map_reduce_with_llm(
+    search_results: List[dict], input_company: CompanySearchRequest
+) -> List[SimilarCompanyResult]:
+    """Extract companies with one short call per candidate instead of one
+    long call for all of them.
+
+    Each call sees only its candidate's snippets and writes one company, so
+    latency is bounded by the slowest short answer rather than by a
+    5-company completion. Fewer than 5 accepted candidates are topped up by
+    repair_missing_companies over the full results.
+    """
+    async with aclosing(map_candidates(search_results, input_company)) as mapped:
+        items = [entry async for entry in mapped]
+    similar_companies = merge_map_items(items, input_company)
+    parsed = len(similar_companies)
+    if parsed < 5:
+        log_debug(f"Map-reduce accepted {parsed} candidates", "WARNING")
+        results_text = await prepare_results_text(search_results, input_company)
+        similar_companies += await repair_missing_companies(
+            results_text, input_company, similar_companies
+        )
+    record_llm_answer(parsed, len(similar_companies))
+    return similar_companies
+
+
+async def process_with_llm(
+    search_results: List[dict], input_company: CompanySearchRequest
+) -> List[SimilarCompanyResult]:
+    """Process search results with LLM to extract structured company data"""
+    if not GROQ_API_KEY:
+        log_debug("GROQ API key not configured", "ERROR")
+        return []
+
+    try:
+        if request_llm_mode.get() == "map_reduce":
+            return await map_reduce_with_llm(search_results, input_company)
+
+        # Prepare deduplicated, token-budgeted search results text
+        results_text = await prepare_results_text(search_results, input_company)
+        await ensure_providers()
+
+        # Generate response, falling back to a faster model when slow
+        inputs = {
+            "input_name": input_company.name,
+            "input_note": input_company.personalNote,
+            "input_tags": input_company.tags,
+            "search_results": results_text,
+        }
+        with span("llm") as attributes:
+            response, attributes["model"] = await hedged_llm_call(
+                lambda model_name: get_llm_chain(model_name).ainvoke(inputs),
+                tokens=estimate_llm_call_tokens(results_text),
+            )
+            attributes.update(
+                record_llm_tokens(
+                    results_text,
+                    response.content,
+                    getattr(response, "usage_metadata", None),
+                    model_name=attributes["model"],
+                )
+            )
+
+        log_debug(f"LLM response length: {len(response.content)}")
+
+        # Parse JSON response, keeping every complete company
+        with span("parse") as attributes:
+            similar_companies = await asyncio.to_thread(
+                parse_llm_response, response.content, input_company
+            )
+            attributes["companies"] = len(similar_companies)
+        parsed = len(similar_companies)
+        if parsed < 5:
+            log_debug(f"LLM answer had {parsed} usable companies", "WARNING")
+            if not parsed:
+                log_debug(f"Raw response: {response.content}", "ERROR")
+            similar_companies += await repair_missing_companies(
+                results_text, input_company, similar_companies
+            )
+        record_llm_answer(parsed, len(similar_companies))
+
+        log_debug(f"Successfully processed {len(similar_companies)} companies")
+        return similar_companies
+
+    except RateLimitExceeded:
+        raise
+    except Exception as e:
+        log_debug(f"LLM processing error: {e}", "ERROR")
+        log_debug(f"Traceback: {traceback.format_exc()}", "ERROR")
+        return []
+
+
+async def coalesced_search(
+    request: CompanySearchRequest, progress: Optional[Callable[..., None]] = None
+) -> List[dict]:
+    """search_similar_companies, shared by concurrent identical requests.
+
+    ``progress`` receives the search's phase updates whether this request
+    started the search or joined one already running.
+    """
+    return await search_flight.do(
+        search_cache_key(request),
+        lambda publish: search_similar_companies(
+            request.name, request.personalNote, request.tags, progress=publish
+        ),
+        listener=progress,
+    )
+
+
+async def coalesced_process_with_llm(
+    search_results: List[dict], input_company: CompanySearchRequest
+) -> List[SimilarCompanyResult]:
+    """process_with_llm, shared by concurrent calls with identical inputs"""
+    key = hashlib.sha256(
+        json.dumps(
+            [search_cache_key(input_company), request_llm_mode.get(), search_results],
+            sort_keys=True,
+        ).encode("utf-8")
+    ).hexdigest()
+    return await llm_flight.do(
+        key, lambda _: process_with_llm(search_results, input_company)
+    )
+
+
+async def stream_llm_results(
+    search_results: List[dict], input_company: CompanySearchRequest
+) -> AsyncIterator[SimilarCompanyResult]:
+    """Stream the LLM completion, yielding each company as soon as it closes.
+
+    An answer that ends with fewer than 5 usable companies is topped up by
+    repair_missing_companies. In map-reduce mode companies are yielded as
+    their map calls finish, so they arrive in completion order, not ranked.
+    """
+    if request_llm_mode.get() == "map_reduce":
+        async for company in stream_map_reduce(search_results, input_company):
+            yield company
+        return
+
+    results_text = await prepare_results_text(search_results, input_company)
+    await ensure_providers()
+    parser = JsonArrayStreamParser()
+    found: List[SimilarCompanyResult] = []
+    seen = {normalize_text(input_company.name)}
+    completion = []
+    usage = None
+
+    inputs = {
+        "input_name": input_company.name,
+        "input_note": input_company.personalNote,
+        "input_tags": input_company.tags,
+        "search_results": results_text,
+    }
+
+    async def start_stream(model_name: str):
+        # Hedge on the first chunk: the stream that starts first is kept
+        stream = get_llm_chain(model_name).astream(inputs)
+        try:
+            first = await stream.__anext__()
+        except BaseException:
+            await stream.aclose()
+            raise
+        return stream, first
+
+    async def chunks(stream, first):
+        yield first
+        async for chunk in stream:
+            yield chunk
+
+    stream = None
+    with span("llm", streamed=True) as attributes:
+        try:
+            (stream, first), attributes["model"] = await hedged_llm_call(
+                start_stream,
+                discard=lambda lost: asyncio.ensure_future(lost[0].aclose()),
+                tokens=estimate_llm_call_tokens(results_text),
+            )
+            async for chunk in chunks(stream, first):
+                completion.append(chunk.content)
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                for item in parser.feed(chunk.content):
+                    if not is_company_item(item):
+                        continue
+                    key = normalize_text(str(item["company"]["name"]))
+                    if key in seen:
+                        continue
+                    company = build_similar_company(item, len(found), input_company)
+                    if company is None:
+                        continue
+                    seen.add(key)
+                    found.append(company)
+                    yield company
+                    if len(found) >= 5:  # Ensure max 5 companies
+                        break
+                if len(found) >= 5 or parser.closed:
+                    break
+        finally:
+            if stream is not None:
+                await stream.aclose()
+            attributes.update(
+                record_llm_tokens(
+                    results_text,
+                    "".join(completion),
+                    usage,
+                    model_name=attributes.get("model"),
+                )
+            )
+
+    parsed = len(found)
+    if parsed < 5:
+        log_debug(f"Streamed LLM answer had {parsed} usable companies", "WARNING")
+        for company in await repair_missing_companies(
+            results_text, input_company, found
+        ):
+            found.append(company)
+            yield company
+    record_llm_answer(parsed, len(found))
+
+
+async def stream_map_reduce(
+    search_results: List[dict], input_company: CompanySearchRequest
+) -> AsyncIterator[SimilarCompanyResult]:
+    found: List[SimilarCompanyResult] = []
+    seen = {entity_key(input_company.name)}
+    async with aclosing(map_candidates(search_results, input_company)) as mapped:
+        async for _, item in mapped:
+            key = entity_key(str(item["company"]["name"]))
+            if key in seen:
+                continue
+            company = build_similar_company(item, len(found), input_company)
+            if company is None:
+                continue
+            seen.add(key)
+            found.append(company)
+            yield company
+            if len(found) >= 5:
+                break
+
+    parsed = len(found)
+    if parsed < 5:
+        log_debug(f"Map-reduce accepted {parsed} candidates", "WARNING")
+        results_text = await prepare_results_text(search_results, input_company)
+        for company in await repair_missing_companies(
+            results_text, input_company, found
+        ):
+            found.append(company)
+            yield company
+    record_llm_answer(parsed, len(found))
+
+
+async def stream_company_search(
+    request: CompanySearchRequest, headers
+) -> AsyncIterator[dict]:
+    """Run the search pipeline as a sequence of progress/result events.
+
+    The final ``done`` event carries the same metadata as a buffered response;
+    a rate-limited search ends with an ``error`` event carrying ``retryAfter``.
+    """
+    source = "error"
+    with deadline_scope(), priority_scope(
+        priority_from_headers(headers)
+    ), llm_mode_scope(llm_mode_from_headers(headers)):
+        try:
+            async for event in _stream_company_search(request, headers):
+                if event["type"] == "done":
+                    source = event["metadata"]["source"]
+                yield event
+        except RateLimitExceeded as e:
+            yield {"type": "error", "error": str(e), "retryAfter": e.retry_after}
+        finally:
+            request_log.append(request, source)
+
+
+async def _stream_company_search(
+    request: CompanySearchRequest, headers
+) -> AsyncIterator[dict]:
+    cached = get_cached_search(request, headers)
+    if cached is not None:
+        for index, item in enumerate(cached.similarCompanies):
+            yield {"type": "result", "index": index, "data": item.model_dump()}
+        yield {
+            "type": "done",
+            "count": len(cached.similarCompanies),
+            "cached": True,
+            "metadata": current_deadline().metadata("cache").model_dump(),
+        }
+        return
+
+    local_matches = await find_local_matches(request)
+    local = serve_locally(request, local_matches)
+    if local is not None:
+        for index, item in enumerate(local.similarCompanies):
+            yield {"type": "result", "index": index, "data": item.model_dump()}
+        yield {
+            "type": "done",
+            "count": len(local.similarCompanies),
+            "local": True,
+            "metadata": current_deadline().metadata("local").model_dump(),
+        }
+        return
+
+    check_admission()
+
+    if not GROQ_API_KEY:
+        log_debug("GROQ API key not configured", "ERROR")
+        yield {"type": "error", "error": "Failed to process search results with LLM"}
+        return
+
+    # Forward search phase updates while the Tavily searches run
+    events: asyncio.Queue = asyncio.Queue()
+    search_task = asyncio.create_task(
+        coalesced_search(
+            request,
+            progress=lambda phase, **details: events.put_nowait(
+                {"type": "progress", "phase": phase, **details}
+            ),
+        )
+    )
+    search_task.add_done_callback(lambda _: events.put_nowait(None))
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+    finally:
+        if not search_task.done():
+            search_task.cancel()
+
+    search_results = search_task.result()
+    if not search_results:
+        yield {"type": "error", "error": "Failed to retrieve search results"}
+        return
+
+    yield {"type": "progress", "phase": "llm"}
+    search_results = search_results + local_prefill_results(local_matches)
+    similar_companies = []
+    try:
+        async for item in stream_llm_results(search_results, request):
+            yield {
+                "type": "result",
+                "index": len(similar_companies),
+                "data": item.model_dump(),
+            }
+            similar_companies.append(item)
+    except Exception as e:
+        log_debug(f"LLM streaming error: {e}", "ERROR")
+        log_debug(f"Traceback: {traceback.format_exc()}", "ERROR")
+        current_deadline().degrade("llm_stream_failed")
+
+    if not similar_companies:
+        yield {"type": "error", "error": "Failed to process search results with LLM"}
+        return
+
+    store_cached_search(request, similar_companies)
+    await remember_companies(request, similar_companies, search_results)
+    yield {
+        "type": "done",
+        "count": len(similar_companies),
+        "cached": False,
+        "metadata": current_deadline().metadata("live").model_dump(),
+    }
+
+
+# Response encoding: JSON serialization, field projection, compression and
+# ETags, shared by the FastAPI endpoints and the Vercel handler
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_LEVEL = int(os.environ.get("COMPRESSION_LEVEL", "5"))
+# Fields a client can leave out with ?exclude=justification,description
+RESPONSE_FIELDS = {"inputCompany", "metadata"}
+RESULT_FIELDS = {"justification"}
+COMPANY_FIELDS = set(CompanyMaster.model_fields) - {"name"}
+PROJECTABLE_FIELDS = RESPONSE_FIELDS | RESULT_FIELDS | COMPANY_FIELDS
+
+
+def parse_excluded_fields(value: Optional[str]) -> frozenset:
+    """Validate the ``exclude`` query parameter; raises ValueError"""
+    fields = frozenset(field.strip() for field in (value or "").split(",")) - {""}
+    unknown = fields - PROJECTABLE_FIELDS
+    if unknown:
+        raise ValueError(
+            f"Unknown fields to exclude: {', '.join(sorted(unknown))}. "
+            f"Allowed: {', '.join(sorted(PROJECTABLE_FIELDS))}"
+        )
+    return fields
+
+
+def project_result(item: dict, excluded: frozenset) -> dict:
+    """A SimilarCompanyResult dict without the excluded fields"""
+    if not excluded:
+        return item
+    item = {key: value for key, value in item.items() if key not in excluded}
+    if "company" in item:
+        item["company"] = {
+            key: value for key, value in item["company"].items() if key not in excluded
+        }
+    return item
+
+
+def project_response(data: dict, excluded: frozenset) -> dict:
+    """A CompanySearchResponse dict without the excluded fields"""
+    if not excluded:
+        return data
+    data = {key: value for key, value in data.items() if key not in excluded}
+    data["similarCompanies"] = [
+        project_result(item, excluded) for item in data["similarCompanies"]
+    ]
+    return data
+
+
+def project_event(event: dict, excluded: frozenset) -> dict:
+    """Apply field projection to the result payload of a stream or batch event"""
+    if not excluded or event["type"] != "result":
+        return event
+    data = event["data"]
+    if "similarCompanies" in data:
+        return {**event, "data": project_response(data, excluded)}
+    return {**event, "data": project_result(data, excluded)}
+
+
+def search_etag(data: dict) -> str:
+    """Weak ETag for a search response.
+
+    Metadata changes on every request (elapsedMs), so only the input and the
+    similar companies count; two responses with the same companies are
+    equivalent to the client even if one came from the cache.
+    """
+    core = dumps_json([data.get("inputCompany"), data["similarCompanies"]])
+    return f'W/"{hashlib.blake2b(core, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers ``etag`` (weak comparison)"""
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Preferred content encoding the client accepts: br, then gzip"""
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                continue
+        accepted[coding.strip()] = quality
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def compress_body(
+    payload: bytes, accept_encoding: Optional[str]
+) -> Tuple[bytes, Optional[str]]:
+    """Compress a response body for the client; small bodies are left alone"""
+    if len(payload) < COMPRESSION_MIN_BYTES:
+        return payload, None
+    coding = negotiate_encoding(accept_encoding)
+    if coding == "br":
+        return brotli.compress(payload, quality=COMPRESSION_LEVEL), coding
+    if coding == "gzip":
+        return gzip.compress(payload, compresslevel=COMPRESSION_LEVEL), coding
+    return payload, None
+
+
+def encoded_response(
+    payload: bytes,
+    request_headers,
+    media_type: str = "application/json",
+    headers: Optional[dict] = None,
+    status_code: int = 200,
+) -> Response:
+    """A FastAPI response with the body compressed as the client allows"""
+    body, coding = compress_body(payload, request_headers.get("Accept-Encoding"))
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    if coding:
+        headers["Content-Encoding"] = coding
+    return Response(
+        content=body, status_code=status_code, media_type=media_type, headers=headers
+    )
+
+
+def wants_sse(accept: Optional[str], stream_format: Optional[str]) -> bool:
+    """SSE when asked for explicitly, otherwise NDJSON"""
+    if stream_format:
+        return stream_format.lower() == "sse"
+    return "text/event-stream" in (accept or "")
+
+
+def encode_stream_event(
+    event: dict, sse: bool, excluded: frozenset = frozenset()
+) -> bytes:
+    data = dumps_json(project_event(event, excluded))
+    if sse:
+        return b"event: " + event["type"].encode("utf-8") + b"\ndata: " + data + b"\n\n"
+    return data + b"\n"
+
+
+@app.post("/search-companies/stream")
+async def search_companies_stream_endpoint(
+    request: CompanySearchRequest,
+    http_request: Request,
+    format: Optional[str] = None,
+    exclude: Optional[str] = None,
+):
+    """Stream similar companies as NDJSON lines (or SSE events) as they are found"""
+    log_debug(f"Received streaming company search request: {request.name}")
+    sse = wants_sse(http_request.headers.get("Accept"), format)
+    try:
+        excluded = parse_excluded_fields(exclude)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def body():
+        with request_span("stream", company=request.name):
+            async for event in stream_company_search(request, http_request.headers):
+                yield encode_stream_event(event, sse, excluded)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class SearchPipelineError(Exception):
+    """A pipeline stage produced no usable output"""
+
+
+# X-Cache header value for each response source
+CACHE_STATUS = {"cache": "HIT", "local": "LOCAL", "live": "MISS"}
+
+
+async def run_company_search(
+    request: CompanySearchRequest,
+    headers,
+    default_priority: str = "normal",
+    log_request: bool = True,
+) -> Tuple[CompanySearchResponse, str]:
+    """Run the full search pipeline within the REQUEST_DEADLINE budget.
+
+    Returns the response and where it came from: "cache", "local" (answered
+    from the local company index) or "live". The response metadata records
+    the source, the model that answered and any degradations applied.
+    Provider calls queue at the X-Priority header's priority; RateLimitExceeded
+    is raised when they can't be admitted in time. The search and its source
+    are appended to the request log unless ``log_request`` is false.
+    """
+    priority = priority_from_headers(headers, default_priority)
+    source = "error"
+    try:
+        with deadline_scope() as deadline, priority_scope(priority), llm_mode_scope(
+            llm_mode_from_headers(headers)
+        ):
+            response, source = await _run_company_search(request, headers)
+            response.metadata = deadline.metadata(source)
+        return response, source
+    finally:
+        if log_request:
+            request_log.append(request, source)
+
+
+async def _run_company_search(
+    request: CompanySearchRequest, headers
+) -> Tuple[CompanySearchResponse, str]:
+    cached = get_cached_search(request, headers)
+    if cached is not None:
+        return cached, "cache"
+
+    local_matches = await find_local_matches(request)
+    local = serve_locally(request, local_matches)
+    if local is not None:
+        return local, "local"
+
+    check_admission()
+
+    # Step 1: Search with Tavily
+    search_results = await coalesced_search(request)
+
+    if not search_results:
+        raise SearchPipelineError("Failed to retrieve search results")
+
+    # Step 2: Process with LLM, with known similar companies as extra context
+    search_results = search_results + local_prefill_results(local_matches)
+    similar_companies = await coalesced_process_with_llm(search_results, request)
+
+    if not similar_companies:
+        raise SearchPipelineError("Failed to process search results with LLM")
+
+    # Step 3: Return structured response
+    response = CompanySearchResponse(
+        inputCompany=request, similarCompanies=similar_companies
+    )
+    store_cached_search(request, similar_companies)
+    await remember_companies(request, similar_companies, search_results)
+
+    log_debug(
+        f"Successfully processed search for {request.name}, found {len(similar_companies)} similar companies"
+    )
+    return response, "live"
+
+
+def encode_search_response(
+    response: CompanySearchResponse, excluded: frozenset = frozenset()
+) -> Tuple[bytes, str]:
+    """JSON body and ETag for a search response with ``excluded`` fields left out"""
+    data = project_response(response.model_dump(), excluded)
+    return dumps_json(data), search_etag(data)
+
+
+# Conditional requests are only honoured on GET: a 304 answer to a POST is
+# non-standard (RFC 9110 asks for 412) and caches won't reuse it. GET
+# responses must be revalidated before a cache reuses them.
+CONDITIONAL_SEARCH_HEADERS = {"Cache-Control": "private, no-cache"}
+
+
+@app.post("/search-companies", response_model=CompanySearchResponse)
+async def search_companies_endpoint(
+    request: CompanySearchRequest,
+    http_request: Request,
+    exclude: Optional[str] = None,
+):
+    """Search for similar companies based on input company details.
+
+    ``exclude`` drops fields from every result (for example
+    ``justification,description``). Responses carry an ETag; use the GET form
+    to revalidate it with If-None-Match.
+    """
+    return await search_companies_response(
+        request, http_request, exclude, conditional=False
+    )
+
+
+@app.get("/search-companies", response_model=CompanySearchResponse)
+async def get_search_companies_endpoint(
+    name: str,
+    personalNote: str,
+    tags: str,
+    http_request: Request,
+    exclude: Optional[str] = None,
+):
+    """The search as a cacheable GET; a request whose If-None-Match matches
+    the results' ETag gets a 304 without a body"""
+    request = CompanySearchRequest(name=name, personalNote=personalNote, tags=tags)
+    return await search_companies_response(
+        request, http_request, exclude, conditional=True
+    )
+
+
+async def search_companies_response(
+    request: CompanySearchRequest,
+    http_request: Request,
+    exclude: Optional[str],
+    conditional: bool,
+):
+    log_debug(f"Received company search request: {request.name}")
+    try:
+        excluded = parse_excluded_fields(exclude)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        with request_span("search", company=request.name) as attributes:
+            response, source = await run_company_search(request, http_request.headers)
+            attributes["source"] = source
+            payload, etag = encode_search_response(response, excluded)
+            headers = {"X-Cache": CACHE_STATUS[source], "ETag": etag}
+            if conditional:
+                headers.update(CONDITIONAL_SEARCH_HEADERS)
+                if etag_matches(http_request.headers.get("If-None-Match"), etag):
+                    attributes["not_modified"] = True
+                    return Response(status_code=304, headers=headers)
+        return encoded_response(payload, http_request.headers, headers=headers)
+
+    except SearchPipelineError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except Exception as e:
+        log_debug(f"Company search error: {e}", "ERROR")
+        log_debug(f"Traceback: {traceback.format_exc()}", "ERROR")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": str(e),
+                "groq_key_present": bool(GROQ_API_KEY),
+                "tavily_key_present": bool(TAVILY_API_KEY),
+            },
+        )
+
+
+async def stream_company_search_batch(
+    batch: CompanySearchBatchRequest, headers
+) -> AsyncIterator[dict]:
+    """Run batch items with bounded concurrency, yielding each as it finishes.
+
+    Items with the same normalized search run once, and identical Tavily
+    queries across the batch share a single call.
+    """
+    concurrency = max(1, min(batch.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+    memo = TavilyQueryMemo()
+    token = tavily_query_memo.set(memo)
+    shared: Dict[str, asyncio.Task] = {}
+
+    async def run_one(request: CompanySearchRequest) -> CompanySearchResponse:
+        async with semaphore:
+            response, _ = await run_company_search(
+                request, headers, default_priority="low"
+            )
+            return response
+
+    async def run_item(index: int, request: CompanySearchRequest) -> dict:
+        key = search_cache_key(request)
+        if key not in shared:
+            shared[key] = asyncio.ensure_future(run_one(request))
+        try:
+            response = await asyncio.shield(shared[key])
+        except RateLimitExceeded as e:
+            return {
+                "type": "error",
+                "index": index,
+                "error": str(e),
+                "retryAfter": e.retry_after,
+            }
+        except Exception as e:
+            log_debug(f"Batch item {index} failed: {e}", "ERROR")
+            return {"type": "error", "index": index, "error": str(e)}
+        # Echo each item's own input even when the computation was shared
+        response = CompanySearchResponse(
+            inputCompany=request,
+            similarCompanies=response.similarCompanies,
+            metadata=response.metadata,
+        )
+        return {"type": "result", "index": index, "data": response.model_dump()}
+
+    try:
+        pending = [
+            asyncio.ensure_future(run_item(index, request))
+            for index, request in enumerate(batch.items)
+        ]
+    finally:
+        tavily_query_memo.reset(token)
+
+    failed = 0
+    try:
+        for next_done in asyncio.as_completed(pending):
+            event = await next_done
+            failed += event["type"] == "error"
+            yield event
+    finally:
+        for task in pending + list(shared.values()):
+            task.cancel()
+
+    log_debug(
+        f"Batch of {len(batch.items)} finished: {failed} failed, "
+        f"{memo.saved} of {memo.requested} Tavily queries shared"
+    )
+    yield {
+        "type": "done",
+        "count": len(batch.items),
+        "failed": failed,
+        "uniqueSearches": len(shared),
+        "tavilyQueries": memo.requested,
+        "tavilyQueriesSaved": memo.saved,
+    }
+
+
+@app.post("/search-companies/batch")
+async def search_companies_batch_endpoint(
+    batch: CompanySearchBatchRequest,
+    http_request: Request,
+    exclude: Optional[str] = None,
+):
+    """Search many companies at once, streaming NDJSON per-item results as they finish"""
+    log_debug(f"Received batch company search request: {len(batch.items)} items")
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413, detail=f"Batch is limited to {BATCH_MAX_ITEMS} items"
+        )
+    try:
+        excluded = parse_excluded_fields(exclude)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def body():
+        with request_span("batch", items=len(batch.items)):
+            async for event in stream_company_search_batch(batch, http_request.headers):
+                yield encode_stream_event(event, sse=False, excluded=excluded)
+
+    return StreamingResponse(
+        body(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Asynchronous search jobs (see api/_jobs.py)
+# Request headers that still apply when the job runs
+JOB_HEADERS = (CACHE_BYPASS_HEADER, "Cache-Control", PRIORITY_HEADER, LLM_MODE_HEADER)
+
+
+async def run_search_job(
+    request: CompanySearchRequest, headers
+) -> CompanySearchResponse:
+    """Run one queued search job for the job runner"""
+    with request_span("job", company=request.name) as attributes:
+        response, attributes["source"] = await run_company_search(request, headers)
+    return response
+
+
+job_runner = JobRunner(
+    JobStore(JOB_STORE_PATH, JOB_TTL),
+    JOB_WORKERS,
+    JOB_QUEUE_DEPTH,
+    run_search_job,
+    JOB_HEADERS,
+)
+
+
+def encode_job(job: SearchJob, excluded: frozenset = frozenset()) -> bytes:
+    data = job.model_dump()
+    if data["result"] is not None:
+        data["result"] = project_response(data["result"], excluded)
+    return dumps_json(data)
+
+
+@app.post("/search-companies/jobs", status_code=202)
+async def submit_search_job_endpoint(
+    request: CompanySearchRequest, http_request: Request
+):
+    """Queue a search and return its job id without waiting for the result"""
+    log_debug(f"Received search job: {request.name}")
+    try:
+        job = await asyncio.to_thread(job_runner.submit, request, http_request.headers)
+    except JobQueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    return Response(
+        content=encode_job(job),
+        status_code=202,
+        media_type="application/json",
+        headers={"Location": f"/search-companies/jobs/{job.jobId}"},
+    )
+
+
+@app.get("/search-companies/jobs/{job_id}")
+async def get_search_job_endpoint(
+    job_id: str,
+    http_request: Request,
+    wait: float = 0.0,
+    exclude: Optional[str] = None,
+):
+    """A search job's status and, once done, its result.
+
+    ``wait`` long-polls: the request returns as soon as the job finishes, or
+    after that many seconds (at most JOB_MAX_WAIT) with the current status.
+    """
+    try:
+        excluded = parse_excluded_fields(exclude)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job = await job_runner.wait(job_id, min(max(wait, 0.0), JOB_MAX_WAIT))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return encoded_response(encode_job(job, excluded), http_request.headers)
+
+
+# Request log and cache warming (see api/_warmer.py)
+# Refreshes skip the search cache and queue behind user traffic
+WARM_HEADERS = {CACHE_BYPASS_HEADER: "1", PRIORITY_HEADER: "low"}
+
+
+async def warm_search(request: CompanySearchRequest) -> str:
+    """Refresh one search for the cache warmer; returns its source"""
+    _, source = await run_company_search(request, WARM_HEADERS, log_request=False)
+    return source
+
+
+request_log = RequestLog(REQUEST_LOG_PATH, REQUEST_LOG_MAX_BYTES)
+cache_warmer = CacheWarmer(request_log, search_cache, warm_search)
+
+
+# Legacy endpoints for compatibility (if needed)
+@app.post("/chat")
+@app.post("/api/chat")
+async def legacy_chat():
+    """Legacy chat endpoint - returns redirect message"""
+    return JSONResponse(
+        content={"message": "This endpoint has been replaced with /search-companies"},
+        status_code=200,
+    )
+
+
+# Vercel-compatible handler
+from http.server import BaseHTTPRequestHandler
+
+# Handler paths and the endpoint label used for their metrics
+HANDLER_ENDPOINTS = {
+    "/api/search-companies": "search",
+    "/api/search-companies/stream": "stream",
+    "/api/search-companies/batch": "batch",
+    "/api/search-companies/jobs": "job_submit",
+}
+
+
+class handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests; every non-streaming
+    # response therefore carries a Content-Length
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without TCP_NODELAY the
+    # second one waits on the client's delayed ACK on a reused connection
+    disable_nagle_algorithm = True
+    # Set once a streamed 200 has gone out; no other status can follow it
+    streaming = False
+
+    def do_POST(self):
+        endpoint = HANDLER_ENDPOINTS.get(self.path.partition("?")[0], "not_found")
+        with request_span(endpoint, server="handler"):
+            self._handle_post()
+
+    def do_GET(self):
+        # Served both under /api (Vercel routing) and at the root
+        path, _, query = self.path.partition("?")
+        path = path[len("/api") :] if path.startswith("/api/") else path
+        if path.startswith("/search-companies/jobs/"):
+            self._get_search_job(path.rpartition("/")[2], parse_qs(query))
+        elif path == "/search-companies":
+            with request_span("search", server="handler"):
+                self._get_search_companies(parse_qs(query))
+        elif path == "/health":
+            self._send(200, json.dumps({"status": "ok"}), "application/json")
+        elif path == "/warmup":
+            self._send(200, json.dumps(run_sync(warm_up())), "application/json")
+        elif path == "/metrics":
+            self._send(200, render_metrics(), "text/plain; version=0.0.4")
+        else:
+            self._send(404, "Not Found", "text/plain")
+
+    def _send(
+        self, status: int, body: Union[str, bytes], content_type: str, headers=None
+    ) -> None:
+        """Write a complete response that can share a keep-alive connection.
+
+        The body is compressed when the client accepts it; a 304 has none.
+        """
+        payload = body.encode("utf-8") if isinstance(body, str) else body
+        payload, coding = compress_body(payload, self.headers.get("Accept-Encoding"))
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Expose-Headers", "ETag, X-Cache, Retry-After")
+        if status == 304:
+            self.end_headers()
+            return
+        self.send_header("Content-Type", content_type)
+        self.send_header("Vary", "Accept-Encoding")
+        if coding:
+            self.send_header("Content-Encoding", coding)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle_post(self):
+        try:
+            log_debug(f"=== REQUEST START === Path: {self.path}")
+            content_length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(content_length)
+            data = json.loads(body.decode("utf-8"))
+            log_debug(f"Request body parsed successfully", "DEBUG")
+
+            path, _, query = self.path.partition("?")
+            params = parse_qs(query)
+            try:
+                excluded = parse_excluded_fields(params.get("exclude", [None])[0])
+            except ValueError as e:
+                self._send(400, dumps_json({"error": str(e)}), "application/json")
+                return
+
+            if path == "/api/search-companies/stream":
+                log_debug("Routing to streaming search companies handler", "DEBUG")
+                self._stream_search_companies(
+                    CompanySearchRequest(**data), params, excluded
+                )
+            elif path == "/api/search-companies/batch":
+                log_debug("Routing to batch search companies handler", "DEBUG")
+                self._stream_search_companies_batch(
+                    CompanySearchBatchRequest(**data), excluded
+                )
+            elif path == "/api/search-companies/jobs":
+                log_debug("Routing to search job submission", "DEBUG")
+                self._submit_search_job(CompanySearchRequest(**data))
+            elif path == "/api/search-companies":
+                log_debug("Routing to search companies handler", "DEBUG")
+                self._search_companies(CompanySearchRequest(**data), excluded)
+            else:
+                log_debug(f"Unknown path: {self.path}")
+                self._send(404, "Not Found", "text/plain")
+            log_debug("=== REQUEST COMPLETE ===")
+
+        except Exception as e:
+            error_details = traceback.format_exc()
+            log_debug(f"HANDLER ERROR: {str(e)}", "ERROR")
+            log_debug(f"HANDLER TRACEBACK:\n{error_details}", "ERROR")
+            if self.streaming:
+                return
+
+            self._send(
+                500,
+                json.dumps(
+                    {
+                        "error": str(e),
+                        "traceback": error_details,
+                        "path": getattr(self, "path", "unknown"),
+                    }
+                ),
+                "application/json",
+            )
+
+    def _get_search_companies(self, params: dict) -> None:
+        """GET /search-companies?name=&personalNote=&tags=, answering 304 when
+        If-None-Match matches"""
+        fields = ("name", "personalNote", "tags")
+        missing = [field for field in fields if not params.get(field)]
+        try:
+            if missing:
+                raise ValueError(f"Missing query parameters: {', '.join(missing)}")
+            excluded = parse_excluded_fields(params.get("exclude", [None])[0])
+        except ValueError as e:
+            self._send(400, dumps_json({"error": str(e)}), "application/json")
+            return
+        request = CompanySearchRequest(**{field: params[field][0] for field in fields})
+        self._search_companies(request, excluded, conditional=True)
+
+    def _search_companies(
+        self,
+        request: CompanySearchRequest,
+        excluded: frozenset = frozenset(),
+        conditional: bool = False,
+    ) -> None:
+        """Run the shared search pipeline on the background loop"""
+        try:
+            response, source = run_sync(run_company_search(request, self.headers))
+        except SearchPipelineError as e:
+            self._send(500, json.dumps({"error": str(e)}), "application/json")
+            return
+        except RateLimitExceeded as e:
+            self._send(
+                429,
+                json.dumps({"error": str(e), "retryAfter": e.retry_after}),
+                "application/json",
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            return
+
+        payload, etag = encode_search_response(response, excluded)
+        headers = {"X-Cache": CACHE_STATUS[source], "ETag": etag}
+        if conditional:
+            headers.update(CONDITIONAL_SEARCH_HEADERS)
+            if etag_matches(self.headers.get("If-None-Match"), etag):
+                log_debug(f"Sending response with status 304 ({source})")
+                self._send(304, b"", "application/json", headers=headers)
+                return
+        log_debug(f"Sending response with status 200 ({source})")
+        self._send(200, payload, "application/json", headers=headers)
+
+    def _submit_search_job(self, request: CompanySearchRequest) -> None:
+        try:
+            job = job_runner.submit(request, self.headers)
+        except JobQueueFull as e:
+            self._send(
+                503,
+                dumps_json({"error": str(e), "retryAfter": e.retry_after}),
+                "application/json",
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            return
+        self._send(
+            202,
+            encode_job(job),
+            "application/json",
+            headers={"Location": f"/api/search-companies/jobs/{job.jobId}"},
+        )
+
+    def _get_search_job(self, job_id: str, params: dict) -> None:
+        """Job status and result, long-polling up to ?wait= seconds"""
+        try:
+            excluded = parse_excluded_fields(params.get("exclude", [None])[0])
+            wait = min(max(float(params.get("wait", ["0"])[0]), 0.0), JOB_MAX_WAIT)
+        except ValueError as e:
+            self._send(400, dumps_json({"error": str(e)}), "application/json")
+            return
+        job = run_sync(job_runner.wait(job_id, wait))
+        if job is None:
+            self._send(
+                404, dumps_json({"error": "Unknown or expired job"}), "application/json"
+            )
+            return
+        self._send(200, encode_job(job, excluded), "application/json")
+
+    def _stream_search_companies(
+        self,
+        request: CompanySearchRequest,
+        params: dict,
+        excluded: frozenset = frozenset(),
+    ) -> None:
+        """Write search events as they are produced; the body ends on close"""
+        stream_format = params.get("format", [None])[0]
+        sse = wants_sse(self.headers.get("Accept"), stream_format)
+        self._start_stream("text/event-stream" if sse else "application/x-ndjson")
+        self._write_stream(
+            iterate_sync(stream_company_search(request, self.headers)), sse, excluded
+        )
+
+    def _stream_search_companies_batch(
+        self, batch: CompanySearchBatchRequest, excluded: frozenset = frozenset()
+    ) -> None:
+        """Write one NDJSON line per batch item as it finishes"""
+        if len(batch.items) > BATCH_MAX_ITEMS:
+            self._send(
+                413,
+                json.dumps({"error": f"Batch is limited to {BATCH_MAX_ITEMS} items"}),
+                "application/json",
+            )
+            return
+
+        self._start_stream("application/x-ndjson")
+        self._write_stream(
+            iterate_sync(stream_company_search_batch(batch, self.headers)),
+            False,
+            excluded,
+        )
+
+    def _start_stream(self, content_type: str) -> None:
+        """Send the status and headers of a streamed body, which ends on close"""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        self.streaming = True
+
+    def _write_stream(self, events, sse: bool, excluded: frozenset) -> None:
+        """Write events after _start_stream. A failure ends the stream with an
+        ``error`` event; a client that went away ends it quietly."""
+        try:
+            for event in events:
+                self.wfile.write(encode_stream_event(event, sse, excluded))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            log_debug("Client closed the stream early", "DEBUG")
+        except Exception as e:
+            log_debug(f"Stream failed: {e}", "ERROR")
+            log_debug(f"Traceback: {traceback.format_exc()}", "ERROR")
+            try:
+                error = {"type": "error", "error": str(e)}
+                self.wfile.write(encode_stream_event(error, sse))
+                self.wfile.flush()
+            except OSError:
+                pass
+        finally:
+            events.close()
+
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.send_header(
+            "Access-Control-Allow-Headers",
+            f"Content-Type, {CACHE_BYPASS_HEADER}, {PRIORITY_HEADER}, "
+            f"{LLM_MODE_HEADER}, If-None-Match",
+        )
+        self.send_header("Content-Length", "0")
         self.end_headers()
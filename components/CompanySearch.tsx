@@ -34,6 +34,18 @@ interface CompanySearchResponse {
   similarCompanies: SimilarCompanyResult[];
 }
 
+type SearchStreamEvent =
+  | { type: "progress"; phase: string; candidates?: string[] }
+  | { type: "result"; index: number; data: SimilarCompanyResult }
+  | { type: "error"; error: string }
+  | { type: "done"; count: number; cached: boolean };
+
+const PHASE_LABELS: Record<string, string> = {
+  initial_search: "Searching the web...",
+  detailed_search: "Looking up candidate companies...",
+  llm: "Analyzing results...",
+};
+
 export default function CompanySearch() {
   const [formData, setFormData] = useState({
     name: "",
@@ -43,10 +55,11 @@ export default function CompanySearch() {
   const [results, setResults] = useState<CompanySearchResponse | null>(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [phase, setPhase] = useState<string | null>(null);
 
   const apiEndpoint = process.env.NODE_ENV === 'development' 
-    ? "http://localhost:8080/search-companies"
-    : "/api/search-companies";
+    ? "http://localhost:8080/search-companies/stream"
+    : "/api/search-companies/stream";
 
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
@@ -59,6 +72,7 @@ export default function CompanySearch() {
     setLoading(true);
     setError(null);
     setResults(null);
+    setPhase(null);
 
     try {
       const response = await fetch(apiEndpoint, {
@@ -88,13 +102,50 @@ export default function CompanySearch() {
         throw new Error(errorMessage);
       }
 
-      const data: CompanySearchResponse = await response.json();
-      setResults(data);
+      if (!response.body) {
+        throw new Error("Streaming is not supported by this browser");
+      }
+
+      // Results arrive as NDJSON lines; render each company as soon as it lands
+      const inputCompany = { ...formData };
+      setResults({ inputCompany, similarCompanies: [] });
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      const handleEvent = (event: SearchStreamEvent) => {
+        if (event.type === "progress") {
+          setPhase(PHASE_LABELS[event.phase] ?? null);
+        } else if (event.type === "result") {
+          setResults(prev => prev && {
+            ...prev,
+            similarCompanies: [...prev.similarCompanies, event.data],
+          });
+        } else if (event.type === "error") {
+          throw new Error(event.error);
+        }
+      };
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop() ?? "";
+        for (const line of lines) {
+          if (line.trim()) handleEvent(JSON.parse(line));
+        }
+      }
+      if (buffer.trim()) handleEvent(JSON.parse(buffer));
     } catch (err) {
       console.error("Search error:", err);
+      // Keep any companies that already streamed in
+      setResults(prev => (prev?.similarCompanies.length ? prev : null));
       setError(err instanceof Error ? err.message : "An error occurred while searching");
     } finally {
       setLoading(false);
+      setPhase(null);
     }
   };
 
@@ -117,7 +168,7 @@ export default function CompanySearch() {
             "w-2 h-2 rounded-full",
             loading ? "bg-yellow-500" : "bg-green-500"
           )} />
-          {loading ? "Searching..." : "Ready"}
+          {loading ? phase ?? "Searching..." : "Ready"}
         </div>
       </div>
 
@@ -0,0 +1,719 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the company search pipeline
+Replays search requests against simulated Tavily and Groq backends, so no API keys are needed
+Reports latency percentiles, throughput, per-stage time and peak memory for the FastAPI app
+and the Vercel-compatible handler at several concurrency levels
+"""
+
+import argparse
+import asyncio
+import hashlib
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+# Add the current directory to path so we can import from api/
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+COMPANY_POOL = [
+    "Rivian Automotive",
+    "Lucid Group",
+    "Polestar",
+    "NIO Inc",
+    "BYD Company",
+    "Fisker Inc",
+    "Canoo Inc",
+    "Xpeng Motors",
+    "Li Auto",
+    "Zoox",
+    "ChargePoint Holdings",
+    "QuantumScape Corporation",
+    "Northvolt AB",
+    "Proterra Inc",
+    "Arrival Ltd",
+    "Lordstown Motors",
+    "Sono Motors GmbH",
+    "Lightyear",
+    "VinFast",
+    "Gogoro Inc",
+]
+
+SAMPLE_REQUESTS = [
+    {
+        "name": "Tesla",
+        "personalNote": "electric vehicles and energy storage",
+        "tags": "electric vehicles, batteries, sustainability",
+    },
+    {
+        "name": "Stripe",
+        "personalNote": "online payments infrastructure for developers",
+        "tags": "payments, fintech, api",
+    },
+    {
+        "name": "Snowflake",
+        "personalNote": "cloud data warehousing",
+        "tags": "cloud computing, data, analytics",
+    },
+    {
+        "name": "Peloton",
+        "personalNote": "connected fitness at home",
+        "tags": "fitness, subscription, hardware",
+    },
+    {
+        "name": "Beyond Meat",
+        "personalNote": "plant-based meat alternatives",
+        "tags": "food, sustainability, consumer goods",
+    },
+]
+
+
+class StageTimer:
+    """Time spent in each simulated provider, accumulated across requests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.totals: Dict[str, float] = {}
+            self.counts: Dict[str, int] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                stage: {"calls": self.counts[stage], "seconds": total}
+                for stage, total in self.totals.items()
+            }
+
+
+STAGES = StageTimer()
+
+
+class SimulatedLatency:
+    """Latency model: mean seconds with +/- jitter (a fraction of the mean) and a failure rate"""
+
+    def __init__(self, mean: float, jitter: float, failure_rate: float, rng):
+        self.mean = mean
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.rng = rng
+
+    def sample(self) -> float:
+        spread = self.mean * self.jitter
+        return max(0.0, self.rng.uniform(self.mean - spread, self.mean + spread))
+
+    def fails(self) -> bool:
+        return self.rng.random() < self.failure_rate
+
+
+def _pick_companies(seed_text: str, count: int) -> List[str]:
+    seed = int(hashlib.sha256(seed_text.encode("utf-8")).hexdigest()[:8], 16)
+    return random.Random(seed).sample(COMPANY_POOL, count)
+
+
+class SimulatedTavily:
+    """Stand-in for AsyncTavilyClient returning canned, query-dependent results"""
+
+    def __init__(self, latencies: Dict[str, SimulatedLatency]):
+        self.latencies = latencies
+
+    async def search(self, query: str, search_depth: str = "basic", **kwargs) -> dict:
+        latency = self.latencies[search_depth]
+        started = time.perf_counter()
+        await asyncio.sleep(latency.sample())
+        STAGES.add(f"tavily_{search_depth}", time.perf_counter() - started)
+        if latency.fails():
+            raise RuntimeError(f"Simulated Tavily {search_depth} failure")
+
+        if search_depth == "advanced":
+            results = []
+            for i, (first, second) in enumerate(
+                zip(_pick_companies(query, 8), _pick_companies(query + "#", 8))
+            ):
+                results.append(
+                    {
+                        "title": f"{first} and {second} among the leaders",
+                        "content": (
+                            f"{first} competes with {second} in this market. "
+                            f"Analysts compare {first} to its peers on growth, "
+                            f"margins and product focus."
+                        ),
+                        "url": f"https://news.example.com/{i}/{first.lower().replace(' ', '-')}",
+                        "published_date": "2024-01-01",
+                    }
+                )
+            return {"results": results}
+
+        company = query.split(" company website")[0]
+        slug = company.lower().replace(" ", "-")
+        return {
+            "results": [
+                {
+                    "title": f"{company} - Official site",
+                    "content": f"{company} designs and sells products worldwide. Founded in 2010.",
+                    "url": f"https://www.{slug}.example.com/",
+                },
+                {
+                    "title": f"{company} - Wikipedia",
+                    "content": f"{company} is a company headquartered in the United States.",
+                    "url": f"https://en.wikipedia.org/wiki/{slug}",
+                },
+                {
+                    "title": f"{company} | LinkedIn",
+                    "content": f"{company} has 1,000+ employees on LinkedIn.",
+                    "url": f"https://www.linkedin.com/company/{slug}/",
+                },
+            ]
+        }
+
+
+def make_simulated_chat_model(
+    first_token_latency: SimulatedLatency, tokens_per_second: float
+):
+    """Build a LangChain chat model that answers with canned company JSON"""
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage, AIMessageChunk
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+    def respond(messages) -> str:
+        text = messages[-1].content if messages else ""
+        first_line = text.split("\n", 1)[0]
+        if first_line.startswith("Search results for "):
+            # Map-reduce call: one company per request
+            names = [first_line[len("Search results for ") :].rstrip(":")]
+        else:
+            names = [
+                line.split("DETAILS FOR:", 1)[1].strip(" -")
+                for line in text.splitlines()
+                if "DETAILS FOR:" in line
+            ]
+            names += [n for n in _pick_companies(text[:200], 5) if n not in names]
+        items = []
+        for name in names[:5]:
+            slug = name.lower().replace(" ", "-")
+            items.append(
+                {
+                    "company": {
+                        "name": name,
+                        "websiteUrl": f"https://www.{slug}.example.com/",
+                        "wikipediaUrl": f"https://en.wikipedia.org/wiki/{slug}",
+                        "linkedinUrl": f"https://www.linkedin.com/company/{slug}/",
+                        "logoUrl": None,
+                        "description": f"{name} builds products for a similar market.",
+                        "industry": "Simulated Industry",
+                        "tagsMaster": ["simulated", "benchmark", "company", "peer"],
+                        "naicsCode": "336111",
+                        "stillInBusiness": True,
+                    },
+                    "justification": f"{name} matches the requested focus in the simulated data.",
+                    "relevance": 7,
+                }
+            )
+        return "```json\n" + json.dumps(items, indent=2) + "\n```"
+
+    class SimulatedChatModel(BaseChatModel):
+        @property
+        def _llm_type(self) -> str:
+            return "simulated"
+
+        def _timing(self, content: str):
+            return first_token_latency.sample(), len(content) / 4 / tokens_per_second
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            content = respond(messages)
+            first, rest = self._timing(content)
+            time.sleep(first + rest)
+            STAGES.add("llm", first + rest)
+            if first_token_latency.fails():
+                raise RuntimeError("Simulated Groq failure")
+            return ChatResult(
+                generations=[ChatGeneration(message=AIMessage(content=content))]
+            )
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            content = respond(messages)
+            first, rest = self._timing(content)
+            started = time.perf_counter()
+            await asyncio.sleep(first + rest)
+            STAGES.add("llm", time.perf_counter() - started)
+            if first_token_latency.fails():
+                raise RuntimeError("Simulated Groq failure")
+            return ChatResult(
+                generations=[ChatGeneration(message=AIMessage(content=content))]
+            )
+
+        async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+            content = respond(messages)
+            first, rest = self._timing(content)
+            started = time.perf_counter()
+            await asyncio.sleep(first)
+            if first_token_latency.fails():
+                raise RuntimeError("Simulated Groq failure")
+            chunk_size = 40
+            pieces = range(0, len(content), chunk_size)
+            for start in pieces:
+                await asyncio.sleep(rest / len(pieces))
+                yield ChatGenerationChunk(
+                    message=AIMessageChunk(content=content[start : start + chunk_size])
+                )
+            STAGES.add("llm", time.perf_counter() - started)
+
+    return SimulatedChatModel()
+
+
+def load_requests(path: Optional[str]) -> List[dict]:
+    """Search request bodies from a JSONL file (name/personalNote/tags per line)"""
+    if not path:
+        return list(SAMPLE_REQUESTS)
+    bodies = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            entry = entry.get("body", entry) if isinstance(entry, dict) else {}
+            if isinstance(entry, dict) and all(
+                isinstance(entry.get(field), str)
+                for field in ("name", "personalNote", "tags")
+            ):
+                bodies.append(
+                    {field: entry[field] for field in ("name", "personalNote", "tags")}
+                )
+    if not bodies:
+        print(f"⚠️  No search requests found in {path}, using the built-in samples")
+        return list(SAMPLE_REQUESTS)
+    return bodies
+
+
+def request_stream(bodies: List[dict], total: int, unique: bool) -> Iterator[dict]:
+    for i in range(total):
+        body = dict(bodies[i % len(bodies)])
+        if unique:
+            # Defeat request coalescing so every request pays for the pipeline
+            body["personalNote"] = f"{body['personalNote']} (run {i})"
+        yield body
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+async def replay_fastapi(app, bodies: List[dict], concurrency: int, headers) -> list:
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark", timeout=None
+    ) as client:
+
+        async def one(body: dict):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/search-companies", json=body, headers=headers
+                )
+                return time.perf_counter() - started, response.status_code == 200
+
+        return await asyncio.gather(*(one(body) for body in bodies))
+
+
+def replay_handler(
+    main_module, bodies: List[dict], concurrency: int, headers, server_mode: str
+) -> list:
+    class QuietHandler(main_module.handler):
+        def log_message(self, format, *args):
+            pass
+
+    from api._server import create_handler_server
+
+    server = create_handler_server(("127.0.0.1", 0), QuietHandler, mode=server_mode)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+
+    def one(body: dict):
+        started = time.perf_counter()
+        conn = http.client.HTTPConnection(host, port, timeout=600)
+        try:
+            conn.request(
+                "POST",
+                "/api/search-companies",
+                body=json.dumps(body),
+                headers={"Content-Type": "application/json", **headers},
+            )
+            response = conn.getresponse()
+            response.read()
+            ok = response.status == 200
+        except OSError:
+            ok = False
+        finally:
+            conn.close()
+        return time.perf_counter() - started, ok
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(one, bodies))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run_level(
+    main_module, target: str, bodies, concurrency: int, args, llm_mode: str
+) -> dict:
+    headers = {} if args.with_caches else {main_module.CACHE_BYPASS_HEADER: "1"}
+    headers[main_module.LLM_MODE_HEADER] = llm_mode
+    STAGES.reset()
+    if args.trace_memory:
+        tracemalloc.reset_peak()
+
+    started = time.perf_counter()
+    if target == "fastapi":
+        outcomes = asyncio.run(
+            replay_fastapi(main_module.app, bodies, concurrency, headers)
+        )
+    else:
+        outcomes = replay_handler(
+            main_module,
+            bodies,
+            concurrency,
+            headers,
+            server_mode=args.handler_server,
+        )
+    wall = time.perf_counter() - started
+
+    latencies = [latency for latency, ok in outcomes if ok]
+    stages = STAGES.snapshot()
+    return {
+        "target": target,
+        "llm_mode": llm_mode,
+        "concurrency": concurrency,
+        "requests": len(outcomes),
+        "errors": sum(1 for _, ok in outcomes if not ok),
+        "wall_seconds": wall,
+        "throughput_rps": len(outcomes) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "stage_ms_per_request": {
+            stage: info["seconds"] * 1000 / max(1, len(outcomes))
+            for stage, info in stages.items()
+        },
+        "stage_calls": {stage: info["calls"] for stage, info in stages.items()},
+        "peak_memory_mb": (
+            tracemalloc.get_traced_memory()[1] / 1e6 if args.trace_memory else None
+        ),
+    }
+
+
+def print_report(rows: List[dict]) -> None:
+    stages = sorted({stage for row in rows for stage in row["stage_ms_per_request"]})
+    header = (
+        f"{'target':<8} {'mode':<10} {'conc':>4} {'reqs':>5} {'err':>4} {'p50 ms':>8} "
+        f"{'p95 ms':>8} {'p99 ms':>8} {'req/s':>7} {'peak MB':>8}  "
+        + "  ".join(f"{stage} ms/req" for stage in stages)
+    )
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        memory = (
+            f"{row['peak_memory_mb']:8.1f}"
+            if row["peak_memory_mb"] is not None
+            else f"{'-':>8}"
+        )
+        stage_cols = "  ".join(
+            f"{row['stage_ms_per_request'].get(stage, 0.0):>{len(stage) + 7}.0f}"
+            for stage in stages
+        )
+        print(
+            f"{row['target']:<8} {row['llm_mode']:<10} {row['concurrency']:>4} "
+            f"{row['requests']:>5} "
+            f"{row['errors']:>4} {row['p50_ms']:>8.0f} {row['p95_ms']:>8.0f} "
+            f"{row['p99_ms']:>8.0f} {row['throughput_rps']:>7.2f} {memory}  {stage_cols}"
+        )
+
+
+# Runs in a fresh interpreter per sample. Times the import, the first health
+# check and the first search-cache hit through the handler, then warm-up, and
+# records whether the provider stacks were loaded along the way.
+STARTUP_PROBE = r"""
+import json, resource, sys, threading, time
+started = time.perf_counter()
+import api.main as main
+imported = time.perf_counter()
+
+import http.client
+from api._server import create_handler_server
+
+server = create_handler_server(("127.0.0.1", 0), main.handler, mode="single")
+threading.Thread(target=server.serve_forever, daemon=True).start()
+conn = http.client.HTTPConnection(*server.server_address)
+
+def timed(method, path, body=None):
+    before = time.perf_counter()
+    conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    response.read()
+    assert response.status == 200, response.status
+    return (time.perf_counter() - before) * 1000
+
+request = main.CompanySearchRequest(name="Probe", personalNote="startup", tags="probe")
+main.store_cached_search(request, [])
+result = {
+    "import_ms": (imported - started) * 1000,
+    "first_health_ms": timed("GET", "/api/health"),
+    "first_cache_hit_ms": timed("POST", "/api/search-companies", request.model_dump_json()),
+    "providers_loaded_before_warm_up": "langchain_groq" in sys.modules,
+    "warm_up_ms": timed("GET", "/api/warmup"),
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}
+print(json.dumps(result))
+"""
+
+
+def run_startup(samples: int) -> List[dict]:
+    """Measure cold starts, one fresh interpreter per sample"""
+    import subprocess
+
+    env = dict(
+        os.environ,
+        TAVILY_CACHE_DIR="",
+        LOCAL_STORE_MODE="off",
+        ENTITY_CACHE_PATH="",
+        SHARED_CACHE_PATH="",
+        LOG_LEVEL="ERROR",
+        WARM_UP_ON_START="",
+        TAVILY_API_KEY="simulated",
+        GROQ_API_KEY="simulated",
+    )
+    rows = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-c", STARTUP_PROBE],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        row = json.loads(completed.stdout.strip().splitlines()[-1])
+        row["process_ms"] = (time.perf_counter() - started) * 1000
+        rows.append(row)
+    return rows
+
+
+def print_startup_report(rows: List[dict]) -> None:
+    print(f"Cold start over {len(rows)} fresh interpreters (median / max):")
+    for field in (
+        "import_ms",
+        "first_health_ms",
+        "first_cache_hit_ms",
+        "warm_up_ms",
+        "process_ms",
+        "peak_rss_mb",
+    ):
+        values = [row[field] for row in rows]
+        print(f"   {field:<20} {percentile(values, 50):>9.1f} {max(values):>9.1f}")
+    loaded = sum(1 for row in rows if row["providers_loaded_before_warm_up"])
+    print(f"   providers loaded before warm-up: {loaded}/{len(rows)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline company search benchmark")
+    parser.add_argument(
+        "--input", help="JSONL file of search requests (name/personalNote/tags)"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=50, help="Requests per concurrency level"
+    )
+    parser.add_argument(
+        "--concurrency", default="1,4,16", help="Comma-separated concurrency levels"
+    )
+    parser.add_argument(
+        "--target",
+        choices=["fastapi", "handler", "both"],
+        default="both",
+        help="Entry point to benchmark",
+    )
+    parser.add_argument(
+        "--handler-server",
+        choices=["single", "threaded", "pool"],
+        default="pool",
+        help="HTTP server used for the handler target (pool size: HANDLER_WORKERS)",
+    )
+    parser.add_argument(
+        "--unique",
+        action="store_true",
+        help="Make every request distinct (no coalescing)",
+    )
+    parser.add_argument(
+        "--with-caches",
+        action="store_true",
+        help="Keep response, Tavily and local-store caches enabled",
+    )
+    parser.add_argument(
+        "--llm-mode",
+        default="single",
+        help="Comma-separated LLM extraction modes to compare (single, map_reduce)",
+    )
+    parser.add_argument(
+        "--with-rate-limits",
+        action="store_true",
+        help="Keep the provider rate limiters enabled (see TAVILY_*_RPM)",
+    )
+    parser.add_argument(
+        "--tavily-latency",
+        type=float,
+        default=0.6,
+        help="Mean seconds per basic (detailed) search",
+    )
+    parser.add_argument(
+        "--tavily-advanced-latency",
+        type=float,
+        default=1.5,
+        help="Mean seconds per advanced (initial) search",
+    )
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=0.8,
+        help="Mean seconds to the first LLM token",
+    )
+    parser.add_argument(
+        "--llm-tokens-per-second", type=float, default=300.0, help="LLM output speed"
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.3,
+        help="Latency jitter as a fraction of the mean",
+    )
+    parser.add_argument("--tavily-failure-rate", type=float, default=0.0)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--time-scale", type=float, default=1.0, help="Multiply all simulated latencies"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--no-trace-memory",
+        dest="trace_memory",
+        action="store_false",
+        help="Skip tracemalloc peak memory",
+    )
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument(
+        "--startup",
+        type=int,
+        metavar="SAMPLES",
+        help="Measure cold-start latency and memory instead of request load",
+    )
+    args = parser.parse_args()
+
+    if args.startup:
+        rows = run_startup(args.startup)
+        print_startup_report(rows)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(rows, f, indent=2)
+            print(f"\n📝 Results written to {args.json}")
+        return
+
+    if not args.with_rate_limits:
+        # Simulated providers have no quotas to protect
+        for name in (
+            "TAVILY_BASIC_RPM",
+            "TAVILY_ADVANCED_RPM",
+            "GROQ_TOKENS_PER_MINUTE",
+        ):
+            os.environ[name] = "0"
+    # Keep simulated traffic out of the request log the cache warmer mines
+    os.environ["REQUEST_LOG_PATH"] = ""
+    if not args.with_caches:
+        # Configuration is read at import time, so set it before importing the app
+        os.environ["TAVILY_CACHE_DIR"] = ""
+        os.environ["LOCAL_STORE_MODE"] = "off"
+        os.environ["ENTITY_CACHE_PATH"] = ""
+        os.environ["SHARED_CACHE_PATH"] = ""
+
+    import api.main as main_module
+
+    main_module.TAVILY_API_KEY = "simulated"
+    main_module.GROQ_API_KEY = "simulated"
+
+    rng = random.Random(args.seed)
+    scale = args.time_scale
+    tavily_latencies = {
+        "basic": SimulatedLatency(
+            args.tavily_latency * scale, args.jitter, args.tavily_failure_rate, rng
+        ),
+        "advanced": SimulatedLatency(
+            args.tavily_advanced_latency * scale,
+            args.jitter,
+            args.tavily_failure_rate,
+            rng,
+        ),
+    }
+    llm_latency = SimulatedLatency(
+        args.llm_latency * scale, args.jitter, args.llm_failure_rate, rng
+    )
+    main_module.use_providers(
+        tavily=lambda: SimulatedTavily(tavily_latencies),
+        chat_model=lambda model_name: make_simulated_chat_model(
+            llm_latency, args.llm_tokens_per_second / scale
+        ),
+    )
+
+    bodies = load_requests(args.input)
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    targets = ["fastapi", "handler"] if args.target == "both" else [args.target]
+    llm_modes = [mode.strip() for mode in args.llm_mode.split(",") if mode.strip()]
+
+    print(f"🏁 Benchmarking {', '.join(targets)} with {len(bodies)} distinct inputs")
+    # Measure steady state: provider imports are a cold-start cost (see --startup)
+    main_module.load_providers()
+    if args.trace_memory:
+        tracemalloc.start()
+
+    rows = []
+    for target in targets:
+        for llm_mode in llm_modes:
+            for concurrency in levels:
+                batch = list(request_stream(bodies, args.requests, args.unique))
+                row = run_level(main_module, target, batch, concurrency, args, llm_mode)
+                rows.append(row)
+                print(
+                    f"   {target} {llm_mode} x{concurrency}: {row['requests']} "
+                    f"requests in {row['wall_seconds']:.1f}s",
+                    file=sys.stderr,
+                )
+
+    print()
+    print_report(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"\n📝 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
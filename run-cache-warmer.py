@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Cache warmer for the company search API
+Mines the request log (REQUEST_LOG_PATH) for the most requested searches and
+refreshes their cached results before they expire. Run it next to
+run-python-api.py, once (e.g. from cron) or with --interval in a loop; the
+server can do the same in-process with CACHE_WARM_INTERVAL.
+"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Add the current directory to path so we can import from api/
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def format_rate(rates: dict) -> str:
+    def percent(value):
+        return "-" if value is None else f"{value * 100:.1f}%"
+
+    gain = rates["gain"]
+    gain = "" if gain is None else f" ({gain * 100:+.1f} pts)"
+    return (
+        f"{percent(rates['beforeWarming'])} before warming, "
+        f"{percent(rates['sinceWarming'])} since{gain} "
+        f"over {rates['requests']} requests"
+    )
+
+
+def print_report(report: dict) -> None:
+    if "skipped" in report:
+        print(f"⏭️  Cycle skipped: {report['skipped']}")
+        return
+    print(f"🔥 {report['hotSearches']} hot searches, {report['actions'] or 'none'}")
+    print(f"   Provider calls: {report['providerCalls']}/{report['budget']}")
+    print(f"   Search cache hit rate: {format_rate(report['hitRate'])}")
+    print(f"   Hot searches hit rate: {format_rate(report['hotHitRate'])}")
+    if report["searches"]:
+        print()
+        print(f"{'requests':>8}  {'expires in':>10}  {'action':<12} search")
+        for search in report["searches"]:
+            expires_in = search["expiresIn"]
+            expires_in = "-" if expires_in is None else f"{expires_in}s"
+            print(
+                f"{search['requests']:>8}  {expires_in:>10}  {search['action']:<12} "
+                f"{search['name']} [{search['tags']}]"
+            )
+
+
+async def run(warmer, args) -> None:
+    import api.main as main
+
+    try:
+        while True:
+            report = await warmer.run_cycle(dry_run=args.dry_run)
+            if args.json:
+                print(json.dumps(report))
+            else:
+                print_report(report)
+            sys.stdout.flush()
+            if not args.interval:
+                return
+            await asyncio.sleep(args.interval)
+    finally:
+        await main.close_provider_clients()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Refresh cached results for the most requested searches"
+    )
+    parser.add_argument("--log", help="Request log to mine (default: REQUEST_LOG_PATH)")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.0,
+        help="Seconds between cycles; 0 runs a single cycle (default)",
+    )
+    parser.add_argument(
+        "--window", type=float, help="Seconds of log to mine (CACHE_WARM_WINDOW)"
+    )
+    parser.add_argument(
+        "--top", type=int, help="Hot searches to keep warm (CACHE_WARM_TOP_KEYS)"
+    )
+    parser.add_argument(
+        "--min-requests",
+        type=int,
+        help="Requests in the window that make a search hot (CACHE_WARM_MIN_REQUESTS)",
+    )
+    parser.add_argument(
+        "--refresh-ahead",
+        type=float,
+        help="Refresh entries expiring within this many seconds "
+        "(CACHE_WARM_REFRESH_AHEAD)",
+    )
+    parser.add_argument(
+        "--budget", type=int, help="Provider calls per cycle (CACHE_WARM_BUDGET)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="Searches refreshed at once (CACHE_WARM_CONCURRENCY)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only rank the hot searches and report hit rates",
+    )
+    parser.add_argument("--json", action="store_true", help="Print reports as JSON")
+    args = parser.parse_args()
+
+    import api.main as main
+
+    log = main.RequestLog(args.log, 0) if args.log else main.request_log
+    if not log.path:
+        sys.exit("❌ No request log: set REQUEST_LOG_PATH or pass --log")
+    if not main.search_cache.shared and not main.search_cache.directory:
+        print(
+            "⚠️  SHARED_CACHE_PATH and SEARCH_CACHE_DIR are unset: refreshed "
+            "search results only reach the Tavily and entity caches",
+            file=sys.stderr,
+        )
+
+    options = {
+        "window": args.window,
+        "top_keys": args.top,
+        "min_requests": args.min_requests,
+        "refresh_ahead": args.refresh_ahead,
+        "budget": args.budget,
+        "concurrency": args.concurrency,
+    }
+    warmer = main.CacheWarmer(
+        log,
+        main.search_cache,
+        main.warm_search,
+        interval=args.interval,
+        **{name: value for name, value in options.items() if value is not None},
+    )
+    try:
+        asyncio.run(run(warmer, args))
+    except KeyboardInterrupt:
+        print("\n👋 Cache warmer stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,17 @@
 """
 Local development server for testing the API
 Run this alongside `npm run dev` for local development
-Supports both FastAPI (preferred) and BaseHTTPRequestHandler (Vercel-compatible) modes
+Supports both FastAPI (preferred) and BaseHTTPRequestHandler (Vercel-compatible) modes,
+plus a multi-process production mode for self-hosting
 """
 
 import os
 import sys
+import time
+import signal
+import socket
 import argparse
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -39,17 +44,23 @@ def run_fastapi():
         run_base_handler()
 
 
-def run_base_handler():
+def run_base_handler(server_mode=None, workers=None):
     """Run with BaseHTTPRequestHandler (Vercel-compatible)"""
-    from http.server import HTTPServer
+    from api._server import HANDLER_SERVER_MODE, HANDLER_WORKERS, create_handler_server
     from api.main import handler
 
+    server_mode = server_mode or HANDLER_SERVER_MODE
+    workers = workers or HANDLER_WORKERS
+
     port = 8080
-    server = HTTPServer(("localhost", port), handler)
-    print(f"🐍 BaseHTTP server running on http://localhost:{port}")
+    server = create_handler_server(
+        ("localhost", port), handler, mode=server_mode, workers=workers
+    )
+    concurrency = f"{workers} workers" if server_mode == "pool" else server_mode
+    print(f"🐍 BaseHTTP server running on http://localhost:{port} ({concurrency})")
     print(f"📝 Test endpoints:")
-    print(f"   POST http://localhost:{port}/api/login")
-    print(f"   POST http://localhost:{port}/api/chat")
+    print(f"   GET  http://localhost:{port}/api/health")
+    print(f"   POST http://localhost:{port}/api/search-companies")
     print(f"🚀 Run 'npm run dev' in another terminal for the frontend")
 
     try:
@@ -59,17 +70,153 @@ def run_base_handler():
         server.server_close()
 
 
+def run_production(workers=None, host="0.0.0.0", port=8080, graceful_timeout=30.0):
+    """Serve the FastAPI app from preforked worker processes (Unix only).
+
+    The master binds the socket and imports the app and the provider stacks
+    once, so workers start immediately and share that memory copy-on-write.
+    Workers share the search, Tavily and entity caches through SQLite
+    (SHARED_CACHE_PATH) and split the provider rate limits evenly
+    (SERVER_WORKERS). A worker that dies is replaced; SIGHUP starts a fresh
+    set of workers and drains the old ones; SIGTERM or Ctrl+C drains all
+    workers and exits. Restart the master to deploy new code.
+    """
+    if not hasattr(os, "fork"):
+        sys.exit("❌ Production mode needs os.fork (Linux or macOS)")
+
+    workers = workers or int(os.environ.get("WEB_CONCURRENCY") or os.cpu_count() or 1)
+    # Configuration is read at import time, so set it before importing the app
+    os.environ["SERVER_WORKERS"] = str(workers)
+    os.environ.setdefault(
+        "SHARED_CACHE_PATH",
+        os.path.join(tempfile.gettempdir(), "company-search-cache.db"),
+    )
+    # The providers are preloaded below; no warm-up thread may be running
+    # when the master forks
+    os.environ["WARM_UP_ON_START"] = ""
+
+    import uvicorn
+    import api.main as main
+
+    main.load_providers()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    config = uvicorn.Config(
+        main.app,
+        log_level="info",
+        timeout_graceful_shutdown=graceful_timeout,
+    )
+
+    def spawn():
+        pid = os.fork()
+        if pid:
+            return pid
+        # Worker: uvicorn installs its own SIGTERM/SIGINT handlers
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, signal.SIG_DFL)
+        try:
+            uvicorn.Server(config).run(sockets=[sock])
+        finally:
+            main.flush_logs()
+            os._exit(0)
+
+    pending = []
+    for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: pending.append(signum))
+
+    active = {spawn() for _ in range(workers)}
+    retiring = set()
+    print(
+        f"🏭 Production server on http://{host}:{port} "
+        f"({workers} workers, master pid {os.getpid()})"
+    )
+    print(f"   Shared cache: {os.environ['SHARED_CACHE_PATH'] or 'disabled'}")
+    print("   SIGHUP restarts the workers, SIGTERM or Ctrl+C stops")
+
+    while True:
+        while pending:
+            signum = pending.pop(0)
+            if signum == signal.SIGHUP:
+                print("🔄 Restarting workers")
+                retiring |= active
+                active = {spawn() for _ in range(workers)}
+                for pid in retiring:
+                    os.kill(pid, signal.SIGTERM)
+            else:
+                print("\n👋 Draining workers")
+                for pid in active | retiring:
+                    os.kill(pid, signal.SIGTERM)
+                stop_by = time.monotonic() + graceful_timeout + 5
+                while (active | retiring) and time.monotonic() < stop_by:
+                    pid, _ = os.waitpid(-1, os.WNOHANG)
+                    if pid:
+                        active.discard(pid)
+                        retiring.discard(pid)
+                    else:
+                        time.sleep(0.1)
+                for pid in active | retiring:
+                    os.kill(pid, signal.SIGKILL)
+                sock.close()
+                print("👋 Server stopped")
+                return
+
+        # Reap exited workers, replacing any that died on their own
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid in retiring:
+            retiring.discard(pid)
+        elif pid in active:
+            active.discard(pid)
+            print(f"⚠️  Worker {pid} exited (status {status}), starting a new one")
+            active.add(spawn())
+        elif not pid:
+            time.sleep(0.2)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Local API development server")
     parser.add_argument(
         "--mode",
-        choices=["fastapi", "handler"],
+        choices=["fastapi", "handler", "production"],
         default="fastapi",
-        help="Server mode: fastapi (recommended) or handler (Vercel-compatible)",
+        help="Server mode: fastapi (recommended), handler (Vercel-compatible) "
+        "or production (preforked FastAPI workers)",
+    )
+    parser.add_argument(
+        "--server",
+        choices=["single", "threaded", "pool"],
+        help="Handler mode only: one request at a time, a thread per connection, "
+        "or a fixed worker pool (default: HANDLER_SERVER_MODE or pool)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Worker threads for --server pool (default: HANDLER_WORKERS or 8), or "
+        "worker processes in production mode (default: WEB_CONCURRENCY or CPU count)",
+    )
+    parser.add_argument(
+        "--host", default="0.0.0.0", help="Production mode only: address to bind"
+    )
+    parser.add_argument(
+        "--port", type=int, default=8080, help="Production mode only: port to bind"
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=float,
+        default=30.0,
+        help="Production mode only: seconds a stopping worker may spend "
+        "finishing in-flight requests",
     )
     args = parser.parse_args()
 
     if args.mode == "fastapi":
         run_fastapi()
+    elif args.mode == "production":
+        run_production(args.workers, args.host, args.port, args.graceful_timeout)
     else:
-        run_base_handler()
+        run_base_handler(args.server, args.workers)
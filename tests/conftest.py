@@ -0,0 +1,93 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Make the api package importable, as the run-*.py scripts do
+sys.path.insert(0, ROOT)
+
+# Keep test runs off the caches and stores the server keeps on disk
+for name in ("TAVILY_CACHE_DIR", "ENTITY_CACHE_PATH", "SHARED_CACHE_PATH"):
+    os.environ.setdefault(name, "")
+os.environ.setdefault("LOCAL_STORE_MODE", "off")
+
+
+class FakeTavily:
+    """Stand-in Tavily client: answers every query after ``delay`` seconds,
+    failing for queries that contain one of the ``failing`` strings"""
+
+    def __init__(self):
+        self.delay = 0.0
+        self.failing = set()
+        self.queries = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def search(self, query, search_depth="basic", **kwargs):
+        self.queries.append((query, search_depth))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if any(failing in query for failing in self.failing):
+                raise RuntimeError(f"Tavily failed for {query}")
+            return {
+                "results": [
+                    {"title": query, "content": f"About {query}.", "url": "https://x"}
+                ]
+            }
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def tavily():
+    return FakeTavily()
+
+
+def load_benchmark():
+    """run-benchmark.py as a module, for its simulated providers"""
+    import importlib.util
+
+    spec = importlib.util.spec_from_file_location(
+        "run_benchmark", os.path.join(ROOT, "run-benchmark.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def simulated(monkeypatch):
+    """Run the pipeline against run-benchmark.py's simulated Tavily and Groq
+    (50 ms per search, 100 ms per LLM call) with an empty search cache and
+    no rate limits"""
+    import random
+
+    import api.main as main
+
+    bench = load_benchmark()
+    rng = random.Random(0)
+    tavily_latency = bench.SimulatedLatency(0.05, 0.0, 0.0, rng)
+    llm_latency = bench.SimulatedLatency(0.1, 0.0, 0.0, rng)
+    monkeypatch.setattr(main, "TAVILY_API_KEY", "simulated")
+    monkeypatch.setattr(main, "GROQ_API_KEY", "simulated")
+    monkeypatch.setattr(main, "search_cache", main.SearchResultCache(16, 3600))
+    # Simulated providers have no quotas to protect (a zero rate is unlimited)
+    monkeypatch.setattr(main, "GROQ_TOKENS_PER_MINUTE", 0)
+    monkeypatch.setattr(main, "_groq_limiters", {})
+    for depth in ("basic", "advanced"):
+        monkeypatch.setitem(
+            main.tavily_limiters, depth, main.per_minute_limiter(depth, 0)
+        )
+    main.use_providers(
+        tavily=lambda: bench.SimulatedTavily(
+            {"basic": tavily_latency, "advanced": tavily_latency}
+        ),
+        chat_model=lambda model_name: bench.make_simulated_chat_model(llm_latency, 1e6),
+    )
+    yield bench
+    main.use_providers()
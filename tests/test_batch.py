@@ -0,0 +1,119 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import api.main as main
+from api.main import (
+    CompanySearchBatchRequest,
+    CompanySearchResponse,
+    RateLimitExceeded,
+    TavilyQueryMemo,
+)
+
+
+def item(name):
+    return {"name": name, "personalNote": "EV maker", "tags": "EV"}
+
+
+def run_batch(items, headers=None):
+    batch = CompanySearchBatchRequest(items=items)
+
+    async def collect():
+        return [
+            event
+            async for event in main.stream_company_search_batch(batch, headers or {})
+        ]
+
+    return asyncio.run(collect())
+
+
+def test_identical_items_run_once(monkeypatch):
+    searched = []
+
+    async def fake_search(request, headers, *args, **kwargs):
+        searched.append(request.name)
+        await asyncio.sleep(0.01)
+        return CompanySearchResponse(inputCompany=request, similarCompanies=[]), "live"
+
+    monkeypatch.setattr(main, "run_company_search", fake_search)
+    events = run_batch([item("Tesla"), item(" TESLA "), item("Rivian")])
+
+    assert sorted(searched) == ["Rivian", "Tesla"]
+    results = sorted(
+        (event for event in events if event["type"] == "result"),
+        key=lambda event: event["index"],
+    )
+    names = [event["data"]["inputCompany"]["name"] for event in results]
+    assert names == ["Tesla", " TESLA ", "Rivian"]
+    assert events[-1]["type"] == "done"
+    assert (events[-1]["count"], events[-1]["uniqueSearches"]) == (3, 2)
+
+
+def test_a_failed_item_does_not_fail_the_batch(monkeypatch):
+    async def fake_search(request, headers, *args, **kwargs):
+        if request.name == "Rivian":
+            raise RateLimitExceeded("tavily_advanced", 12)
+        return CompanySearchResponse(inputCompany=request, similarCompanies=[]), "live"
+
+    monkeypatch.setattr(main, "run_company_search", fake_search)
+    events = run_batch([item("Tesla"), item("Rivian")])
+
+    errors = [event for event in events if event["type"] == "error"]
+    assert errors == [
+        {
+            "type": "error",
+            "index": 1,
+            "error": "tavily_advanced rate limit reached, retry in 12s",
+            "retryAfter": 12,
+        }
+    ]
+    assert events[-1]["failed"] == 1
+
+
+def test_identical_tavily_queries_in_a_batch_share_one_call(tavily):
+    tavily.delay = 0.02
+    memo = TavilyQueryMemo()
+
+    async def search(query):
+        return await main.cached_tavily_search(tavily, query, search_depth="basic")
+
+    async def scenario():
+        token = main.tavily_query_memo.set(memo)
+        try:
+            return await asyncio.gather(
+                search("Rivian"), search("rivian "), search("Lucid")
+            )
+        finally:
+            main.tavily_query_memo.reset(token)
+
+    first, second, _ = asyncio.run(scenario())
+    assert first == second
+    assert sorted(tavily.queries) == [("Lucid", "basic"), ("Rivian", "basic")]
+    assert (memo.requested, memo.saved) == (3, 1)
+
+
+def test_batch_items_share_tavily_queries(simulated, tavily, monkeypatch):
+    tavily.delay = 0.02
+
+    async def overlapping_search(name, personal_note, tags, progress):
+        response = await main.cached_tavily_search(
+            tavily, "EV market leaders", search_depth="advanced"
+        )
+        return [{**result, "target_company": name} for result in response["results"]]
+
+    monkeypatch.setattr(main, "search_similar_companies", overlapping_search)
+    events = run_batch([item("Tesla"), item("Rivian")])
+
+    assert tavily.queries == [("EV market leaders", "advanced")]
+    done = events[-1]
+    assert done["failed"] == 0
+    assert (done["tavilyQueries"], done["tavilyQueriesSaved"]) == (2, 1)
+
+
+def test_oversized_batch_is_rejected(monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_ITEMS", 2)
+    response = TestClient(main.app).post(
+        "/search-companies/batch",
+        json={"items": [item("Tesla"), item("Rivian"), item("Lucid")]},
+    )
+    assert response.status_code == 413
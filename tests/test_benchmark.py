@@ -0,0 +1,23 @@
+import importlib.util
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_benchmark():
+    spec = importlib.util.spec_from_file_location(
+        "run_benchmark", os.path.join(ROOT, "run-benchmark.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_startup_probe_runs():
+    rows = load_benchmark().run_startup(1)
+    assert len(rows) == 1
+    row = rows[0]
+    assert row["import_ms"] > 0
+    assert row["first_cache_hit_ms"] > 0
+    assert row["warm_up_ms"] > 0
+    assert not row["providers_loaded_before_warm_up"]
@@ -0,0 +1,41 @@
+import asyncio
+import os
+import stat
+
+import api.main as main
+from api.main import CompanySearchRequest, RequestLog, SingleFlight
+
+REQUEST = CompanySearchRequest(name="Tesla", personalNote="EV maker", tags="EV")
+
+
+def test_request_log_is_private(tmp_path):
+    log = RequestLog(str(tmp_path / "requests.jsonl"), 0)
+    log.append(REQUEST, "live")
+    mode = stat.S_IMODE(os.stat(log.path).st_mode)
+    assert mode & (stat.S_IRWXG | stat.S_IRWXO) == 0
+    assert log.read()[0]["body"]["personalNote"] == "EV maker"
+
+
+def test_user_requests_do_not_join_low_priority_flights():
+    flight = SingleFlight("test")
+    started = []
+
+    async def work(priority):
+        started.append(priority)
+        await asyncio.sleep(0.05)
+        return priority
+
+    async def call(priority):
+        with main.priority_scope(priority):
+            return await flight.do("key", lambda _: work(priority))
+
+    async def scenario():
+        low = asyncio.ensure_future(call(main.PRIORITIES["low"]))
+        await asyncio.sleep(0.01)
+        return await asyncio.gather(
+            low, call(main.PRIORITIES["high"]), call(main.PRIORITIES["normal"])
+        )
+
+    assert asyncio.run(scenario()) == [2, 0, 0]
+    assert started == [2, 0]
+    assert flight.stats()["saved"] == 1
@@ -0,0 +1,68 @@
+from api.main import extract_company_candidates
+
+# Snippets in the shape Tavily returns for news and analysis pages
+EV_RESULTS = [
+    {
+        "title": "Tesla rivals: the EV makers to watch in 2024",
+        "content": (
+            "Experts say the electric vehicle market is entering a new phase. "
+            "Rivian has ramped up production of its R1T pickup, while Lucid "
+            "Motors is courting luxury buyers with the Air sedan. Investors "
+            "remain cautious after a volatile year."
+        ),
+    },
+    {
+        "title": "Why Rivian and Lucid are burning cash",
+        "content": (
+            "Customers have waited months for deliveries. Analysts expect "
+            "Rivian to narrow losses as costs fall, and Lucid Motors plans a "
+            "cheaper midsize model. Polestar, backed by Geely, is also "
+            "expanding in the US."
+        ),
+    },
+    {
+        "title": "EV startups face a reckoning",
+        "content": (
+            "Experts warn that funding is drying up. Investors pulled back from "
+            "Fisker before its bankruptcy, and Customers of Canoo were left "
+            "without support. Meanwhile Polestar and Rivian keep raising money."
+        ),
+    },
+]
+
+
+def test_sentence_start_words_rank_below_companies():
+    candidates = extract_company_candidates(
+        EV_RESULTS, exclude="Tesla", query_terms="electric vehicles EV", top_k=5
+    )
+    assert candidates[:3] == ["Rivian", "Lucid", "Polestar"]
+    for word in ("Experts", "Investors", "Customers", "Analysts", "Meanwhile"):
+        assert word not in candidates
+
+
+def test_single_word_company_only_at_sentence_start_is_kept():
+    results = [
+        {
+            "title": "Battery makers expand",
+            "content": "Northvolt opened a second plant. Northvolt says demand "
+            "from carmakers is strong.",
+        },
+    ]
+    assert extract_company_candidates(results, top_k=5) == ["Northvolt"]
+
+
+def test_benchmark_style_snippet_has_no_analysts():
+    results = [
+        {
+            "title": f"{first} and {second} among the leaders",
+            "content": (
+                f"{first} competes with {second} in this market. "
+                f"Analysts compare {first} to its peers on growth, "
+                "margins and product focus."
+            ),
+        }
+        for first, second in (("Rivian", "Lucid Group"), ("NIO Inc", "Polestar"))
+    ]
+    candidates = extract_company_candidates(results, top_k=5)
+    assert "Analysts" not in candidates
+    assert set(candidates) == {"Rivian", "Lucid Group", "NIO Inc", "Polestar"}
@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter, so modules imported by other tests don't count
+PROBE = r"""
+import json, sys
+from fastapi.testclient import TestClient
+import api.main as main
+
+STACKS = ("langchain_core", "langchain_groq", "tavily")
+
+def loaded():
+    return [name for name in STACKS if name in sys.modules]
+
+client = TestClient(main.app)
+imported = loaded()
+health = client.get("/health").status_code
+after_health = loaded()
+warm = client.get("/warmup").json()
+print(json.dumps({
+    "imported": imported,
+    "health": health,
+    "after_health": after_health,
+    "warm": warm["status"],
+    "after_warm_up": loaded(),
+}))
+"""
+
+
+def run_probe(**env):
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=ROOT,
+        env=dict(os.environ, LOG_LEVEL="ERROR", **env),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def test_provider_stacks_load_on_warm_up_not_on_import():
+    probe = run_probe(WARM_UP_ON_START="")
+    assert probe["imported"] == []
+    assert (probe["health"], probe["after_health"]) == (200, [])
+    assert probe["warm"] == "warm"
+    assert probe["after_warm_up"] == ["langchain_core", "langchain_groq", "tavily"]
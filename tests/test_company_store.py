@@ -0,0 +1,94 @@
+import pytest
+
+import api.main as main
+from api.main import (
+    CompanyMaster,
+    CompanySearchRequest,
+    CompanyStore,
+    SimilarCompanyResult,
+)
+
+EV_SEARCH = CompanySearchRequest(
+    name="Tesla", personalNote="electric vehicles", tags="EV, batteries"
+)
+
+
+def result(name, description, industry, tags):
+    return SimilarCompanyResult(
+        company=CompanyMaster(
+            name=name, description=description, industry=industry, tagsMaster=tags
+        ),
+        justification="Similar.",
+    )
+
+
+EV_MAKERS = [
+    result("Rivian", "Electric vehicles: trucks and SUVs", "Automotive", ["EV"]),
+    result("Lucid", "Luxury electric vehicles", "Automotive", ["EV", "luxury"]),
+    result("Northvolt", "Batteries for electric vehicles", "Energy", ["batteries"]),
+]
+BAKERY = result("Greggs", "Bakery chain selling pastries", "Food", ["bakery"])
+BAKERY_SEARCH = CompanySearchRequest(name="Gail's", personalNote="", tags="bakery")
+
+
+def open_store(tmp_path, min_score=0.15):
+    return CompanyStore(str(tmp_path / "companies.db"), main.index_terms, min_score)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = open_store(tmp_path)
+    store.upsert(EV_SEARCH, EV_MAKERS)
+    store.upsert(BAKERY_SEARCH, [BAKERY])
+    return store
+
+
+def test_similar_companies_are_ranked_by_score(store):
+    matches = store.find_similar(EV_SEARCH)
+    names = [company.name for _, company, _ in matches]
+    assert set(names) == {"Rivian", "Lucid", "Northvolt"}
+    scores = [score for score, _, _ in matches]
+    assert scores == sorted(scores, reverse=True)
+    shared_tags = {company.name: shared for _, company, shared in matches}
+    assert shared_tags["Lucid"] == ["ev"]
+
+
+def test_the_searched_company_is_never_its_own_match(store):
+    store.upsert(EV_SEARCH, [result("Tesla", "Electric vehicles", "Auto", ["EV"])])
+    assert "Tesla" not in [
+        company.name for _, company, _ in store.find_similar(EV_SEARCH)
+    ]
+
+
+def test_records_persist_and_update_in_place(store, tmp_path):
+    store.upsert(EV_SEARCH, EV_MAKERS[:1])
+    reopened = open_store(tmp_path)
+    assert reopened.count() == 4
+    assert len(reopened.find_similar(EV_SEARCH)) == 3
+
+
+def test_min_score_filters_weak_matches(tmp_path):
+    strict = open_store(tmp_path, min_score=0.99)
+    strict.upsert(EV_SEARCH, EV_MAKERS)
+    assert strict.find_similar(EV_SEARCH) == []
+
+
+def test_search_context_helps_later_matches(tmp_path):
+    store = open_store(tmp_path)
+    note = CompanySearchRequest(name="Acme", personalNote="kombucha", tags="drinks")
+    store.upsert(note, [BAKERY])
+    later = CompanySearchRequest(name="Other", personalNote="kombucha", tags="")
+    assert [company.name for _, company, _ in store.find_similar(later)] == ["Greggs"]
+
+
+def test_local_answers_need_five_confident_matches(store, monkeypatch):
+    monkeypatch.setattr(main, "LOCAL_STORE_MODE", "serve")
+    monkeypatch.setattr(main, "company_store", store)
+    matches = store.find_similar(EV_SEARCH)
+    assert main.serve_locally(EV_SEARCH, matches) is None  # only three
+
+    monkeypatch.setattr(main, "LOCAL_SERVE_MIN_SCORE", 0.0)
+    five = (matches * 2)[:5]
+    response = main.serve_locally(EV_SEARCH, five)
+    assert len(response.similarCompanies) == 5
+    assert response.similarCompanies[0].justification.startswith("Matched from")
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+import api.main as main
+
+CANDIDATES = ["Rivian", "Lucid", "Polestar", "NIO", "BYD"]
+
+
+def test_detailed_searches_run_concurrently_up_to_the_limit(tavily, monkeypatch):
+    monkeypatch.setattr(main, "TAVILY_DETAILED_CONCURRENCY", 2)
+    tavily.delay = 0.1
+
+    started = time.perf_counter()
+    results = asyncio.run(main.run_detailed_searches(tavily, CANDIDATES))
+    elapsed = time.perf_counter() - started
+
+    assert list(results) == CANDIDATES
+    assert results["NIO"][0]["target_company"] == "NIO"
+    assert tavily.max_in_flight == 2
+    assert elapsed < 0.45  # three waves of 0.1s, not five
+
+
+def test_failed_or_slow_candidates_are_dropped(tavily, monkeypatch):
+    monkeypatch.setattr(main, "TAVILY_DETAILED_TIMEOUT", 0.2)
+
+    class SlowForLucid:
+        async def search(self, query, **kwargs):
+            if query.startswith("Lucid"):
+                await asyncio.sleep(5)
+            return await tavily.search(query, **kwargs)
+
+    tavily.failing = {"Polestar"}
+    started = time.perf_counter()
+    results = asyncio.run(main.run_detailed_searches(SlowForLucid(), CANDIDATES))
+
+    assert list(results) == ["Rivian", "NIO", "BYD"]
+    assert time.perf_counter() - started < 1
+
+
+def test_detailed_searches_are_skipped_without_budget(tavily):
+    async def scenario():
+        with main.deadline_scope(main.DEADLINE_LLM_RESERVE) as deadline:
+            results = await main.run_detailed_searches(tavily, CANDIDATES)
+        return results, deadline.degradations
+
+    results, degradations = asyncio.run(scenario())
+    assert results == {}
+    assert degradations == ["detailed_searches_skipped"]
+    assert tavily.queries == []
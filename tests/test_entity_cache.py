@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import pytest
+
+import api.main as main
+from api.main import (
+    CompanyMaster,
+    EntityCache,
+    SimilarCompanyResult,
+    entity_key,
+    is_entity_complete,
+)
+
+RIVIAN = CompanyMaster(
+    name="Rivian Automotive, Inc.",
+    websiteUrl="https://rivian.com",
+    description="Electric trucks and SUVs",
+    industry="Automotive",
+    stillInBusiness=True,
+    logoUrl="",
+)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = EntityCache(str(tmp_path / "entities.db"), main.ENTITY_FIELD_TTLS)
+    monkeypatch.setattr(main, "entity_cache", cache)
+    return cache
+
+
+def test_entity_key_ignores_case_punctuation_and_suffixes():
+    assert entity_key("Rivian Automotive, Inc.") == "rivian automotive"
+    assert entity_key("rivian automotive") == "rivian automotive"
+    assert entity_key("Inc") == "inc"
+
+
+def test_only_known_facts_are_stored(cache):
+    cache.record([RIVIAN])
+    facts = cache.lookup(["Rivian Automotive"])["Rivian Automotive"]
+    assert facts == {
+        "websiteUrl": "https://rivian.com",
+        "description": "Electric trucks and SUVs",
+        "industry": "Automotive",
+        "stillInBusiness": True,
+    }
+    assert is_entity_complete(facts)
+
+
+def test_each_field_expires_after_its_own_ttl(tmp_path):
+    ttls = {**main.ENTITY_FIELD_TTLS, "stillInBusiness": 0.05}
+    cache = EntityCache(str(tmp_path / "entities.db"), ttls)
+    cache.record([RIVIAN])
+    time.sleep(0.06)
+    facts = cache.lookup(["Rivian Automotive"])["Rivian Automotive"]
+    assert "stillInBusiness" not in facts
+    assert facts["websiteUrl"] == "https://rivian.com"
+    assert not is_entity_complete(facts)
+    assert (cache.hits, cache.partial, cache.misses) == (0, 1, 0)
+
+
+def test_candidates_with_complete_facts_skip_their_detailed_search(
+    simulated, cache, monkeypatch
+):
+    cache.record([RIVIAN, CompanyMaster(name="Lucid", websiteUrl="https://lucid.com")])
+    monkeypatch.setattr(
+        main,
+        "extract_company_candidates",
+        lambda *args, **kwargs: ["Rivian Automotive", "Lucid"],
+    )
+    phases = {}
+
+    async def search():
+        return await main.search_similar_companies(
+            "Tesla",
+            "EV maker",
+            "EV",
+            lambda phase, **details: phases.setdefault(phase, details),
+        )
+
+    results = asyncio.run(search())
+    assert phases["detailed_search"] == {
+        "candidates": ["Lucid"],
+        "cached": ["Rivian Automotive"],
+    }
+    targets = [
+        (result["target_company"], bool(result.get("stored")))
+        for result in results
+        if "target_company" in result
+    ]
+    # Cached facts for both, live detailed results only for Lucid
+    assert targets[0] == ("Rivian Automotive", True)
+    assert ("Lucid", True) in targets and ("Lucid", False) in targets
+    assert ("Rivian Automotive", False) not in targets
+
+
+def test_facts_echoed_from_the_cache_are_not_refreshed(cache):
+    results = [
+        SimilarCompanyResult(company=RIVIAN, justification="Similar."),
+        SimilarCompanyResult(
+            company=CompanyMaster(name="Lucid", industry="Automotive"),
+            justification="Similar.",
+        ),
+    ]
+    search_results = [
+        main.entity_fact_result("Rivian Automotive", {"industry": "Automotive"}),
+        {"title": "Lucid", "content": "", "url": "", "target_company": "Lucid"},
+    ]
+    asyncio.run(main.remember_entities(results, search_results))
+    assert list(cache.lookup(["Rivian", "Lucid"])) == ["Lucid"]
@@ -0,0 +1,83 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+import api.main as main
+from api.main import CompanySearchRequest, CompanySearchResponse, JobRunner
+
+REQUEST = CompanySearchRequest(name="Tesla", personalNote="EV maker", tags="EV")
+
+
+class FlakyStore:
+    """In-memory job store whose "running" writes fail while locked"""
+
+    path = ""
+
+    def __init__(self):
+        self.jobs = {}
+        self.locked = True
+
+    def save(self, job):
+        if job.status == "running" and self.locked:
+            raise sqlite3.OperationalError("database is locked")
+        self.jobs[job.jobId] = job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+
+async def fake_search(request, headers, *args, **kwargs):
+    return CompanySearchResponse(inputCompany=request, similarCompanies=[]), "live"
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(main, "run_company_search", fake_search)
+    return FlakyStore()
+
+
+@pytest.fixture
+def runner(store):
+    runner = JobRunner(store, workers=1, max_queued=10, search=main.run_search_job)
+    yield runner
+    runner.close()
+    assert not runner._tasks
+
+
+def test_store_error_does_not_kill_the_worker(store, runner):
+
+    first = runner.submit(REQUEST, {})
+    finished = main.run_sync(runner.wait(first.jobId, timeout=5), timeout=10)
+    assert finished.status == "done"
+
+    store.locked = False
+    second = runner.submit(REQUEST, {})
+    finished = main.run_sync(runner.wait(second.jobId, timeout=5), timeout=10)
+    assert finished.status == "done"
+    stats = runner.stats()
+    assert (stats["queued"], stats["running"], stats["completed"]) == (0, 0, 2)
+
+
+def test_submit_from_the_background_loop_does_not_block(store, runner):
+    store.locked = False
+
+    async def submit_and_wait():
+        job = runner.submit(REQUEST, {})
+        return await runner.wait(job.jobId, timeout=5)
+
+    assert main.run_sync(submit_and_wait(), timeout=10).status == "done"
+
+
+def test_close_cancels_running_jobs(store, runner, monkeypatch):
+    store.locked = False
+
+    async def hanging_search(request, headers, *args, **kwargs):
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(main, "run_company_search", hanging_search)
+    job = runner.submit(REQUEST, {})
+    main.run_sync(runner.wait(job.jobId, timeout=0.2), timeout=10)
+    assert runner.stats()["running"] == 1
+    runner.close()
+    assert runner.stats()["running"] == 0
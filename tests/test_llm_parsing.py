@@ -0,0 +1,62 @@
+import json
+
+from api.main import (
+    CompanySearchRequest,
+    JsonArrayStreamParser,
+    build_similar_company,
+    parse_llm_response,
+)
+
+INPUT = CompanySearchRequest(name="Tesla", personalNote="EV maker", tags="EV")
+
+
+def item(name, justification="Similar EV maker.", **company):
+    return {"company": {"name": name, **company}, "justification": justification}
+
+
+def test_null_and_numeric_fields_are_coerced():
+    content = json.dumps(
+        [
+            item("Rivian", tagsMaster=None, naicsCode=336111, industry=None),
+            item("Lucid", justification=None, stillInBusiness="true"),
+        ]
+    )
+    companies = parse_llm_response(content, INPUT)
+    assert [c.company.name for c in companies] == ["Rivian", "Lucid"]
+    assert companies[0].company.tagsMaster == []
+    assert companies[0].company.naicsCode == "336111"
+    assert companies[1].company.stillInBusiness is True
+    assert companies[1].justification.startswith("Similar to Tesla")
+
+
+def test_structured_values_do_not_fail_the_answer():
+    content = json.dumps(
+        [
+            item("Rivian", description={"text": "nested"}, tagsMaster=[1, None, "EV"]),
+            item("Lucid"),
+        ]
+    )
+    companies = parse_llm_response(content, INPUT)
+    assert [c.company.name for c in companies] == ["Rivian", "Lucid"]
+    assert companies[0].company.description == ""
+    assert companies[0].company.tagsMaster == ["1", "EV"]
+
+
+def test_build_similar_company_without_company_object():
+    assert build_similar_company({"company": "Rivian"}, 0, INPUT) is None
+
+
+def test_stream_parser_skips_bracketed_prose():
+    content = "Here are the companies [as requested]:\n" + json.dumps(
+        [item("Rivian"), item("Lucid")]
+    )
+    parser = JsonArrayStreamParser()
+    items = [found for ch in content for found in parser.feed(ch)]
+    assert [found["company"]["name"] for found in items] == ["Rivian", "Lucid"]
+    assert len(parse_llm_response(content + "\nHope this helps [1].", INPUT)) == 2
+
+
+def test_stream_parser_empty_array_closes():
+    parser = JsonArrayStreamParser()
+    assert parser.feed('No match: [] [{"company": {}}]') == []
+    assert parser.closed
@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.main as main
+from api.main import CompanySearchRequest, RateLimitExceeded
+
+TESLA = CompanySearchRequest(name="Tesla", personalNote="EV maker", tags="EV")
+
+
+def item(name, relevance=7):
+    return {
+        "company": {"name": name, "industry": "Automotive"},
+        "justification": f"{name} also makes EVs.",
+        "relevance": relevance,
+    }
+
+
+def names(companies):
+    return [company.company.name for company in companies]
+
+
+def test_merge_ranks_by_relevance_then_candidate_rank():
+    items = [(0, item("Rivian", 6)), (1, item("Lucid", 9)), (2, item("Polestar", 6))]
+    assert names(main.merge_map_items(items, TESLA)) == ["Lucid", "Rivian", "Polestar"]
+
+
+def test_merge_drops_duplicates_and_the_input_company():
+    items = [
+        (0, item("Rivian Automotive", 8)),
+        (1, item("Tesla, Inc.", 9)),
+        (2, item("Rivian Automotive, Inc.", 7)),
+        (3, item("Lucid", "not a score")),
+    ]
+    assert names(main.merge_map_items(items, TESLA)) == ["Rivian Automotive", "Lucid"]
+
+
+def test_merge_keeps_the_best_five():
+    items = [(rank, item(f"Maker {rank}", rank)) for rank in range(7)]
+    assert names(main.merge_map_items(items, TESLA)) == [
+        "Maker 6",
+        "Maker 5",
+        "Maker 4",
+        "Maker 3",
+        "Maker 2",
+    ]
+
+
+def test_failed_map_calls_drop_only_their_candidate(monkeypatch):
+    candidates = ["Rivian", "Lucid", "Polestar"]
+    monkeypatch.setattr(main, "select_map_candidates", lambda *args: candidates)
+
+    async def extract(candidate, results_text, input_company):
+        if candidate == "Lucid":
+            raise RuntimeError("provider down")
+        return None if candidate == "Polestar" else item(candidate)
+
+    monkeypatch.setattr(main, "extract_candidate", extract)
+
+    async def collect():
+        return [entry async for entry in main.map_candidates([], TESLA)]
+
+    assert [
+        (rank, entry["company"]["name"]) for rank, entry in asyncio.run(collect())
+    ] == [(0, "Rivian")]
+
+
+def test_rate_limit_is_raised_only_when_no_candidate_got_through(monkeypatch):
+    monkeypatch.setattr(main, "select_map_candidates", lambda *args: ["Rivian"])
+
+    async def extract(*args):
+        raise RateLimitExceeded("groq", 30)
+
+    monkeypatch.setattr(main, "extract_candidate", extract)
+
+    async def collect():
+        return [entry async for entry in main.map_candidates([], TESLA)]
+
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(collect())
+
+
+def test_map_reduce_header_extracts_one_call_per_candidate(simulated, monkeypatch):
+    mapped = []
+    extract_candidate = main.extract_candidate
+
+    async def extract(candidate, *args):
+        mapped.append(candidate)
+        return await extract_candidate(candidate, *args)
+
+    monkeypatch.setattr(main, "extract_candidate", extract)
+    client = TestClient(main.app)
+    body = {"name": "Tesla", "personalNote": "EV maker", "tags": "EV"}
+    response = client.post(
+        "/search-companies", json=body, headers={"X-LLM-Mode": "map-reduce"}
+    )
+    assert response.status_code == 200
+    companies = [c["company"]["name"] for c in response.json()["similarCompanies"]]
+    assert len(companies) == 5
+    assert len({main.entity_key(name) for name in companies}) == 5
+    assert set(companies) <= set(mapped)
+    assert len(mapped) <= main.LLM_MAP_CANDIDATES
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.main as main
+from api.main import Counter, Histogram
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_seconds", "Test latency", (0.1, 1), labels=("stage",))
+    histogram.observe(0.05, stage="llm")
+    histogram.observe(0.5, stage="llm")
+    histogram.observe(5, stage="llm")
+    assert histogram.render() == [
+        "# HELP test_seconds Test latency",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="llm",le="0.1"} 1',
+        'test_seconds_bucket{stage="llm",le="1"} 2',
+        'test_seconds_bucket{stage="llm",le="+Inf"} 3',
+        'test_seconds_sum{stage="llm"} 5.550000',
+        'test_seconds_count{stage="llm"} 3',
+    ]
+
+
+def test_counter_renders_one_line_per_label_set():
+    counter = Counter("test_total", "Test lookups", labels=("cache", "result"))
+    counter.inc(cache="search", result="hit")
+    counter.inc(2, cache="search", result="hit")
+    counter.inc(cache="search", result="miss")
+    assert counter.render()[2:] == [
+        'test_total{cache="search",result="hit"} 3',
+        'test_total{cache="search",result="miss"} 1',
+    ]
+
+
+def test_request_span_logs_its_stages_in_one_line(monkeypatch):
+    logged = []
+    monkeypatch.setattr(
+        main, "log_debug", lambda message, *args: logged.append(message)
+    )
+
+    with pytest.raises(RuntimeError):
+        with main.request_span("search", company="Tesla"):
+            with main.span("initial_search") as attributes:
+                attributes["results"] = 8
+            with main.span("llm"):
+                raise RuntimeError("provider down")
+
+    line = json.loads(logged[-1])
+    assert (line["endpoint"], line["status"], line["company"]) == (
+        "search",
+        "error",
+        "Tesla",
+    )
+    stages = [(s["stage"], s["status"]) for s in line["spans"]]
+    assert stages == [("initial_search", "ok"), ("llm", "error")]
+    assert line["spans"][0]["results"] == 8
+
+
+def test_metrics_endpoint_reports_stage_latency(simulated):
+    client = TestClient(main.app)
+    body = {"name": "Tesla", "personalNote": "EV maker", "tags": "EV"}
+    assert client.post("/search-companies", json=body).status_code == 200
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'company_search_request_seconds_count{endpoint="search",status="ok"}' in text
+    for stage in ("initial_search", "detailed_search", "prompt_build", "llm"):
+        assert f'company_search_stage_seconds_count{{stage="{stage}"' in text
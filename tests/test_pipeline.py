@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+import httpx
+
+import api.main as main
+
+
+def body(index):
+    return {"name": f"Company {index}", "personalNote": "EV maker", "tags": "EV"}
+
+
+async def post_search(client, payload):
+    started = time.perf_counter()
+    response = await client.post("/search-companies", json=payload)
+    return response, time.perf_counter() - started
+
+
+def asgi_client():
+    transport = httpx.ASGITransport(app=main.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+def test_health_answers_while_a_search_runs(simulated):
+    async def scenario():
+        async with asgi_client() as client:
+            search = asyncio.ensure_future(post_search(client, body(0)))
+            await asyncio.sleep(0.03)
+            started = time.perf_counter()
+            health = await client.get("/health")
+            health_seconds = time.perf_counter() - started
+            assert not search.done()
+            return health, health_seconds, await search
+
+    health, health_seconds, (response, search_seconds) = asyncio.run(scenario())
+    assert health.status_code == 200
+    assert health_seconds < 0.05
+    assert response.status_code == 200
+    assert len(response.json()["similarCompanies"]) == 5
+    assert search_seconds > 0.15  # initial search, detailed searches, LLM
+
+
+def test_one_worker_serves_searches_concurrently(simulated):
+    async def scenario():
+        async with asgi_client() as client:
+            _, single = await post_search(client, body(0))
+            started = time.perf_counter()
+            results = await asyncio.gather(
+                *(post_search(client, body(index)) for index in range(1, 6))
+            )
+            return single, time.perf_counter() - started, results
+
+    single, together, results = asyncio.run(scenario())
+    assert all(response.status_code == 200 for response, _ in results)
+    assert together < 2 * single
@@ -0,0 +1,66 @@
+from api.main import CompanySearchRequest, build_results_text, estimate_tokens
+
+REQUEST = CompanySearchRequest(
+    name="Tesla", personalNote="electric vehicles", tags="EV, batteries"
+)
+
+
+def result(title, content, url, target=None):
+    item = {"title": title, "content": content, "url": url}
+    if target:
+        item["target_company"] = target
+    return item
+
+
+def filler(topic, words=120):
+    return " ".join(f"{topic}{index}" for index in range(words))
+
+
+def test_repeated_urls_and_near_duplicate_snippets_are_dropped():
+    text = (
+        "Rivian builds electric vehicles and batteries for adventure trucks, "
+        "selling pickups and SUVs directly to customers across North America."
+    )
+    results = [
+        result("Rivian", text, "https://www.rivian.com/about/"),
+        result("Rivian again", "Something else entirely.", "http://rivian.com/about"),
+        result("Rivian", text + " Read more.", "https://news.example.com/rivian"),
+        result("Lucid", "Lucid makes luxury electric sedans.", "https://lucid.com"),
+    ]
+    text_out, stats = build_results_text(results, REQUEST)
+    assert stats["duplicates_removed"] == 2
+    assert "Rivian again" not in text_out and "Read more" not in text_out
+    assert "Lucid makes luxury electric sedans." in text_out
+
+
+def test_results_are_admitted_best_first_within_the_budget():
+    relevant = result(
+        "EV makers",
+        "Electric vehicles and batteries, like Tesla. " + filler("ev"),
+        "https://a.example.com",
+    )
+    unrelated = [
+        result(f"Recipe {index}", filler(f"food{index}x"), f"https://b{index}.com")
+        for index in range(10)
+    ]
+    text, stats = build_results_text(unrelated + [relevant], REQUEST, token_budget=600)
+    assert estimate_tokens(text) <= 600
+    assert stats["dropped_for_budget"] > 0
+    assert stats["tokens_saved"] > 0
+    assert "EV makers" in text
+
+
+def test_every_detailed_candidate_keeps_a_result():
+    general = [
+        result(
+            f"Tesla EV batteries {index}", filler(f"ev{index}x"), f"https://g{index}"
+        )
+        for index in range(6)
+    ]
+    targeted = [
+        result(f"{name} overview", filler(f"{name}x", 40), f"https://{name}.com", name)
+        for name in ("Rivian", "Lucid", "Polestar")
+    ]
+    text, _ = build_results_text(general + targeted, REQUEST, token_budget=900)
+    for name in ("Rivian", "Lucid", "Polestar"):
+        assert f"DETAILS FOR: {name}" in text
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+import api.main as main
+
+
+@pytest.fixture(autouse=True)
+def api_keys(monkeypatch):
+    monkeypatch.setattr(main, "TAVILY_API_KEY", "tvly-test")
+    monkeypatch.setattr(main, "GROQ_API_KEY", "gsk-test")
+
+
+async def open_clients():
+    clients = {
+        "tavily": main.get_tavily_client(),
+        "chat_model": main.get_chat_model(),
+        "chain": main.get_llm_chain(),
+    }
+    again = {
+        "tavily": main.get_tavily_client(),
+        "chat_model": main.get_chat_model(),
+        "chain": main.get_llm_chain(),
+    }
+    http_clients = [
+        client
+        for name, client in main._clients_for_running_loop().items()
+        if name.startswith("http:")
+    ]
+    await main.close_provider_clients()
+    assert asyncio.get_running_loop() not in main._loop_clients
+    return clients, again, http_clients
+
+
+def test_clients_are_reused_within_a_loop():
+    clients, again, http_clients = asyncio.run(open_clients())
+    assert all(clients[name] is again[name] for name in clients)
+    assert len(http_clients) == 2  # one pool for Tavily, one for Groq
+    for http_client in http_clients:
+        assert http_client.timeout.connect == main.HTTP_CONNECT_TIMEOUT
+        assert http_client.timeout.read == main.HTTP_READ_TIMEOUT
+
+
+def test_each_loop_gets_its_own_clients():
+    first, _, _ = asyncio.run(open_clients())
+    second, _, _ = asyncio.run(open_clients())
+    assert first["tavily"] is not second["tavily"]
+    assert first["chat_model"] is not second["chat_model"]
+
+
+def test_closing_releases_the_loops_connection_pools():
+    _, _, http_clients = asyncio.run(open_clients())
+    assert all(http_client.is_closed for http_client in http_clients)
@@ -0,0 +1,183 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.main as main
+from api.main import (
+    PRIORITIES,
+    CompanySearchBatchRequest,
+    RateLimiter,
+    RateLimitExceeded,
+    SearchResultCache,
+)
+
+
+class FakeClock:
+    """Stands in for the time module in api.main; only the test moves it"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(main, "time", clock)
+    return clock
+
+
+async def until(condition, timeout=5.0):
+    """Let waiters poll (they sleep in real time) until ``condition`` holds"""
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+def drained(rate, capacity=1.0, max_waiters=10):
+    limiter = RateLimiter("test", rate, capacity, max_waiters)
+    limiter.tokens = 0.0
+    return limiter
+
+
+def test_waiters_are_served_by_priority_then_arrival(clock):
+    limiter = drained(rate=100)
+    admitted = []
+
+    async def wait(label, priority):
+        await limiter.acquire(1, priority=priority)
+        admitted.append(label)
+
+    async def scenario():
+        tasks = []
+        for label, priority in [
+            ("low", PRIORITIES["low"]),
+            ("normal 1", PRIORITIES["normal"]),
+            ("high", PRIORITIES["high"]),
+            ("normal 2", PRIORITIES["normal"]),
+        ]:
+            tasks.append(asyncio.ensure_future(wait(label, priority)))
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.1)
+        assert admitted == []  # no refill while the clock stands still
+        for served in range(1, 5):
+            clock.advance(0.02)  # one token; the bucket holds no more
+            await until(lambda: len(admitted) == served)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert admitted == ["high", "normal 1", "normal 2", "low"]
+
+
+def test_full_queue_rejects_with_retry_after(clock):
+    limiter = drained(rate=1, max_waiters=2)
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(limiter.acquire(1)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(RateLimitExceeded) as rejected:
+            await limiter.acquire(1)
+        assert limiter.saturated()
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        return rejected.value
+
+    error = asyncio.run(scenario())
+    assert error.retry_after == 3  # two queued tokens plus its own at 1/s
+    stats = limiter.stats()
+    assert (stats["waiting"], stats["rejected"]) == (0, 1)
+
+
+def test_wait_past_the_deadline_is_rejected_up_front(clock):
+    limiter = drained(rate=0.1)
+
+    async def scenario():
+        with main.deadline_scope(5):
+            await limiter.acquire(1)
+
+    with pytest.raises(RateLimitExceeded) as rejected:
+        asyncio.run(scenario())
+    assert rejected.value.retry_after == 10
+    assert limiter.stats()["waiting"] == 0
+
+
+def test_deadline_rejection_is_an_early_429(clock, monkeypatch):
+    limiter = drained(rate=0.01)
+    monkeypatch.setitem(main.tavily_limiters, "advanced", limiter)
+    monkeypatch.setattr(main, "search_cache", SearchResultCache(16, 3600))
+    monkeypatch.setattr(main, "LOCAL_STORE_MODE", "off")
+
+    async def limited_search(request, progress=None):
+        await main.tavily_limiters["advanced"].acquire()
+        return []
+
+    monkeypatch.setattr(main, "coalesced_search", limited_search)
+    started = time.monotonic()
+    response = TestClient(main.app).post(
+        "/search-companies",
+        json={"name": "Tesla", "personalNote": "EV maker", "tags": "EV"},
+    )
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "100"
+    assert time.monotonic() - started < 5
+
+
+def test_batch_items_queue_at_low_priority(monkeypatch):
+    monkeypatch.setattr(main, "search_cache", SearchResultCache(16, 3600))
+    monkeypatch.setattr(main, "LOCAL_STORE_MODE", "off")
+    priorities = []
+
+    async def recording_search(request, progress=None):
+        priorities.append(main.request_priority.get())
+        return []
+
+    monkeypatch.setattr(main, "coalesced_search", recording_search)
+    batch = CompanySearchBatchRequest(
+        items=[{"name": "Tesla", "personalNote": "", "tags": "EV"}]
+    )
+
+    async def run(headers):
+        return [
+            event async for event in main.stream_company_search_batch(batch, headers)
+        ]
+
+    asyncio.run(run({}))
+    asyncio.run(run({main.PRIORITY_HEADER: "high"}))
+    assert priorities == [PRIORITIES["low"], PRIORITIES["high"]]
+
+
+def limiter_after(charged):
+    limiter = RateLimiter("test", rate=0.001, capacity=1000, max_waiters=10)
+    asyncio.run(limiter.acquire(charged))
+    return limiter
+
+
+def test_settle_returns_unused_tokens():
+    limiter = limiter_after(800)
+    limiter.settle(800, 300)
+    assert 699 < limiter.tokens <= 700.1
+
+
+def test_settle_charges_overruns():
+    limiter = limiter_after(200)
+    limiter.settle(200, 1100)
+    assert limiter.tokens < 0
+
+
+def test_settle_never_overfills():
+    limiter = limiter_after(100)
+    limiter.settle(5000, 0)
+    assert limiter.tokens <= limiter.capacity
@@ -0,0 +1,148 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+import api.main as main
+from api.main import (
+    CompanyMaster,
+    CompanySearchRequest,
+    SearchResultCache,
+    SimilarCompanyResult,
+    deadline_scope,
+    get_cached_search,
+    search_cache_key,
+    store_cached_search,
+)
+
+REQUEST = CompanySearchRequest(name="Tesla", personalNote="EV maker", tags="EV")
+
+
+def companies(count):
+    return [
+        SimilarCompanyResult(
+            company=CompanyMaster(name=f"Company {index}"), justification="Similar."
+        )
+        for index in range(count)
+    ]
+
+
+def use_cache(monkeypatch, tmp_path=None):
+    cache = SearchResultCache(16, 3600, str(tmp_path) if tmp_path else "")
+    monkeypatch.setattr(main, "search_cache", cache)
+    return cache
+
+
+def test_full_answer_is_cached_for_the_cache_ttl(monkeypatch):
+    cache = use_cache(monkeypatch)
+    with deadline_scope() as deadline:
+        deadline.model = "primary"
+        store_cached_search(REQUEST, companies(5))
+    assert cache.expires_in(search_cache_key(REQUEST)) > 3500
+
+    with deadline_scope() as deadline:
+        cached = get_cached_search(REQUEST, {})
+        metadata = deadline.metadata("cache")
+    assert len(cached.similarCompanies) == 5
+    assert metadata.model == "primary"
+    assert metadata.degradations == []
+
+
+def test_degraded_answer_keeps_metadata_and_short_ttl(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "SEARCH_CACHE_DEGRADED_TTL", 60)
+    cache = use_cache(monkeypatch, tmp_path)
+    with deadline_scope() as deadline:
+        deadline.degrade("llm_fallback_model")
+        deadline.model = "fallback"
+        store_cached_search(REQUEST, companies(5))
+    assert cache.expires_in(search_cache_key(REQUEST)) <= 60
+
+    # A second process reads the entry from disk with the same TTL and metadata
+    other = use_cache(monkeypatch, tmp_path)
+    assert other.expires_in(search_cache_key(REQUEST)) <= 60
+    with deadline_scope() as deadline:
+        get_cached_search(REQUEST, {})
+        metadata = deadline.metadata("cache")
+    assert metadata.model == "fallback"
+    assert metadata.degradations == ["llm_fallback_model"]
+
+
+def test_partial_answer_is_degraded(monkeypatch):
+    monkeypatch.setattr(main, "SEARCH_CACHE_DEGRADED_TTL", 0)
+    cache = use_cache(monkeypatch)
+    with deadline_scope() as deadline:
+        store_cached_search(REQUEST, companies(3))
+    assert deadline.degradations == ["partial_answer"]
+    assert cache.get(search_cache_key(REQUEST)) is None
+
+
+def test_legacy_list_entries_are_still_served(monkeypatch):
+    cache = use_cache(monkeypatch)
+    cache.set(search_cache_key(REQUEST), [item.model_dump() for item in companies(5)])
+    with deadline_scope():
+        assert len(get_cached_search(REQUEST, {}).similarCompanies) == 5
+
+
+def test_flight_follower_caches_a_degraded_answer_briefly(monkeypatch):
+    cache = use_cache(monkeypatch)
+    other = CompanySearchRequest(name="Tesla", personalNote="", tags="EV")
+
+    async def degraded_search():
+        await asyncio.sleep(0.05)
+        main.current_deadline().degrade("search_timeout")
+        return companies(5)
+
+    async def call(request, delay):
+        await asyncio.sleep(delay)
+        with deadline_scope():
+            found = await main.search_flight.do("degraded", lambda _: degraded_search())
+            store_cached_search(request, found)
+
+    async def scenario():
+        await asyncio.gather(call(REQUEST, 0), call(other, 0.01))
+
+    asyncio.run(scenario())
+    for request in (REQUEST, other):
+        assert cache.expires_in(search_cache_key(request)) <= 60
+
+
+def test_cache_key_ignores_case_spacing_and_tag_order():
+    variant = CompanySearchRequest(
+        name="  TESLA ", personalNote="ev   maker", tags="ev, EV ,"
+    )
+    assert search_cache_key(variant) == search_cache_key(REQUEST)
+    other = CompanySearchRequest(name="Tesla", personalNote="EV maker", tags="EV,AI")
+    assert search_cache_key(other) != search_cache_key(REQUEST)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SearchResultCache(2, 3600)
+    cache.set("a", [1])
+    cache.set("b", [2])
+    cache.get("a")
+    cache.set("c", [3])
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ([1], None, [3])
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_the_ttl():
+    cache = SearchResultCache(16, 0.05)
+    cache.set("a", [1])
+    assert cache.get("a") == [1]
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.expires_in("a") is None
+
+
+def test_repeated_search_is_served_from_the_cache(simulated):
+    client = TestClient(main.app)
+    body = REQUEST.model_dump()
+    first = client.post("/search-companies", json=body)
+    second = client.post("/search-companies", json={**body, "name": "tesla "})
+    bypass = client.post(
+        "/search-companies", json=body, headers={main.CACHE_BYPASS_HEADER: "1"}
+    )
+    assert [first.headers["X-Cache"], second.headers["X-Cache"]] == ["MISS", "HIT"]
+    assert second.json()["similarCompanies"] == first.json()["similarCompanies"]
+    assert second.json()["inputCompany"]["name"] == "tesla "
+    assert bypass.headers["X-Cache"] == "MISS"
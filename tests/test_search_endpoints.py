@@ -0,0 +1,106 @@
+import http.client
+import json
+import threading
+from http.server import HTTPServer
+from urllib.parse import urlencode
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.main as main
+from api.main import (
+    CompanyMaster,
+    CompanySearchRequest,
+    SearchResultCache,
+    SimilarCompanyResult,
+    deadline_scope,
+    store_cached_search,
+)
+
+BODY = {"name": "Tesla", "personalNote": "EV maker", "tags": "EV"}
+QUERY = "/search-companies?" + urlencode(BODY)
+
+
+@pytest.fixture(autouse=True)
+def cached_search(monkeypatch):
+    """Serve every test search from the cache, without providers"""
+    monkeypatch.setattr(main, "search_cache", SearchResultCache(16, 3600))
+    with deadline_scope():
+        store_cached_search(
+            CompanySearchRequest(**BODY),
+            [
+                SimilarCompanyResult(
+                    company=CompanyMaster(name=f"Company {index}"),
+                    justification="Similar.",
+                )
+                for index in range(5)
+            ],
+        )
+
+
+def test_get_revalidates_with_etag():
+    client = TestClient(main.app)
+    first = client.get(QUERY)
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    etag = first.headers["ETag"]
+
+    again = client.get(QUERY, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+
+def test_post_ignores_if_none_match():
+    client = TestClient(main.app)
+    etag = client.post("/search-companies", json=BODY).headers["ETag"]
+    response = client.post(
+        "/search-companies", json=BODY, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert len(response.json()["similarCompanies"]) == 5
+
+
+@pytest.fixture
+def handler_conn():
+    """A keep-alive connection to the handler on a single-threaded server"""
+    server = HTTPServer(("127.0.0.1", 0), main.handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=10)
+    yield conn
+    # The keep-alive connection holds the single-threaded server
+    conn.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_handler_get_revalidates_with_etag(handler_conn):
+    conn = handler_conn
+    conn.request("GET", "/api" + QUERY)
+    first = conn.getresponse()
+    first.read()
+    assert first.status == 200
+    etag = first.getheader("ETag")
+
+    conn.request("GET", "/api" + QUERY, headers={"If-None-Match": etag})
+    again = conn.getresponse()
+    assert again.status == 304
+    assert again.read() == b""
+
+    conn.request("GET", "/api/search-companies?name=Tesla")
+    missing = conn.getresponse()
+    missing.read()
+    assert missing.status == 400
+
+
+def test_handler_stream_failure_ends_with_an_error_event(handler_conn, monkeypatch):
+    async def failing_search(request, headers):
+        yield {"type": "progress", "phase": "search"}
+        raise RuntimeError("pipeline broke")
+
+    monkeypatch.setattr(main, "stream_company_search", failing_search)
+    handler_conn.request("POST", "/api/search-companies/stream", body=json.dumps(BODY))
+    response = handler_conn.getresponse()
+    assert response.status == 200
+    lines = response.read().splitlines()
+    assert [json.loads(line)["type"] for line in lines] == ["progress", "error"]
+    assert json.loads(lines[-1])["error"] == "pipeline broke"
@@ -0,0 +1,73 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import api.main as main
+from api.main import SearchResultCache, SharedCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Another server process storing a search result in the shared cache
+WRITER = r"""
+import sys
+import api.main as main
+cache = main.SearchResultCache(16, 3600, shared=main.SharedCache(sys.argv[1]))
+cache.set("tesla", [{"company": {"name": "Rivian"}, "justification": "EVs"}])
+"""
+
+
+def test_file_databases_use_wal(tmp_path):
+    path = str(tmp_path / "shared.db")
+    SharedCache(path).set("search", "key", b"value", 60)
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_connections_share_entries_by_namespace_and_ttl(tmp_path):
+    path = str(tmp_path / "shared.db")
+    writer, reader = SharedCache(path), SharedCache(path)
+    writer.set("search", "key", b"value", 60)
+    assert reader.get("search", "key", 60)[1] == b"value"
+    assert reader.get("tavily_basic", "key", 60) is None
+    assert reader.get("search", "key", 0) is None  # older than the reader's TTL
+    assert reader.stats()["entries"] == {"search": 1}
+
+
+def test_readers_are_not_blocked_by_an_open_write(tmp_path):
+    path = str(tmp_path / "shared.db")
+    cache = SharedCache(path)
+    cache.set("search", "key", b"old", 60)
+
+    other_process = sqlite3.connect(path, isolation_level=None)
+    other_process.execute("BEGIN IMMEDIATE")
+    other_process.execute("UPDATE cache SET value = ?", (b"new",))
+    started = time.monotonic()
+    try:
+        assert SharedCache(path).get("search", "key", 60)[1] == b"old"
+    finally:
+        other_process.execute("COMMIT")
+    assert time.monotonic() - started < 1
+    assert SharedCache(path).get("search", "key", 60)[1] == b"new"
+
+
+def test_expired_rows_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "SHARED_CACHE_PRUNE_EVERY", 2)
+    cache = SharedCache(str(tmp_path / "shared.db"))
+    cache.set("search", "old", b"value", 1, stored_at=time.time() - 10)
+    cache.set("search", "new", b"value", 60)
+    assert cache.stats()["entries"] == {"search": 1}
+
+
+def test_processes_share_search_results(tmp_path):
+    path = str(tmp_path / "shared.db")
+    subprocess.run(
+        [sys.executable, "-c", WRITER, path],
+        cwd=ROOT,
+        env=dict(os.environ, LOG_LEVEL="ERROR"),
+        check=True,
+    )
+    cache = SearchResultCache(16, 3600, shared=SharedCache(path))
+    assert cache.get("tesla")[0]["company"]["name"] == "Rivian"
+    assert cache.stats()["disk_hits"] == 1
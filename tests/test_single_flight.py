@@ -0,0 +1,144 @@
+import asyncio
+
+import api.main as main
+from api.main import SingleFlight
+
+
+def test_followers_get_the_flights_degradations_and_model():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.05)
+        deadline = main.current_deadline()
+        deadline.degrade("llm_fallback_model")
+        deadline.model = "fallback"
+        return "answer"
+
+    async def call(delay):
+        await asyncio.sleep(delay)
+        with main.deadline_scope(10) as deadline:
+            if delay:
+                deadline.degrade("own")
+            result = await flight.do("key", lambda _: work())
+            return result, deadline.degradations, deadline.model
+
+    async def scenario():
+        return await asyncio.gather(call(0), call(0.01))
+
+    leader, follower = asyncio.run(scenario())
+    assert leader == ("answer", ["llm_fallback_model"], "fallback")
+    assert follower == ("answer", ["own", "llm_fallback_model"], "fallback")
+    assert flight.stats()["saved"] == 1
+
+
+def test_joined_searches_get_every_progress_event(monkeypatch):
+    async def fake_search(name, personal_note, tags, progress):
+        progress("initial_search")
+        await asyncio.sleep(0.1)
+        progress("detailed_search", candidates=2)
+        await asyncio.sleep(0.05)
+        return [{"url": "https://example.com"}]
+
+    monkeypatch.setattr(main, "search_similar_companies", fake_search)
+    request = main.CompanySearchRequest(name="Tesla", personalNote="", tags="EV")
+
+    async def search(delay):
+        events = []
+        await asyncio.sleep(delay)
+        results = await main.coalesced_search(
+            request, progress=lambda phase, **details: events.append(phase)
+        )
+        return results, events
+
+    async def scenario():
+        # The follower runs on the handler's background loop
+        follower = asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(search(0.03), main.get_background_loop())
+        )
+        return await asyncio.gather(search(0), follower)
+
+    saved = main.search_flight.stats()["saved"]
+    leader, follower = asyncio.run(scenario())
+    assert leader == follower
+    assert leader[1] == ["initial_search", "detailed_search"]
+    assert main.search_flight.stats()["saved"] == saved + 1
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        return await asyncio.gather(
+            *(flight.do("key", lambda _: work()) for _ in range(3))
+        )
+
+    assert asyncio.run(scenario()) == ["answer"] * 3
+    assert len(runs) == 1
+    stats = flight.stats()
+    assert (stats["executed"], stats["saved"], stats["in_flight"]) == (1, 2, 0)
+
+
+def test_errors_reach_every_caller_and_are_not_kept():
+    flight = SingleFlight("test")
+    runs = []
+
+    async def failing():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        raise RuntimeError("provider down")
+
+    async def scenario():
+        return await asyncio.gather(
+            *(flight.do("key", lambda _: failing()) for _ in range(2)),
+            return_exceptions=True,
+        )
+
+    outcomes = asyncio.run(scenario())
+    assert [str(outcome) for outcome in outcomes] == ["provider down"] * 2
+    assert flight.stats()["errors"] == 1
+
+    # The failure isn't cached: the next call runs the work again
+    asyncio.run(scenario())
+    assert len(runs) == 2
+
+
+def test_work_outlives_a_cancelled_leader():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.do("key", lambda _: work()))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(flight.do("key", lambda _: work()))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower, leader.cancelled()
+
+    assert asyncio.run(scenario()) == ("answer", True)
+
+
+def test_cancelled_work_cancels_its_callers():
+    flight = SingleFlight("test")
+
+    async def cancelled():
+        await asyncio.sleep(0.02)
+        raise asyncio.CancelledError()
+
+    async def scenario():
+        return await asyncio.gather(
+            *(flight.do("key", lambda _: cancelled()) for _ in range(2)),
+            return_exceptions=True,
+        )
+
+    outcomes = asyncio.run(scenario())
+    assert all(isinstance(outcome, asyncio.CancelledError) for outcome in outcomes)
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import api.main as main
+from api.main import TavilyQueryCache
+
+RESPONSE = {"results": [{"title": "Rivian", "content": "EV maker", "url": "https://x"}]}
+
+
+def test_entries_persist_across_instances(tmp_path):
+    TavilyQueryCache(str(tmp_path), {"basic": 3600}).set("Rivian", "basic", RESPONSE)
+    other = TavilyQueryCache(str(tmp_path), {"basic": 3600})
+    assert other.get("  rivian ", "basic") == RESPONSE
+    assert other.get("Rivian", "advanced") is None
+
+
+def test_each_depth_expires_after_its_own_ttl(tmp_path):
+    cache = TavilyQueryCache(str(tmp_path), {"basic": 3600, "advanced": 0.05})
+    cache.set("Rivian", "basic", RESPONSE)
+    cache.set("Rivian", "advanced", RESPONSE)
+    time.sleep(0.06)
+    assert cache.get("Rivian", "basic") == RESPONSE
+    assert cache.get("Rivian", "advanced") is None
+
+
+def test_refresh_margin_treats_entries_near_expiry_as_expired(tmp_path):
+    cache = TavilyQueryCache(str(tmp_path), {"basic": 3600})
+    cache.set("Rivian", "basic", RESPONSE)
+    token = main.cache_refresh_margin.set(3600)
+    try:
+        assert cache.get("Rivian", "basic") is None
+    finally:
+        main.cache_refresh_margin.reset(token)
+    assert cache.get("Rivian", "basic") == RESPONSE
+
+
+def test_searches_go_through_the_cache(tavily, monkeypatch, tmp_path):
+    cache = TavilyQueryCache(str(tmp_path), {"basic": 3600})
+    monkeypatch.setattr(main, "tavily_cache", cache)
+
+    async def search(query):
+        return await main.cached_tavily_search(tavily, query, search_depth="basic")
+
+    first = asyncio.run(search("Rivian"))
+    second = asyncio.run(search("rivian"))
+    assert first == second
+    assert tavily.queries == [("Rivian", "basic")]
+    assert cache.stats()["hits"] == 1
+
+
+def test_empty_responses_are_not_cached(monkeypatch, tmp_path):
+    cache = TavilyQueryCache(str(tmp_path), {"basic": 3600})
+    monkeypatch.setattr(main, "tavily_cache", cache)
+
+    class EmptyTavily:
+        calls = 0
+
+        async def search(self, query, **kwargs):
+            self.calls += 1
+            return {"results": []}
+
+    client = EmptyTavily()
+    for _ in range(2):
+        asyncio.run(main.cached_tavily_search(client, "Nothing", search_depth="basic"))
+    assert client.calls == 2
+    assert cache.stats()["writes"] == 0